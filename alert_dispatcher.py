@@ -0,0 +1,166 @@
+# alert_dispatcher.py
+import queue
+import threading
+import time
+
+from alerts import get_default_channels
+
+
+class _Job:
+    __slots__ = ("channel", "subject", "message", "attempt", "created")
+
+    def __init__(self, channel, subject, message):
+        self.channel = channel
+        self.subject = subject
+        self.message = message
+        self.attempt = 0
+        self.created = time.monotonic()
+
+
+class AlertDispatcher:
+    """
+    Delivers alerts off the video thread.
+
+    submit() enqueues one job per channel and returns immediately; a small
+    worker pool sends them through long-lived channel objects (see
+    alerts.EmailChannel / WhatsAppChannel). Failed sends are retried with
+    exponential backoff up to `max_retries` times, unless the channel's
+    is_permanent(error) says a retry cannot succeed. A full queue drops new
+    alerts (counted) instead of blocking the caller.
+    """
+
+    def __init__(self, channels=None, workers=2, max_queue=1000, max_retries=3,
+                 backoff_base=1.0, backoff_max=30.0):
+        self.channels = list(channels) if channels is not None else get_default_channels()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._running = True
+        self._timers = set()
+        self._lock = threading.Lock()
+        self.metrics = {
+            channel.name: {"sent": 0, "failed": 0, "retried": 0, "dropped": 0,
+                           "last_latency_ms": 0.0, "total_latency_ms": 0.0}
+            for channel in self.channels
+        }
+
+        self._workers = [
+            threading.Thread(target=self._work, daemon=True, name=f"alert-worker-{i}")
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, subject, message):
+        """Queue an alert on every channel. Never blocks; returns False if anything was dropped."""
+        accepted = True
+        for channel in self.channels:
+            if not self._enqueue(_Job(channel, subject, message)):
+                accepted = False
+        return accepted
+
+    def _enqueue(self, job):
+        if not self._running:
+            return False
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except queue.Full:
+            self._count(job.channel.name, "dropped")
+            return False
+
+    def _count(self, channel_name, key, amount=1):
+        with self._lock:
+            self.metrics[channel_name][key] += amount
+
+    def _retry_later(self, job):
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (job.attempt - 1)))
+        self._count(job.channel.name, "retried")
+
+        def fire():
+            with self._lock:
+                self._timers.discard(timer)
+            self._enqueue(job)
+
+        timer = threading.Timer(delay, fire)
+        timer.daemon = True
+        with self._lock:
+            self._timers.add(timer)
+        timer.start()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            job.attempt += 1
+            try:
+                job.channel.send(job.subject, job.message)
+            except Exception as e:
+                # Channels may flag errors that a retry cannot fix (e.g. SMTP 5xx)
+                is_permanent = getattr(job.channel, "is_permanent", None)
+                permanent = is_permanent is not None and is_permanent(e)
+                if job.attempt <= self.max_retries and self._running and not permanent:
+                    print(f"[WARN] {job.channel.name} alert failed (attempt {job.attempt}): {e}; retrying")
+                    self._retry_later(job)
+                else:
+                    print(f"[ERROR] {job.channel.name} alert failed after {job.attempt} attempts: {e}")
+                    self._count(job.channel.name, "failed")
+                continue
+
+            latency = (time.monotonic() - job.created) * 1000.0
+            with self._lock:
+                m = self.metrics[job.channel.name]
+                m["sent"] += 1
+                m["last_latency_ms"] = latency
+                m["total_latency_ms"] += latency
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        """Per-channel delivery metrics plus the current queue depth."""
+        with self._lock:
+            channels = {}
+            for name, m in self.metrics.items():
+                channels[name] = {
+                    "sent": m["sent"],
+                    "failed": m["failed"],
+                    "retried": m["retried"],
+                    "dropped": m["dropped"],
+                    "last_latency_ms": round(m["last_latency_ms"], 1),
+                    "avg_latency_ms": round(m["total_latency_ms"] / m["sent"], 1) if m["sent"] else 0.0,
+                }
+        return {"queue_depth": self._queue.qsize(), "channels": channels}
+
+    def close(self, timeout=10.0):
+        """Send what is already queued, cancel pending retries, and stop the workers."""
+        self._running = False
+        with self._lock:
+            timers = list(self._timers)
+            self._timers.clear()
+        for timer in timers:
+            timer.cancel()
+        for _ in self._workers:
+            self._queue.put(None)
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+        for channel in self.channels:
+            try:
+                channel.close()
+            except Exception:
+                pass
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_dispatcher():
+    """Process-wide dispatcher used by alert_service."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = AlertDispatcher()
+        return _dispatcher
@@ -0,0 +1,168 @@
+# alert_engine.py
+import threading
+import time
+from collections import namedtuple
+
+# activate: seconds a condition must persist before it raises an alert
+# clear:    seconds it must be absent before the alert is considered over
+# cooldown: minimum seconds between notifications for the same key
+AlertRule = namedtuple("AlertRule", ["activate", "clear", "cooldown"])
+
+ALERT_RULES = {
+    "fall": AlertRule(activate=1.0, clear=3.0, cooldown=60.0),
+    "crowd": AlertRule(activate=2.0, clear=5.0, cooldown=120.0),
+    "intrusion": AlertRule(activate=0.5, clear=2.0, cooldown=60.0),
+    "loitering": AlertRule(activate=0.0, clear=5.0, cooldown=300.0),
+}
+DEFAULT_RULE = AlertRule(activate=0.5, clear=3.0, cooldown=60.0)
+
+# How the subject of each alert type is described in digests
+SUBJECT_LABELS = {"fall": "track", "intrusion": "zone", "loitering": "track"}
+
+
+class _AlertState:
+    __slots__ = ("first_seen", "last_seen", "active", "last_sent", "suppressed")
+
+    def __init__(self, now):
+        self.first_seen = now
+        self.last_seen = now
+        self.active = False
+        self.last_sent = None
+        self.suppressed = 0
+
+
+class AlertEngine:
+    """
+    Turns per-frame alert conditions into a trickle of readable notifications.
+
+    observe() takes the conditions seen in one frame as (type, subject) pairs,
+    e.g. ("fall", track_id), ("intrusion", zone_id) or ("crowd", None). Each
+    (camera, type, subject) key gets hysteresis (it must persist `activate`
+    seconds to fire and be gone `clear` seconds to reset) and a cooldown.
+    Alerts that fire are collected per camera for `digest_window` seconds and
+    returned as one digest message with counts.
+    """
+
+    def __init__(self, rules=None, digest_window=2.0, clock=time.monotonic):
+        self.rules = dict(ALERT_RULES)
+        if rules:
+            self.rules.update(rules)
+        self.digest_window = digest_window
+        self.clock = clock
+        self._states = {}   # camera_id -> {(type, subject): _AlertState}
+        self._pending = {}  # camera_id -> (opened_at, {type: {subject: repeats}})
+        self._lock = threading.Lock()
+        self.counters = {"conditions": 0, "fired": 0, "suppressed": 0, "digests": 0}
+
+    def rule(self, alert_type):
+        return self.rules.get(alert_type, DEFAULT_RULE)
+
+    def observe(self, camera_id, events, now=None):
+        """
+        Feed one frame's conditions for a camera (call it every frame, even with
+        no events, so alerts can clear). Returns a digest message when one is due,
+        otherwise None.
+        """
+        now = self.clock() if now is None else now
+        with self._lock:
+            states = self._states.setdefault(camera_id, {})
+            seen = set(events)
+            self.counters["conditions"] += len(seen)
+
+            for key in seen:
+                rule = self.rule(key[0])
+                state = states.get(key)
+                if state is None:
+                    state = states[key] = _AlertState(now)
+                elif not state.active and now - state.last_seen > rule.clear:
+                    # The condition went away before it activated; start over
+                    state.first_seen = now
+                state.last_seen = now
+
+                if not state.active:
+                    if now - state.first_seen < rule.activate:
+                        continue
+                    state.active = True
+                elif now - state.last_sent < rule.cooldown:
+                    continue
+
+                if state.last_sent is not None and now - state.last_sent < rule.cooldown:
+                    # Re-activated inside the cooldown: count it, don't notify
+                    state.suppressed += 1
+                    self.counters["suppressed"] += 1
+                    continue
+                self._queue(camera_id, key, state.suppressed, now)
+                state.last_sent = now
+                state.suppressed = 0
+
+            for key in list(states):
+                if key in seen:
+                    continue
+                state = states[key]
+                rule = self.rule(key[0])
+                idle = now - state.last_seen
+                if state.active and idle >= rule.clear:
+                    state.active = False
+                # Forget keys (e.g. departed track IDs) once nothing depends on them
+                if (not state.active and idle > rule.clear
+                        and (state.last_sent is None or now - state.last_sent >= rule.cooldown)):
+                    del states[key]
+
+            return self._take_digest(camera_id, now)
+
+    def _queue(self, camera_id, key, suppressed, now):
+        alert_type, subject = key
+        _, by_type = self._pending.setdefault(camera_id, (now, {}))
+        subjects = by_type.setdefault(alert_type, {})
+        subjects[subject] = subjects.get(subject, 0) + suppressed
+        self.counters["fired"] += 1
+
+    def _take_digest(self, camera_id, now, force=False):
+        pending = self._pending.get(camera_id)
+        if pending is None:
+            return None
+        opened, by_type = pending
+        if not force and now - opened < self.digest_window:
+            return None
+        del self._pending[camera_id]
+        self.counters["digests"] += 1
+        return format_digest(by_type)
+
+    def flush(self, camera_id=None):
+        """Return pending digests immediately as [(camera_id, message)], e.g. at shutdown."""
+        now = self.clock()
+        with self._lock:
+            cameras = [camera_id] if camera_id is not None else list(self._pending)
+            digests = []
+            for cam in cameras:
+                message = self._take_digest(cam, now, force=True)
+                if message:
+                    digests.append((cam, message))
+            return digests
+
+    def active_alerts(self, camera_id):
+        with self._lock:
+            return sorted((key for key, state in self._states.get(camera_id, {}).items() if state.active),
+                          key=str)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["tracked_keys"] = sum(len(states) for states in self._states.values())
+            return stats
+
+
+def format_digest(by_type):
+    """{type: {subject: repeats}} -> 'Fall x2 (tracks 3, 7); Crowd x1 [+4 repeats]'."""
+    parts = []
+    for alert_type, subjects in by_type.items():
+        text = f"{alert_type.capitalize()} x{len(subjects)}"
+        label = SUBJECT_LABELS.get(alert_type)
+        named = sorted(str(subject) for subject in subjects if subject is not None)
+        if label and named:
+            text += f" ({label}{'s' if len(named) > 1 else ''} {', '.join(named)})"
+        repeats = sum(subjects.values())
+        if repeats:
+            text += f" [+{repeats} repeat{'s' if repeats > 1 else ''}]"
+        parts.append(text)
+    return "; ".join(parts)
@@ -1,15 +1,19 @@
 # alert_service.py
-from alerts import send_email_alert, send_whatsapp_alert
+from datetime import datetime
+
+from alert_dispatcher import get_dispatcher
 
 def send_surveillance_alert(alert_text, camera_id):
-    """Send surveillance alerts via multiple channels"""
-    from datetime import datetime
+    """
+    Queue a surveillance alert for email and WhatsApp delivery. Returns
+    immediately; sending, retries and reconnects happen on the dispatcher's
+    worker threads (see alert_dispatcher.AlertDispatcher).
+    """
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     message = f"⚠️ {alert_text} detected on {camera_id} at {timestamp}"
-    
-    # Send via email and WhatsApp
-    send_email_alert("Camera Alert", message)
-    send_whatsapp_alert(message)
+
+    if not get_dispatcher().submit("Camera Alert", message):
+        print(f"[WARN] Alert queue full; dropped: {message}")
     print(f"[ALERT] {message}")
 
 def send_alert(alert_type="general", details="", camera_id="unknown"):
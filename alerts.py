@@ -1,31 +1,164 @@
+import os
 import smtplib
-from twilio.rest import Client
+import threading
+
+# Delivery settings; override with environment variables in deployment.
+# ALERT_SMTP_SSL=0 with ALERT_SMTP_HOST=localhost allows testing against a
+# local SMTP stand-in, and TWILIO_BASE_URL points WhatsApp at a fake endpoint.
+SMTP_HOST = os.environ.get("ALERT_SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("ALERT_SMTP_PORT", "465"))
+SMTP_SSL = os.environ.get("ALERT_SMTP_SSL", "1") != "0"
+SENDER_EMAIL = os.environ.get("ALERT_SENDER_EMAIL", "your_email@example.com")
+SENDER_PASSWORD = os.environ.get("ALERT_SENDER_PASSWORD", "your_email_password")
+RECEIVER_EMAIL = os.environ.get("ALERT_RECEIVER_EMAIL", "recipient@example.com")
+
+TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID", "your_twilio_account_sid")
+TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN", "your_twilio_auth_token")
+TWILIO_BASE_URL = os.environ.get("TWILIO_BASE_URL")
+WHATSAPP_FROM = os.environ.get("ALERT_WHATSAPP_FROM", "whatsapp:+8801300155542")
+WHATSAPP_TO = os.environ.get("ALERT_WHATSAPP_TO", "whatsapp:+your_number")
+
+
+class EmailChannel:
+    """
+    Sends alert emails over one persistent SMTP connection. The connection is
+    opened (and logged into) on first use, reused for later messages, and
+    re-established once if the server dropped it.
+    """
+
+    name = "email"
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, use_ssl=SMTP_SSL, username=SENDER_EMAIL,
+                 password=SENDER_PASSWORD, sender=SENDER_EMAIL, recipient=RECEIVER_EMAIL, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.sender = sender
+        self.recipient = recipient
+        self.timeout = timeout
+        self._server = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        smtp_cls = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        server = smtp_cls(self.host, self.port, timeout=self.timeout)
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        return server
+
+    def _drop(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+    def send(self, subject, message):
+        payload = f'Subject: {subject}\n\n{message}'
+        with self._lock:
+            for attempt in range(2):
+                if self._server is None:
+                    self._server = self._connect()
+                try:
+                    self._server.sendmail(self.sender, self.recipient, payload.encode("utf-8"))
+                    return
+                except smtplib.SMTPServerDisconnected:
+                    pass
+                except smtplib.SMTPException:
+                    # The server answered (refused recipient, 4xx/5xx reply): the
+                    # connection is fine and reconnecting would not change the answer
+                    raise
+                except OSError:
+                    pass
+                # Stale pooled connection: reconnect once, then let the caller retry
+                self._drop()
+                if attempt:
+                    raise
+
+    @staticmethod
+    def is_permanent(error):
+        """5xx replies fail the same way on every retry (see AlertDispatcher)."""
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return all(code >= 500 for code, _ in error.recipients.values())
+        return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+    def close(self):
+        with self._lock:
+            self._drop()
+
+
+class WhatsAppChannel:
+    """
+    Sends WhatsApp messages through one reused Twilio client (its HTTP
+    session keeps connections alive). twilio is imported on first send.
+    """
+
+    name = "whatsapp"
+
+    def __init__(self, account_sid=TWILIO_ACCOUNT_SID, auth_token=TWILIO_AUTH_TOKEN,
+                 from_=WHATSAPP_FROM, to=WHATSAPP_TO, base_url=TWILIO_BASE_URL):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_ = from_
+        self.to = to
+        self.base_url = base_url
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                from twilio.rest import Client
+                client = Client(self.account_sid, self.auth_token)
+                if self.base_url:
+                    client.api.base_url = self.base_url.rstrip("/")
+                self._client = client
+            return self._client
+
+    def send(self, subject, message):
+        try:
+            sent = self._get_client().messages.create(body=message, from_=self.from_, to=self.to)
+        except Exception:
+            # Rebuild the client (and its HTTP session) on the next attempt
+            with self._lock:
+                self._client = None
+            raise
+        print(f"WhatsApp message sent: {sent.sid}")
+
+    def close(self):
+        with self._lock:
+            self._client = None
+
+
+_email_channel = None
+_whatsapp_channel = None
+_channel_lock = threading.Lock()
+
+def get_default_channels():
+    """Process-wide channel instances shared by the helpers below and the dispatcher."""
+    global _email_channel, _whatsapp_channel
+    with _channel_lock:
+        if _email_channel is None:
+            _email_channel = EmailChannel()
+        if _whatsapp_channel is None:
+            _whatsapp_channel = WhatsAppChannel()
+        return [_email_channel, _whatsapp_channel]
 
 def send_advanced_alert(subject, message):
     send_email_alert(subject, message)
     send_whatsapp_alert(message)
 
 def send_email_alert(subject, message):
-    sender_email = "your_email@example.com"
-    receiver_email = "recipient@example.com"
-    password = "your_email_password"
     try:
-        server = smtplib.SMTP_SSL('smtp.gmail.com', 465)
-        server.login(sender_email, password)
-        message = f'Subject: {subject}\n\n{message}'
-        server.sendmail(sender_email, receiver_email, message)
-        server.quit()
+        get_default_channels()[0].send(subject, message)
     except Exception as e:
         print(f"Error sending email: {e}")
 
 def send_whatsapp_alert(message):
-    account_sid = "your_twilio_account_sid"
-    auth_token = "your_twilio_auth_token"
-    client = Client(account_sid, auth_token)
-    
-    message = client.messages.create(
-        body=message,
-        from_="whatsapp:+8801300155542",
-        to="whatsapp:+your_number"
-    )
-    print(f"WhatsApp message sent: {message.sid}")
+    try:
+        get_default_channels()[1].send("", message)
+    except Exception as e:
+        print(f"Error sending WhatsApp message: {e}")
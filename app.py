@@ -1,43 +1,45 @@
 # app.py
-import cv2
 import eventlet
-from flask import Flask, Response, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, abort
 from flask_socketio import SocketIO
-from core_processing import process_frame  # Import from core_processing instead of main
 from alert_service import send_alert  # Import alert function from proper module
-from loitering_detector import LoiteringDetector
-from alerts import send_advanced_alert
 from reporting import generate_report
+from streaming import StreamManager
+from metrics import get_metrics
+from db import init_db, load_rollups
+from utils import load_config, processor_options
+from datetime import datetime
 
 app = Flask(__name__)
 socketio = SocketIO(app)
 eventlet.monkey_patch()
 
-loitering_detector = LoiteringDetector()
-cap = cv2.VideoCapture(0)
+camera_feeds = {
+    "live_cam": 0,          # default webcam
+}
 
-def gen_frames():
-    """Generate video frames for web streaming"""
-    while True:
-        success, frame = cap.read()
-        if not success:
-            break
-        
-        # Use the refactored process_frame function
-        processed_frame, alerts = process_frame(frame, camera_id="live_cam", 
-                                              user_email="alif.rahman.c@gmail.com")
-        
-        # Send alerts if any detected
-        if alerts:
-            send_alert(alert_type="live_detection", details=alerts, camera_id="live_cam")
-        
-        _, buffer = cv2.imencode('.jpg', processed_frame)
-        frame_bytes = buffer.tobytes()
-        yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+# One producer per camera processes and encodes each frame once; every
+# viewer shares the encoded bytes (alerts are raised by the producer)
+streams = StreamManager(camera_feeds, processor_options=processor_options(load_config()))
 
 @app.route('/video')
-def video():
-    return Response(gen_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+@app.route('/video/<camera_id>')
+@app.route('/video/<camera_id>/<variant>')
+def video(camera_id="live_cam", variant="full"):
+    # Variants: full, 640p, thumb (see streaming.STREAM_VARIANTS); grid views use thumb
+    stream = streams.get(camera_id, variant)
+    if stream is None:
+        abort(404)
+    return Response(stream.subscribe(variant), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus text format: per-camera stage latency histograms and frame counters
+    return Response(get_metrics().prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/streams', methods=['GET'])
+def stream_stats():
+    return jsonify(streams.stats())
 
 @app.route('/')
 def index():
@@ -60,7 +62,23 @@ def api_send_alert():  # Renamed to avoid conflict
 
 @app.route('/api/reports', methods=['GET'])
 def get_report():
-    data = {"columns": ["time", "in", "out"], "rows": [["2025-04-25 12:00:00", 5, 2]]}
+    # Hourly people flow from the rollup tables (default: last 24 hours)
+    hours = request.args.get('hours', 24, type=int)
+    camera_id = request.args.get('camera_id')
+    end_ms = int(datetime.now().timestamp() * 1000)
+    conn = init_db()
+    columns, rows = load_rollups(conn, "hour", [camera_id] if camera_id else None,
+                                 end_ms - hours * 3600 * 1000, end_ms)
+    conn.close()
+    by_hour = {}
+    for row in rows:
+        rec = dict(zip(columns, row))
+        totals = by_hour.setdefault(rec["bucket_ts"], [0, 0])
+        totals[0] += rec["in_delta"]
+        totals[1] += rec["out_delta"]
+    data = {"columns": ["time", "in", "out"],
+            "rows": [[datetime.fromtimestamp(ts / 1000).strftime("%Y-%m-%d %H:%M:%S"), i, o]
+                     for ts, (i, o) in sorted(by_hour.items())]}
     report_file = generate_report(data, "traffic_report.csv")
     return jsonify({"status": "report generated", "file": report_file})
 
@@ -0,0 +1,111 @@
+# batch_inference.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from detector import PersonDetector
+
+
+class BatchingDetector:
+    """
+    Micro-batching front end for PersonDetector shared by several camera workers.
+
+    Each worker calls detect(frame) (or submit(frame) for a Future). A single
+    inference thread collects pending frames until `max_batch` are queued or
+    `max_wait_ms` has passed since the first one arrived, runs one
+    detect_batch() forward pass, and hands each caller its own boxes.
+    """
+
+    def __init__(self, detector=None, max_batch=8, max_wait_ms=10.0):
+        self.detector = detector if detector is not None else PersonDetector()
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max_wait_ms / 1000.0
+
+        # Stats
+        self.batches = 0
+        self.frames = 0
+        self.last_batch_size = 0
+        self.last_inference_ms = 0.0
+
+        self._queue = queue.Queue()
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="person-batcher")
+        self._thread.start()
+
+    def submit(self, frame, camera_id=None):
+        """Queue a frame for the next batch; the Future resolves to its box list."""
+        future = Future()
+        if not self._running:
+            future.set_exception(RuntimeError("BatchingDetector is closed"))
+            return future
+        self._queue.put((frame, camera_id, future))
+        return future
+
+    def detect(self, frame, camera_id=None, timeout=None):
+        """Drop-in replacement for PersonDetector.detect (blocks until the batch ran)."""
+        return self.submit(frame, camera_id).result(timeout)
+
+    def _collect(self):
+        # Block for the first frame, then fill the batch until size or deadline
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while self._running:
+            batch = self._collect()
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                results = self.detector.detect_batch([frame for frame, _, _ in batch])
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.frames += len(batch)
+            self.last_batch_size = len(batch)
+            self.last_inference_ms = (time.perf_counter() - started) * 1000.0
+            for (_, _, future), boxes in zip(batch, results):
+                future.set_result(boxes)
+
+    def warmup(self):
+        # PersonDetector loads under its own lock, so this is safe beside the inference thread
+        return self.detector.warmup()
+
+    def close(self):
+        self._running = False
+        self._thread.join(2.0)
+        # Fail anything still waiting so callers do not hang
+        while True:
+            try:
+                _, _, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            future.set_exception(RuntimeError("BatchingDetector is closed"))
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "frames": self.frames,
+            "avg_batch_size": round(self.frames / self.batches, 2) if self.batches else 0.0,
+            "last_batch_size": self.last_batch_size,
+            "last_inference_ms": round(self.last_inference_ms, 2),
+            "queued": self._queue.qsize(),
+        }
@@ -0,0 +1,277 @@
+# benchmark_analytics.py
+"""
+Scalability micro-benchmarks for the analytics layer: CentroidTracker,
+LineCounter, ZoneIntrusionDetector and LoiteringDetector.
+
+A deterministic synthetic scene (N simultaneous people entering and leaving,
+occlusion gaps, line crossings) drives every component for a number of
+frames at each scale, and reports per-update latency and memory growth.
+
+    python benchmark_analytics.py                                # 10..5000 objects
+    python benchmark_analytics.py --scales 50 --frames 1000000   # long uptime
+    python benchmark_analytics.py --memory --output analytics.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+from tracker import CentroidTracker
+from line_counter import LineCounter
+from loitering_detector import LoiteringDetector
+from detectors.zone_intrusion import ZoneIntrusionDetector
+from metrics import PipelineMetrics
+
+CAMERA_ID = "synthetic"
+FRAME_SIZE = (1280, 720)
+LINE_FRACTION = 300 / 720  # counting line height relative to the frame, as in the live pipeline
+COMPONENTS = ("tracker", "line_counter", "zones", "loitering")
+
+
+class SyntheticTrajectories:
+    """
+    N people walking through a frame. Each step every person moves by its
+    velocity; people who leave the frame (or randomly exit) are replaced by a
+    new identity entering from an edge, so N stays constant while IDs churn.
+    A small share of people are hidden for a few frames at a time (occlusion).
+    Vertical velocity is biased so people cross the counting line.
+    """
+
+    def __init__(self, n_objects, frame_size=FRAME_SIZE, occlusion=0.02, gap=(2, 8),
+                 exit_rate=0.002, box_size=(40, 100), seed=0):
+        self.n = n_objects
+        self.width, self.height = frame_size
+        self.occlusion = occlusion
+        self.gap = gap
+        self.exit_rate = exit_rate
+        self.half = np.array(box_size, dtype=np.float64) / 2.0
+        self.rng = np.random.default_rng(seed)
+        self.pos = np.column_stack([self.rng.uniform(0, self.width, n_objects),
+                                    self.rng.uniform(0, self.height, n_objects)])
+        self.vel = self._velocities(n_objects)
+        self.ids = np.arange(n_objects)
+        self.next_id = n_objects
+        self.hidden = np.zeros(n_objects, dtype=np.int32)
+        self.entered = 0
+
+    def _velocities(self, count):
+        vx = self.rng.normal(0.0, 2.0, count)
+        vy = self.rng.choice([-1.0, 1.0], count) * self.rng.uniform(1.0, 4.0, count)
+        return np.column_stack([vx, vy])
+
+    def _respawn(self, mask):
+        count = int(mask.sum())
+        if not count:
+            return
+        # Enter from the top or bottom edge, heading into the frame
+        top = self.rng.random(count) < 0.5
+        x = self.rng.uniform(0, self.width, count)
+        y = np.where(top, 0.0, self.height - 1.0)
+        vel = self._velocities(count)
+        vel[:, 1] = np.where(top, np.abs(vel[:, 1]), -np.abs(vel[:, 1]))
+        self.pos[mask] = np.column_stack([x, y])
+        self.vel[mask] = vel
+        self.ids[mask] = np.arange(self.next_id, self.next_id + count)
+        self.next_id += count
+        self.hidden[mask] = 0
+        self.entered += count
+
+    def step(self):
+        """Advance one frame; returns the detection boxes of visible people."""
+        self.pos += self.vel
+        outside = ((self.pos[:, 0] < 0) | (self.pos[:, 0] >= self.width)
+                   | (self.pos[:, 1] < 0) | (self.pos[:, 1] >= self.height))
+        self._respawn(outside | (self.rng.random(self.n) < self.exit_rate))
+
+        self.hidden = np.maximum(self.hidden - 1, 0)
+        start_gap = (self.hidden == 0) & (self.rng.random(self.n) < self.occlusion)
+        self.hidden[start_gap] = self.rng.integers(self.gap[0], self.gap[1] + 1, int(start_gap.sum()))
+        visible = self.pos[self.hidden == 0]
+
+        boxes = np.concatenate([visible - self.half, visible + self.half], axis=1)
+        return boxes.astype(np.int32).tolist()
+
+
+def scene_size(n_objects, density):
+    """
+    Frame size (16:9, at least FRAME_SIZE) giving each person about `density`
+    square pixels, so large crowds stay physically plausible instead of
+    piling thousands of boxes onto one 720p frame.
+    """
+    area = max(FRAME_SIZE[0] * FRAME_SIZE[1], n_objects * density)
+    height = int(round((area * 9 / 16) ** 0.5))
+    return max(FRAME_SIZE[0], height * 16 // 9), max(FRAME_SIZE[1], height)
+
+
+def write_zone_config(path, frame_size, lines=4):
+    """
+    A handful of restricted zones, one regular zone and `lines` counting
+    lines (door segments side by side at the counting height) for the
+    synthetic camera.
+    """
+    w, h = frame_size
+    zones = []
+    for i, (x, y) in enumerate([(0.1, 0.1), (0.6, 0.2), (0.3, 0.6), (0.75, 0.7)]):
+        x1, y1, x2, y2 = int(x * w), int(y * h), int((x + 0.15) * w), int((y + 0.2) * h)
+        zones.append({"id": f"restricted_{i}", "type": "restricted",
+                      "points": [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]})
+    zones.append({"id": "aisle", "type": "zone", "loiter_seconds": 30,
+                  "points": [[0, 0], [w // 2, 0], [w // 2, h], [0, h]]})
+    line_y = int(h * LINE_FRACTION)
+    for i in range(lines):
+        x1, x2 = int(w * i / lines), int(w * (i + 1) / lines)
+        zones.append({"id": f"door_{i}", "type": "line", "points": [[x1, line_y], [x2, line_y]]})
+    with open(path, "w") as f:
+        json.dump({CAMERA_ID: zones}, f)
+
+
+def container_sizes(obj):
+    """len() of every container attribute of a component; unbounded growth shows up here."""
+    sizes = {}
+    for name, value in vars(obj).items():
+        if isinstance(value, (dict, list, set, deque)):
+            sizes[name] = len(value)
+        elif isinstance(value, np.ndarray):
+            sizes[name] = int(value.size)
+    return sizes
+
+
+def run_scale(n_objects, frames, zone_config, args):
+    frame_size = scene_size(n_objects, args.density)
+    write_zone_config(zone_config, frame_size, args.lines)
+    scene = SyntheticTrajectories(n_objects, frame_size=frame_size, occlusion=args.occlusion,
+                                  seed=args.seed)
+    zone_detector = ZoneIntrusionDetector(zone_config)
+    components = {
+        "tracker": CentroidTracker(),
+        "line_counter": LineCounter(line_position=int(frame_size[1] * LINE_FRACTION),
+                                    lines=zone_detector.lines(CAMERA_ID)),
+        "zones": zone_detector,
+        "loitering": LoiteringDetector(),
+    }
+    tracker = components["tracker"]
+    counter = components["line_counter"]
+    zones = components["zones"]
+    loitering = components["loitering"]
+
+    metrics = PipelineMetrics()
+    label = f"n={n_objects}"
+    warmup = min(args.warmup, frames // 2)
+    checkpoints = []
+    memory_start = None
+    wall_start = time.perf_counter()
+
+    for frame_index in range(frames):
+        if frame_index == warmup:
+            metrics = PipelineMetrics()
+            if args.memory:
+                memory_start = tracemalloc.get_traced_memory()[0]
+
+        rects = scene.step()
+        t = time.perf_counter()
+        tracked = tracker.update(rects)
+        t = metrics.lap(label, "tracker", t)
+        # Simulated clock, so long runs rotate through the whole history ring
+        counter.update(tracked, now=frame_index / args.fps)
+        t = metrics.lap(label, "line_counter", t)
+        zones.detect_intrusions(CAMERA_ID, tracked, frame_size)
+        t = metrics.lap(label, "zones", t)
+        loitering.update(tracked, frame_index / args.fps, zones.compiled(CAMERA_ID, frame_size))
+        metrics.lap(label, "loitering", t)
+
+        if args.memory and memory_start is not None and (frame_index + 1) % args.checkpoint == 0:
+            checkpoints.append((frame_index + 1, tracemalloc.get_traced_memory()[0] - memory_start))
+
+    wall = time.perf_counter() - wall_start
+    measured = frames - warmup
+    result = {
+        "objects": n_objects,
+        "frame_size": list(frame_size),
+        "frames": frames,
+        "identities": scene.next_id,
+        "wall_s": round(wall, 3),
+        "stages": metrics.snapshot().get(label, {}).get("stages", {}),
+        "sizes": {name: container_sizes(component) for name, component in components.items()},
+        "counts": {"in": counter.count_in, "out": counter.count_out},
+    }
+    if args.memory and measured > 0:
+        growth = checkpoints[-1][1] if checkpoints else tracemalloc.get_traced_memory()[0] - memory_start
+        result["memory"] = {
+            "growth_kb": round(growth / 1024, 1),
+            "growth_kb_per_1k_frames": round(growth / 1024 / measured * 1000, 2),
+            "checkpoints": [{"frame": f, "kb": round(b / 1024, 1)} for f, b in checkpoints],
+        }
+    return result
+
+
+def print_result(result):
+    print(f"\n[INFO] {result['objects']} objects in {result['frame_size'][0]}x{result['frame_size'][1]}, "
+          f"{result['frames']} frames, "
+          f"{result['identities']} identities, {result['wall_s']} s "
+          f"(in={result['counts']['in']} out={result['counts']['out']})")
+    for stage in COMPONENTS:
+        stats = result["stages"].get(stage)
+        if stats:
+            print(f"  {stage:<13} mean={stats['mean_ms']:>9} ms  p50={stats['p50_ms']:>9} ms  "
+                  f"p99={stats['p99_ms']:>9} ms")
+    memory = result.get("memory")
+    if memory:
+        print(f"  memory growth {memory['growth_kb']} KB ({memory['growth_kb_per_1k_frames']} KB / 1k frames)")
+    for name, sizes in result["sizes"].items():
+        big = {k: v for k, v in sizes.items() if v > 0}
+        if big:
+            print(f"  {name:<13} containers {big}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analytics scalability benchmark")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100, 1000, 5000],
+                        help="simultaneous object counts to run")
+    parser.add_argument("--frames", type=int, default=500, help="frames per scale")
+    parser.add_argument("--warmup", type=int, default=20, help="frames before measuring")
+    parser.add_argument("--density", type=int, default=150 * 150,
+                        help="square pixels per person; the frame grows past 1280x720 to keep this")
+    parser.add_argument("--occlusion", type=float, default=0.02,
+                        help="per-frame chance that a visible person starts an occlusion gap")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--lines", type=int, default=4, help="counting lines (door segments) per camera")
+    parser.add_argument("--fps", type=float, default=30.0, help="frame rate of the synthetic timeline")
+    parser.add_argument("--memory", action="store_true",
+                        help="track Python allocations with tracemalloc (slower)")
+    parser.add_argument("--checkpoint", type=int, default=1000,
+                        help="frames between memory checkpoints")
+    parser.add_argument("--output", help="write JSON results here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.memory:
+        tracemalloc.start()
+
+    handle, zone_config = tempfile.mkstemp(suffix=".json")
+    os.close(handle)
+    try:
+        results = []
+        for n_objects in args.scales:
+            result = run_scale(n_objects, args.frames, zone_config, args)
+            print_result(result)
+            results.append(result)
+    finally:
+        os.remove(zone_config)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"created": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results}, f, indent=2)
+        print(f"\n[INFO] Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
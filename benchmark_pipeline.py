@@ -0,0 +1,233 @@
+# benchmark_pipeline.py
+"""
+Headless end-to-end benchmark for SurveillanceProcessor.
+
+Replays a video file (or synthetic frames) through the pipeline as fast as
+possible, without windows, alerts or DB logging, and reports FPS, per-stage
+latency percentiles, peak RSS and CPU utilization.
+
+    python benchmark_pipeline.py --video data/test_videos/sample.mp4 --output bench.json
+    python benchmark_pipeline.py --synthetic 600 --stages analytics zones draw
+    python benchmark_pipeline.py --video clip.mp4 --baseline bench_baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from core_processing import SurveillanceProcessor, STAGES
+from metrics import PipelineMetrics
+
+CAMERA_ID = "bench"
+# (metric path, higher_is_better) compared against a baseline
+HEADLINE = [("fps", True), ("end_to_end_fps", True), ("peak_rss_mb", False)]
+
+
+class _DiscardingLogWriter:
+    """Keeps benchmark runs out of the dashboard database."""
+
+    def write(self, entry):
+        return True
+
+    def flush(self, timeout=None):
+        return True
+
+
+def synthetic_frames(count, width=1280, height=720, people=6, seed=0):
+    """Deterministic frames with a few person-sized blobs walking across a noisy background."""
+    rng = np.random.default_rng(seed)
+    background = rng.integers(60, 120, size=(height, width, 3), dtype=np.uint8)
+    starts = rng.uniform((0, height * 0.2), (width, height * 0.8), size=(people, 2))
+    velocities = rng.uniform(-6, 6, size=(people, 2))
+    for i in range(count):
+        frame = background.copy()
+        for (x, y), (vx, vy) in zip(starts, velocities):
+            cx = int((x + vx * i) % width)
+            cy = int(np.clip(y + vy * i * 0.3, 60, height - 60))
+            cv2.rectangle(frame, (cx - 25, cy - 70), (cx + 25, cy + 70), (40, 40, 180), -1)
+            cv2.circle(frame, (cx, cy - 90), 20, (150, 170, 210), -1)
+        yield frame
+
+
+def video_frames(path, limit=None, loop=False):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"[ERROR] Cannot open video: {path}")
+    produced = 0
+    try:
+        while limit is None or produced < limit:
+            ok, frame = cap.read()
+            if not ok:
+                if loop and produced:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                break
+            produced += 1
+            yield frame
+    finally:
+        cap.release()
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run(args):
+    metrics = PipelineMetrics()
+    processor = SurveillanceProcessor(detect_every=args.detect_every, stages=args.stages,
+                                      metrics=metrics, log_writer=_DiscardingLogWriter())
+
+    if args.video:
+        frames = video_frames(args.video, limit=args.frames + args.warmup if args.frames else None,
+                              loop=args.loop)
+        source = args.video
+    else:
+        width, height = args.size
+        frames = synthetic_frames(args.synthetic + args.warmup, width, height)
+        source = f"synthetic:{args.synthetic}x{width}x{height}"
+
+    processed = 0
+    wall_start = cpu_start = None
+    decode_start = time.perf_counter()
+    for index, frame in enumerate(frames):
+        decoded = time.perf_counter() - decode_start
+        if index == args.warmup:
+            # Measure only after warm-up (model initialization, caches, allocator)
+            processor.metrics = metrics = PipelineMetrics()
+            wall_start = time.perf_counter()
+            cpu_start = cpu_seconds()
+        metrics.observe(CAMERA_ID, "decode", decoded)
+        # Media time at 30 FPS, so dwell times match a real-time run
+        processor._process_single_frame(frame, CAMERA_ID, timestamp=index / 30.0)
+        if wall_start is not None:
+            processed += 1
+        decode_start = time.perf_counter()
+
+    if wall_start is None or not processed:
+        raise SystemExit("[ERROR] No frames were measured (source shorter than --warmup?)")
+    wall = time.perf_counter() - wall_start
+    cpu = cpu_seconds() - cpu_start
+
+    for heatmap in processor.heatmaps.values():
+        heatmap.stop(flush=False)
+    processor.close()
+
+    snapshot = metrics.snapshot().get(CAMERA_ID, {"stages": {}})
+    frame_ms = snapshot["stages"].get("frame", {}).get("mean_ms", 0.0)
+    return {
+        "meta": {
+            "source": source,
+            "stages": sorted(processor.stages),
+            "detect_every": args.detect_every,
+            "frames": processed,
+            "warmup": args.warmup,
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "fps": round(1000.0 / frame_ms, 2) if frame_ms else 0.0,
+        "end_to_end_fps": round(processed / wall, 2),
+        "wall_s": round(wall, 3),
+        "cpu_percent": round(100.0 * cpu / wall, 1),
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": snapshot["stages"],
+    }
+
+
+def compare(result, baseline, tolerance, min_delta_ms=0.05):
+    """
+    Print a comparison table; return the list of regressions beyond `tolerance`.
+    Stage latencies that moved less than `min_delta_ms` are treated as noise.
+    """
+    rows = [(name, result.get(name), baseline.get(name), higher) for name, higher in HEADLINE]
+    for stage, stats in result["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base:
+            for key in ("p50_ms", "p99_ms"):
+                rows.append((f"{stage}.{key}", stats.get(key), base.get(key), False))
+
+    regressions = []
+    print(f"{'metric':<24}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, current, base, higher in rows:
+        if current is None or not base:
+            continue
+        change = (current - base) / base
+        worse = -change if higher else change
+        flag = ""
+        if name.endswith("_ms") and abs(current - base) < min_delta_ms:
+            worse = 0.0
+        if worse > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<24}{base:>12}{current:>12}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Headless SurveillanceProcessor benchmark")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--video", help="video file to replay")
+    source.add_argument("--synthetic", type=int, default=300, help="number of synthetic frames (default)")
+    parser.add_argument("--size", type=int, nargs=2, default=(1280, 720), metavar=("W", "H"),
+                        help="synthetic frame size")
+    parser.add_argument("--frames", type=int, help="max measured frames from --video")
+    parser.add_argument("--loop", action="store_true", help="loop --video until --frames are measured")
+    parser.add_argument("--warmup", type=int, default=10, help="frames processed before measuring")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES),
+                        help="pipeline stages to enable (default: all)")
+    parser.add_argument("--detect-every", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON result here")
+    parser.add_argument("--baseline", help="compare against a previous JSON result")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed relative regression vs baseline (default 0.10)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05,
+                        help="ignore stage latency changes smaller than this (default 0.05 ms)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run(args)
+
+    print(f"[INFO] {result['meta']['frames']} frames from {result['meta']['source']} "
+          f"stages={','.join(result['meta']['stages'])}")
+    print(f"[INFO] {result['fps']} FPS pipeline, {result['end_to_end_fps']} FPS end-to-end, "
+          f"CPU {result['cpu_percent']}%, peak RSS {result['peak_rss_mb']} MB")
+    for stage, stats in result["stages"].items():
+        print(f"  {stage:<10} p50={stats['p50_ms']:>8} ms  p90={stats['p90_ms']:>8} ms  "
+              f"p99={stats['p99_ms']:>8} ms  n={stats['count']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"[INFO] Result written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("stages") != result["meta"]["stages"]:
+            print("[WARN] Baseline was recorded with different stages; comparison may be misleading")
+        regressions = compare(result, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"[ERROR] Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# benchmark_startup.py
+"""
+Startup budget check: import time of the pipeline modules and the cost of
+(re)starting a camera worker, each measured in a fresh interpreter.
+
+Models load on first use, so neither importing core_processing nor
+constructing a SurveillanceProcessor may pull in ultralytics, mediapipe or
+twilio. Exits with 1 when a budget is exceeded or a heavy module is loaded.
+
+    python benchmark_startup.py
+    python benchmark_startup.py --import-budget 0.5 --output startup.json
+    python benchmark_startup.py --warmup        # also time loading every model
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MODULES = ("core_processing", "camera_supervisor", "streaming")
+# Must not be imported until a stage actually runs
+HEAVY_MODULES = ("ultralytics", "torch", "mediapipe", "twilio")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter() - start
+result = {{"import_s": imported}}
+if {construct}:
+    from core_processing import SurveillanceProcessor
+
+    class _NullWriter:
+        def write(self, entry):
+            return True
+
+    start = time.perf_counter()
+    processor = SurveillanceProcessor(log_writer=_NullWriter(), background_warmup=False)
+    result["construct_s"] = time.perf_counter() - start
+    if {warmup}:
+        start = time.perf_counter()
+        processor.warm_up(background=False)
+        result["warmup_s"] = time.perf_counter() - start
+result["heavy"] = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps(result))
+"""
+
+
+def probe(module, construct=False, warmup=False):
+    """Import `module` (and optionally build a processor) in a new interpreter."""
+    code = _PROBE.format(module=module, construct=construct, warmup=warmup, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise SystemExit(f"[ERROR] Importing {module} failed:\n{proc.stderr.strip()}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_s"] = wall
+    return result
+
+
+def run(args):
+    results = {}
+    for module in MODULES:
+        samples = [probe(module) for _ in range(args.repeat)]
+        results[module] = {
+            "import_s": round(min(s["import_s"] for s in samples), 3),
+            "process_s": round(min(s["process_s"] for s in samples), 3),
+            "heavy": samples[0]["heavy"],
+        }
+
+    samples = [probe("core_processing", construct=True) for _ in range(args.repeat)]
+    restart = {
+        "construct_s": round(min(s["construct_s"] for s in samples), 3),
+        # A process worker restart pays for a new interpreter, the imports and the constructor
+        "process_s": round(min(s["process_s"] for s in samples), 3),
+        "heavy": samples[0]["heavy"],
+    }
+    if args.warmup:
+        restart["warmup_s"] = round(probe("core_processing", construct=True, warmup=True)["warmup_s"], 3)
+    return {"created": time.strftime("%Y-%m-%d %H:%M:%S"), "modules": results, "restart": restart}
+
+
+def check(result, args):
+    """Print the results; return the list of budget violations."""
+    failures = []
+    for module, stats in result["modules"].items():
+        print(f"[INFO] import {module:<18} {stats['import_s']:>7.3f} s "
+              f"(interpreter total {stats['process_s']:.3f} s)")
+        if stats["import_s"] > args.import_budget:
+            failures.append(f"import {module} took {stats['import_s']} s > {args.import_budget} s")
+        if stats["heavy"]:
+            failures.append(f"import {module} loaded {', '.join(stats['heavy'])}")
+
+    restart = result["restart"]
+    print(f"[INFO] SurveillanceProcessor() {restart['construct_s']:>7.3f} s, "
+          f"process worker restart {restart['process_s']:.3f} s")
+    if "warmup_s" in restart:
+        print(f"[INFO] model warm-up       {restart['warmup_s']:>7.3f} s (off the frame path)")
+    if restart["construct_s"] > args.construct_budget:
+        failures.append(f"SurveillanceProcessor() took {restart['construct_s']} s > {args.construct_budget} s")
+    if restart["process_s"] > args.restart_budget:
+        failures.append(f"worker restart took {restart['process_s']} s > {args.restart_budget} s")
+    if restart["heavy"]:
+        failures.append(f"SurveillanceProcessor() loaded {', '.join(restart['heavy'])}")
+    return failures
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time and worker restart budget check")
+    parser.add_argument("--import-budget", type=float, default=1.0,
+                        help="max seconds to import each pipeline module (default 1.0)")
+    parser.add_argument("--construct-budget", type=float, default=0.25,
+                        help="max seconds for SurveillanceProcessor() (default 0.25)")
+    parser.add_argument("--restart-budget", type=float, default=1.0,
+                        help="max seconds for interpreter + imports + constructor (default 1.0)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the best is kept")
+    parser.add_argument("--warmup", action="store_true",
+                        help="also time warm_up() (needs the model files)")
+    parser.add_argument("--output", help="write JSON results here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run(args)
+    failures = check(result, args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"[INFO] Results written to {args.output}")
+
+    if failures:
+        for failure in failures:
+            print(f"[ERROR] {failure}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
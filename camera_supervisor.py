@@ -0,0 +1,203 @@
+# camera_supervisor.py
+import threading
+import multiprocessing as mp
+import time
+from typing import Dict, Optional
+
+from batch_inference import BatchingDetector
+from core_processing import SurveillanceProcessor
+from detector import PersonDetector
+
+
+class SharedPersonDetector:
+    """
+    Thread-safe wrapper so several camera threads can share one YOLO model.
+    Ultralytics predictors are not re-entrant, so calls are serialized.
+    """
+
+    def __init__(self, detector=None):
+        self.detector = detector if detector is not None else PersonDetector()
+        self._lock = threading.Lock()
+
+    def detect(self, frame):
+        with self._lock:
+            return self.detector.detect(frame)
+
+    def warmup(self):
+        return self.detector.warmup()
+
+
+class _Counter:
+    """Minimal stand-in for multiprocessing.Value used by thread workers."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class _CameraWorker:
+    """Book-keeping for one running camera (thread or process)."""
+
+    def __init__(self, camera_id, source, handle, stop_event, frames, fps, dropped):
+        self.camera_id = camera_id
+        self.source = source
+        self.handle = handle
+        self.stop_event = stop_event
+        self.frames = frames
+        self.fps = fps
+        self.dropped = dropped
+        self.started_at = time.time()
+
+    def is_alive(self):
+        return self.handle.is_alive()
+
+
+def _run_camera_process(camera_id, source, stop_event, frames, fps, dropped, show_windows,
+                        processor_options):
+    """
+    Entry point for process workers. Every process loads its own models,
+    so nothing heavy is pickled across the process boundary.
+    """
+    def report(n, rate, capture_stats):
+        frames.value = n
+        fps.value = rate
+        dropped.value = capture_stats["dropped"]
+
+    processor = SurveillanceProcessor(**processor_options)
+    processor.process_camera_stream(camera_id, source, stop_event=stop_event,
+                                    on_stats=report, show_windows=show_windows)
+
+
+class CameraSupervisor:
+    """
+    Runs each camera stream in its own worker and keeps per-camera stats.
+
+    mode="thread": workers share one PersonDetector; with max_batch > 1 frames
+                   from all cameras are micro-batched into one forward pass
+                   (see batch_inference.BatchingDetector), otherwise calls are
+                   serialized via a lock. Tracker/line counter/loitering state
+                   stays per camera.
+    mode="process": each worker is a separate process with its own models;
+                    scales past the GIL at the cost of memory per camera.
+
+    Cameras can be added or removed at runtime without touching the others.
+    processor_options are passed to every SurveillanceProcessor (e.g. detect_every).
+    """
+
+    def __init__(self, mode="thread", show_windows=False, max_batch=8, max_wait_ms=10.0,
+                 processor_options=None):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown worker mode: {mode!r} (expected 'thread' or 'process')")
+        self.mode = mode
+        self.show_windows = show_windows
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.processor_options = dict(processor_options or {})
+        self.workers: Dict[str, _CameraWorker] = {}
+        self._lock = threading.Lock()
+        self._shared_detector: Optional[SharedPersonDetector | BatchingDetector] = None
+
+    def _get_shared_detector(self):
+        # Loaded on first thread worker so process mode never pays for it
+        if self._shared_detector is None:
+            if self.max_batch > 1:
+                self._shared_detector = BatchingDetector(max_batch=self.max_batch,
+                                                         max_wait_ms=self.max_wait_ms)
+            else:
+                self._shared_detector = SharedPersonDetector()
+        return self._shared_detector
+
+    def add_camera(self, camera_id, source):
+        """Start a worker for camera_id. Raises if it is already running."""
+        with self._lock:
+            existing = self.workers.get(camera_id)
+            if existing is not None and existing.is_alive():
+                raise ValueError(f"Camera {camera_id!r} is already running")
+
+            if self.mode == "process":
+                stop_event = mp.Event()
+                frames = mp.Value("i", 0)
+                fps = mp.Value("d", 0.0)
+                dropped = mp.Value("i", 0)
+                handle = mp.Process(
+                    target=_run_camera_process,
+                    args=(camera_id, source, stop_event, frames, fps, dropped, self.show_windows,
+                          self.processor_options),
+                    name=f"camera-{camera_id}",
+                    daemon=True,
+                )
+                worker = _CameraWorker(camera_id, source, handle, stop_event, frames, fps, dropped)
+            else:
+                stop_event = threading.Event()
+                worker = _CameraWorker(camera_id, source, None, stop_event,
+                                       _Counter(0), _Counter(0.0), _Counter(0))
+                processor = SurveillanceProcessor(detector=self._get_shared_detector(),
+                                                  **self.processor_options)
+
+                def report(n, rate, capture_stats, w=worker):
+                    w.frames.value = n
+                    w.fps.value = rate
+                    w.dropped.value = capture_stats["dropped"]
+
+                worker.handle = threading.Thread(
+                    target=processor.process_camera_stream,
+                    args=(camera_id, source),
+                    kwargs={"stop_event": stop_event, "on_stats": report,
+                            "show_windows": self.show_windows},
+                    name=f"camera-{camera_id}",
+                    daemon=True,
+                )
+
+            self.workers[camera_id] = worker
+            worker.handle.start()
+            print(f"[INFO] Started {self.mode} worker for {camera_id}: {source}")
+
+    def remove_camera(self, camera_id, timeout=5.0):
+        """Signal one worker to stop and wait for it; other cameras keep running."""
+        with self._lock:
+            worker = self.workers.pop(camera_id, None)
+        if worker is None:
+            return False
+
+        worker.stop_event.set()
+        worker.handle.join(timeout)
+        if worker.handle.is_alive() and self.mode == "process":
+            print(f"[WARN] {camera_id}: worker did not stop in {timeout}s; terminating.")
+            worker.handle.terminate()
+            worker.handle.join(1.0)
+        print(f"[INFO] Stopped worker for {camera_id}")
+        return True
+
+    def stop_all(self, timeout=5.0):
+        for camera_id in list(self.workers):
+            self.remove_camera(camera_id, timeout)
+        if isinstance(self._shared_detector, BatchingDetector):
+            self._shared_detector.close()
+            self._shared_detector = None
+
+    def detector_stats(self):
+        """Batching stats for the shared detector (empty unless micro-batching)."""
+        if isinstance(self._shared_detector, BatchingDetector):
+            return self._shared_detector.stats()
+        return {}
+
+    def stats(self):
+        """Per-camera snapshot: {camera_id: {"alive", "frames", "fps", "dropped", "uptime"}}."""
+        with self._lock:
+            workers = list(self.workers.values())
+        now = time.time()
+        return {
+            w.camera_id: {
+                "alive": w.is_alive(),
+                "frames": w.frames.value,
+                "fps": round(w.fps.value, 2),
+                "dropped": w.dropped.value,
+                "uptime": round(now - w.started_at, 1),
+            }
+            for w in workers
+        }
+
+    def any_alive(self):
+        with self._lock:
+            return any(w.is_alive() for w in self.workers.values())
@@ -1,22 +1,29 @@
 # core_processing.py
-import sys
+import threading
+import time
 import cv2
 import numpy as np
 from datetime import datetime
 
-from detector import PersonDetector, detect_faces
+from detector import PersonDetector, FaceDetector
 from tracker import CentroidTracker
 from line_counter import LineCounter
 from pose_utils import PoseDetector
-from posture_classifier import PostureClassifier, DemographicsDetector
-from object_detector import ObjectDetector
+from posture_classifier import PostureClassifier, TrackDemographics
 from loitering_detector import LoiteringDetector
 from detectors.zone_intrusion import ZoneIntrusionDetector
-from db import init_db, insert_log  # logging to SQLite
+from db import get_log_writer  # background logging to SQLite
+from frame_source import FrameGrabber
+from heatmap import HeatmapAccumulator
+from alert_engine import AlertEngine
+from metrics import get_metrics
 
 # Toggle this to show OpenCV windows (requires GUI-enabled OpenCV)
 SHOW_WINDOWS = True
 
+# Optional pipeline stages; tracking, alerts and the HUD always run
+STAGES = ("detect", "analytics", "zones", "draw", "face_blur", "demographics", "pose")
+
 class SurveillanceProcessor:
     """
     Reusable, per-process pipeline that:
@@ -25,126 +32,355 @@ class SurveillanceProcessor:
       - logs periodic rows to SQLite for the dashboard
     """
 
-    def __init__(self):
-        # Reuse heavy components for performance
-        self.detector = PersonDetector()
+    def __init__(self, detector=None, detect_every=1, max_drift=25.0, pose_workers=0,
+                 log_writer=None, alert_engine=None, crowd_threshold=10, crowd_clear=8,
+                 metrics=None, stages=None, background_warmup=True):
+        # Enabled stages (default: all of STAGES); benchmarks run subsets
+        self.stages = frozenset(STAGES if stages is None else stages)
+        unknown = self.stages - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown pipeline stages: {sorted(unknown)}; expected some of {STAGES}")
+
+        # Reuse heavy components for performance. A detector can be passed in
+        # so several per-camera processors share one model (see camera_supervisor).
+        # Models load on first use, so construction (and a camera restart) is cheap;
+        # process_camera_stream warms them up in the background while capture opens.
+        if detector is None and "detect" in self.stages:
+            detector = PersonDetector()
+        self.detector = detector
+
+        # Keyframe detection: run the detector every `detect_every` frames (or
+        # sooner when tracks drift/miss) and let the tracker predict in between
+        self.detect_every = max(1, int(detect_every))
+        self.max_drift = max_drift
+        self.frames_since_detection = 0
+
+        # Per-camera state: one processor instance per camera stream
         self.tracker = CentroidTracker()
-        self.pose_detector = PoseDetector()
-        self.object_detector = ObjectDetector()
+        self.face_detector = (FaceDetector() if {"face_blur", "demographics"} & self.stages
+                              else None)
+        self.pose_detector = PoseDetector(workers=pose_workers) if "pose" in self.stages else None
         self.zone_detector = ZoneIntrusionDetector()
         self.posture_classifier = PostureClassifier()
-        self.demographics_detector = DemographicsDetector()
+        # Age/gender per track: a few batched classifications per visit, not every frame
+        self.demographics = TrackDemographics() if "demographics" in self.stages else None
+        self.track_demographics = {}
         self.loitering_detector = LoiteringDetector()
         self.counter = LineCounter(line_position=300)
+        self._counter_camera = None  # camera whose configured lines the counter uses
+
+        # Occupancy heatmaps per camera, written to logs/ in the background
+        self.heatmaps = {}
+        self.heatmap_interval = 30.0
+
+        # Batched background writer shared by all cameras in this process
+        self.log_writer = log_writer if log_writer is not None else get_log_writer()
+
+        # Per-frame alert conditions go through the engine (cooldowns, hysteresis,
+        # digests) instead of straight to email/WhatsApp
+        self.alert_engine = alert_engine if alert_engine is not None else AlertEngine()
+        self.alert_events = []
+        # Crowd alert turns on above crowd_threshold people and off at crowd_clear or fewer
+        self.crowd_threshold = crowd_threshold
+        self.crowd_clear = crowd_clear
+        self.crowded = False
 
-        # Shared DB connection for inserts
-        self.conn = init_db()
+        # Per-stage timers and frame counters (exported by app.py at /metrics)
+        self.metrics = metrics if metrics is not None else get_metrics()
+        self.background_warmup = background_warmup
+        self._warmup_thread = None
 
-    def _process_single_frame(self, frame, camera_id="live_cam"):
+    def warm_up(self, background=True):
+        """
+        Load the models of the enabled stages now instead of on first use.
+        With background=True this runs on a daemon thread and returns it.
+        """
+        components = [c for c in (self.detector, self.pose_detector, self.demographics)
+                      if c is not None and hasattr(c, "warmup")]
+
+        def run():
+            start = time.perf_counter()
+            for component in components:
+                try:
+                    component.warmup()
+                except Exception as e:
+                    # Not fatal here; the stage raises again when it first runs
+                    print(f"[WARN] Warm-up of {type(component).__name__} failed: {e}")
+            print(f"[INFO] Models warmed up in {time.perf_counter() - start:.1f}s")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, daemon=True, name="model-warmup")
+        thread.start()
+        self._warmup_thread = thread
+        return thread
+
+    def close(self):
+        """
+        Release what the models hold between frames (pose worker threads and
+        MediaPipe graphs). Called when process_camera_stream ends; a later
+        stream loads them again on first use.
+        """
+        if self._warmup_thread is not None:
+            # Models must not be built after they were released
+            self._warmup_thread.join()
+            self._warmup_thread = None
+        if self.pose_detector is not None:
+            self.pose_detector.close()
+
+    def _disable_stage(self, stage):
+        # A stage whose models failed to load is off for the rest of the run
+        self.stages = self.stages - {stage}
+        if not {"face_blur", "demographics"} & self.stages:
+            self.face_detector = None
+
+    def _get_heatmap(self, camera_id, frame):
+        h, w = frame.shape[:2]
+        heatmap = self.heatmaps.get(camera_id)
+        if heatmap is None:
+            heatmap = HeatmapAccumulator(camera_id, frame_size=(w, h))
+            heatmap.start(self.heatmap_interval)
+            self.heatmaps[camera_id] = heatmap
+        else:
+            heatmap.ensure_frame_size(w, h)
+        return heatmap
+
+    def _process_single_frame(self, frame, camera_id="live_cam", timestamp=None):
         """
         Process one frame and return: processed_frame, alerts_text, posture_label.
+        timestamp is the capture time in seconds (media time for files, see
+        frame_source.FrameGrabber); it drives dwell times. Defaults to now.
+        The frame's alert conditions are left in self.alert_events as
+        (type, subject) pairs for the alert engine.
         """
         alert_text = ""
+        events = []
+        metrics = self.metrics
+        frame_start = t = time.perf_counter()
+        if timestamp is None:
+            timestamp = time.time()
+        frame_size = (frame.shape[1], frame.shape[0])
+
+        # People detection (keyframes only), tracking, counting
+        stages = self.stages
+        self.frames_since_detection += 1
+        if "detect" not in stages:
+            tracked = self.tracker.predict()
+            boxes = []
+        elif (self.frames_since_detection >= self.detect_every
+                or self.tracker.needs_detection(self.max_drift)):
+            boxes = self.detector.detect(frame)
+            t = metrics.lap(camera_id, "detect", t)
+            tracked = self.tracker.update(boxes)
+            self.frames_since_detection = 0
+            metrics.count(camera_id, "detections")
+        else:
+            tracked = self.tracker.predict()
+            boxes = [[int(v) for v in box] for box in self.tracker.boxes.values()]
+        t = metrics.lap(camera_id, "track", t)
+        loitering = []
+        if "analytics" in stages:
+            if self._counter_camera != camera_id:
+                self.counter.configure(self.zone_detector.lines(camera_id))
+                self._counter_camera = camera_id
+            self.counter.update(tracked)
+            self._get_heatmap(camera_id, frame).add(list(tracked.values()))
+            loitering = self.loitering_detector.update(
+                tracked, timestamp, self.zone_detector.compiled(camera_id, frame_size))
+            t = metrics.lap(camera_id, "analytics", t)
 
-        # People detection, tracking, counting
-        boxes = self.detector.detect(frame)
-        tracked = self.tracker.update(boxes)
-        self.counter.update(tracked)
+        # Faces inside tracked person boxes, found before zones, boxes and labels are
+        # drawn over them, so demographics gets clean crops
+        faces_by_track = {}
+        if self.face_detector is not None:
+            faces_by_track = self.face_detector.detect(frame, self.tracker.boxes)
+            t = metrics.lap(camera_id, "faces", t)
+        if "demographics" in stages:
+            self.track_demographics = self.demographics.update(frame, faces_by_track,
+                                                               active_ids=self.tracker.objects)
+            if self.demographics.load_error is not None:
+                self._disable_stage("demographics")
+            t = metrics.lap(camera_id, "demographics", t)
+
+        # Restricted zones: one raster lookup for all tracked centroids
+        intrusions = []
+        if "zones" in stages:
+            intrusions = self.zone_detector.detect_intrusions(camera_id, tracked, frame_size)
+            frame = self.zone_detector.draw_zones(frame, camera_id)
+            t = metrics.lap(camera_id, "zones", t)
 
         # Draw detections and track IDs
-        for (x1, y1, x2, y2) in boxes:
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-        for (object_id, (cx, cy)) in tracked.items():
-            cv2.circle(frame, (cx, cy), 4, (255, 0, 0), -1)
-            cv2.putText(frame, str(object_id), (cx, cy - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        if "draw" in stages:
+            for (x1, y1, x2, y2) in boxes:
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            for (object_id, (cx, cy)) in tracked.items():
+                cv2.circle(frame, (cx, cy), 4, (255, 0, 0), -1)
+                label = str(object_id)
+                if object_id in self.track_demographics:
+                    age, gender = self.track_demographics[object_id]
+                    label += f" {gender[0]} {age}"
+                cv2.putText(frame, label, (cx, cy - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            t = metrics.lap(camera_id, "draw", t)
 
         # Face blur
-        faces = detect_faces(frame)
-        for (x, y, w, h) in faces:
-            roi = frame[y:y + h, x:x + w]
-            frame[y:y + h, x:x + w] = cv2.GaussianBlur(roi, (99, 99), 30)
-
-        # Pose and posture
-        pose_result = self.pose_detector.detect_pose(frame)
-        frame = self.pose_detector.draw_landmarks(frame, pose_result)
-        posture = "Unknown"
-        if getattr(pose_result, "pose_landmarks", None):
-            posture = self.posture_classifier.classify(pose_result.pose_landmarks)
+        if "face_blur" in stages:
+            for faces in faces_by_track.values():
+                for (x, y, w, h) in faces:
+                    roi = frame[y:y + h, x:x + w]
+                    if roi.size:
+                        frame[y:y + h, x:x + w] = cv2.GaussianBlur(roi, (99, 99), 30)
+            t = metrics.lap(camera_id, "face_blur", t)
+
+        # Pose and posture per tracked person (skipped when nobody is tracked)
+        poses, postures = {}, {}
+        if "pose" in stages:
+            poses = self.pose_detector.detect_poses(frame, self.tracker.boxes)
+            frame = self.pose_detector.draw_poses(frame, poses)
+            t = metrics.lap(camera_id, "pose", t)
+            postures = self.posture_classifier.classify_tracks(poses, active_ids=self.tracker.objects)
+            t = metrics.lap(camera_id, "posture", t)
+        posture = self.posture_classifier.summarize(postures)
 
         # Alerts
-        if posture == "Lying":
+        fallen = [track_id for track_id, label in postures.items() if label == "Lying"]
+        if fallen:
             cv2.putText(frame, "ALERT: Possible Fall!", (10, 120),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 3)
+            for track_id in fallen:
+                x1, y1, x2, y2 = poses[track_id].box
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
+                events.append(("fall", track_id))
             alert_text += "Fall "
-        if len(tracked) > 10:
+        if len(tracked) > self.crowd_threshold:
+            self.crowded = True
+        elif len(tracked) <= self.crowd_clear:
+            self.crowded = False
+        if self.crowded:
             cv2.putText(frame, "⚠️ Crowd Alert!", (10, 150),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 100, 255), 2)
+            events.append(("crowd", None))
             alert_text += "Crowd "
+        if intrusions:
+            cv2.putText(frame, "ALERT: Restricted Zone!", (10, 180),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+            for zone_id in sorted({intrusion["zone_id"] for intrusion in intrusions}, key=str):
+                events.append(("intrusion", zone_id))
+            alert_text += "Intrusion "
+        if loitering:
+            cv2.putText(frame, "ALERT: Loitering", (10, 210),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 165, 255), 2)
+            for item in loitering:
+                subject = item["object_id"] if item["zone_id"] is None \
+                    else f"{item['object_id']} in {item['zone_id']}"
+                events.append(("loitering", subject))
+            alert_text += "Loitering "
 
         # HUD
         cv2.putText(frame, f"Camera: {camera_id}", (10, 60),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
         cv2.putText(frame, f"Posture: {posture}", (10, 90),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+        metrics.lap(camera_id, "overlay", t)
+        metrics.lap(camera_id, "frame", frame_start)
+        metrics.count(camera_id, "frames")
 
+        self.alert_events = events
         return frame, alert_text.strip(), posture
 
-    def process_camera_stream(self, camera_id, video_source, user_email="recipient@example.com"):
+    def _dispatch_alerts(self, camera_id, digests):
+        # Import here to avoid circular import at module load
+        from alert_service import send_surveillance_alert
+        for message in digests:
+            send_surveillance_alert(message, camera_id)
+
+    def process_camera_stream(self, camera_id, video_source, user_email="recipient@example.com",
+                              stop_event=None, on_stats=None, show_windows=SHOW_WINDOWS,
+                              frame_policy=None, every_n=2, on_frame=None):
         """
         Open a webcam (index like 0 or 1) or a file path and process frames in a loop.
-        On Windows, try Media Foundation (MSMF) then DirectShow (DSHOW) for reliability.
-        """
-        # Prefer Windows backends when available for camera indices
-        backend = cv2.CAP_MSMF if sys.platform.startswith("win") else cv2.CAP_ANY
-        cap = cv2.VideoCapture(video_source, backend)
-
-        # Fallback to DirectShow on Windows if MSMF fails
-        if not cap.isOpened() and sys.platform.startswith("win"):
-            cap = cv2.VideoCapture(video_source, cv2.CAP_DSHOW)
+        Capture runs on its own thread (see frame_source.FrameGrabber) so analysis
+        always sees fresh frames; frame_policy is "latest", "nth" or "fifo"
+        (default: fifo for files, latest for live sources).
 
-        print(f"[DEBUG] Opening source for {camera_id}: {video_source} (backend={backend})")
-        if not cap.isOpened():
+        stop_event: optional threading/multiprocessing Event; the loop exits once it is set.
+        on_stats: optional callback(frames, fps, capture_stats) invoked about once per second.
+        on_frame: optional callback(processed_frame, timestamp) for every processed
+        frame, e.g. to publish it to web viewers (see streaming.CameraStream).
+        """
+        if self.background_warmup:
+            self.warm_up()
+        grabber = FrameGrabber(video_source, policy=frame_policy, every_n=every_n)
+        if not grabber.start():
             print(f"[ERROR] Cannot open video source for {camera_id}: {video_source}")
+            self.close()
             return
-
-        # Optional capture properties (may be ignored by drivers)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-        # cap.set(cv2.CAP_PROP_FPS, 30)
+        print(f"[DEBUG] {camera_id}: capture started with '{grabber.policy}' frame policy")
 
         frames = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print(f"[WARN] {camera_id}: read() returned False after {frames} frames; stopping.")
+        window_frames = 0
+        window_start = time.monotonic()
+        while stop_event is None or not stop_event.is_set():
+            packet = grabber.read()
+            if packet is None:
+                print(f"[WARN] {camera_id}: capture ended after {frames} frames; stopping.")
                 break
+            frame, timestamp = packet
 
             frames += 1
-            processed_frame, alerts, posture = self._process_single_frame(frame, camera_id)
+            processed_frame, alerts, posture = self._process_single_frame(frame, camera_id, timestamp)
+            if on_frame is not None:
+                on_frame(processed_frame, timestamp)
+
+            # Per-camera throughput, reported roughly once per second
+            window_frames += 1
+            elapsed = time.monotonic() - window_start
+            if elapsed >= 1.0:
+                capture_stats = grabber.stats()
+                self.metrics.set(camera_id, "frames_captured", capture_stats["captured"])
+                self.metrics.set(camera_id, "frames_dropped", capture_stats["dropped"])
+                if on_stats is not None:
+                    on_stats(frames, window_frames / elapsed, capture_stats)
+                window_frames = 0
+                window_start = time.monotonic()
 
             # Periodic logging to SQLite (about once per ~30 frames)
             if frames % 30 == 0:
-                insert_log(self.conn, {
-                    "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                now = datetime.now()
+                self.log_writer.write({
+                    "ts": int(now.timestamp() * 1000),
+                    "time": now.strftime("%Y-%m-%d %H:%M:%S"),
                     "camera_id": camera_id,
                     "in": self.counter.count_in,
                     "out": self.counter.count_out,
                     "posture": posture,
-                    "alert": alerts
+                    "alert": alerts,
+                    "occupancy": len(self.tracker.objects),
                 })
 
-            if SHOW_WINDOWS:
+            if show_windows:
                 cv2.imshow(f"{camera_id}", processed_frame)
                 if cv2.waitKey(1) & 0xFF == ord('q'):
                     break
 
-            if alerts:
-                # Import here to avoid circular import at module load
-                from alert_service import send_surveillance_alert
-                send_surveillance_alert(alerts, camera_id)
+            # Every frame, so alerts can clear and pending digests go out on time
+            digest = self.alert_engine.observe(camera_id, self.alert_events)
+            if digest:
+                self._dispatch_alerts(camera_id, [digest])
 
-        cap.release()
+        grabber.stop()
+        self._dispatch_alerts(camera_id, [message for _, message in self.alert_engine.flush(camera_id)])
+        self.log_writer.flush()
+        heatmap = self.heatmaps.pop(camera_id, None)
+        if heatmap is not None:
+            heatmap.stop(flush=True)
+        self.close()
+        stats = grabber.stats()
+        print(f"[INFO] {camera_id}: captured={stats['captured']} dropped={stats['dropped']} "
+              f"processed={stats['processed']}")
+        if not show_windows:
+            return
         try:
             cv2.destroyAllWindows()
         except cv2.error:
@@ -3,107 +3,169 @@ import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import sqlite3
 import os
-from PIL import Image
+import sqlite3
+from contextlib import closing
+from datetime import datetime
 
-from db import init_db  # use the app's DB connection to ensure same file
+from db import (init_db, get_db_path, configure_connection, load_rollups,  # same DB file as the app
+                ALERT_TYPES, ROLLUP_TABLES)
 
 st.set_page_config(layout="wide")
 st.title("📊 Smart Surveillance Dashboard")
 
-# Idempotent table creation DDL
-DDL = """
-CREATE TABLE IF NOT EXISTS TrafficLog (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    time TEXT,
-    "in" INTEGER,
-    "out" INTEGER,
-    camera_id TEXT,
-    posture TEXT,
-    alert TEXT
-);
-"""
-
-@st.cache_data
-def load_data():
-    # Open the same DB used by the app
-    conn = init_db()
-    # Ensure the table exists (safe if it already does)
-    conn.execute(DDL)
-    # Read all logs
-    df = pd.read_sql_query('SELECT * FROM TrafficLog', conn)
-    conn.close()
-
-    # Parse timestamps
-    if not df.empty and 'time' in df.columns:
+# Cap on rows kept in the log table; the newest rows win
+MAX_ROWS = 200_000
+POSTURE_OPTIONS = ["Standing", "Sitting", "Lying", "Uncertain", "Unknown"]
+NO_ALERT = "No Alert"
+ALERT_OPTIONS = [a.capitalize() for a in ALERT_TYPES] + [NO_ALERT]
+
+@st.cache_resource
+def get_db_file():
+    # Create or upgrade the schema once per server process; only the path is shared
+    init_db().close()
+    return str(get_db_path())
+
+def get_conn():
+    """
+    A new connection for one query. Sessions run on their own threads, so
+    sharing a sqlite3 connection between them is unsafe; opening one costs
+    well under a millisecond next to the queries themselves.
+    """
+    conn = sqlite3.connect(get_db_file())
+    configure_connection(conn)
+    return conn
+
+@st.cache_data(ttl=60)
+def load_bounds():
+    """Cameras and the overall time range; cheap lookups on the indexes/rollups."""
+    with closing(get_conn()) as conn:
+        cameras = [r[0] for r in conn.execute(
+            f"SELECT DISTINCT camera_id FROM {ROLLUP_TABLES['hour']} ORDER BY camera_id")]
+        min_ts, max_ts = conn.execute("SELECT MIN(ts), MAX(ts) FROM traffic_logs").fetchone()
+    return cameras, min_ts, max_ts
+
+def query_logs(cameras, postures, alerts, start_ms, end_ms, after_id=None):
+    """Filtered rows straight from SQL; after_id loads only rows newer than a high-water mark."""
+    where = [f"camera_id IN ({', '.join('?' * len(cameras))})", "ts >= ?"]
+    params = list(cameras) + [start_ms]
+    if end_ms is not None:
+        where.append("ts <= ?")
+        params.append(end_ms)
+    if after_id is not None:
+        where.append("id > ?")
+        params.append(int(after_id))
+    if set(postures) != set(POSTURE_OPTIONS):
+        where.append(f"posture IN ({', '.join('?' * len(postures))})")
+        params.extend(postures)
+    if alerts and set(alerts) != set(ALERT_OPTIONS):
+        alert_terms = []
+        for alert in alerts:
+            if alert == NO_ALERT:
+                alert_terms.append("COALESCE(alert, '') = ''")
+            else:
+                alert_terms.append("alert LIKE ?")
+                params.append(f"%{alert}%")
+        where.append("(" + " OR ".join(alert_terms) + ")")
+
+    sql = (f"SELECT * FROM TrafficLog WHERE {' AND '.join(where)} "
+           f"ORDER BY id DESC LIMIT {MAX_ROWS}")
+    with closing(get_conn()) as conn:
+        df = pd.read_sql_query(sql, conn, params=params)
+    if not df.empty:
         df['time'] = pd.to_datetime(df['time'], errors='coerce')
         df = df.dropna(subset=['time'])
-
     return df
 
-df = load_data()
+def to_ms(ts):
+    # Slider values are naive local times, like the logged `time` column
+    return int(pd.Timestamp(ts).to_pydatetime().timestamp() * 1000)
+
+camera_options, min_ts, max_ts = load_bounds()
 
 # Empty-state handling
-if df.empty:
+if min_ts is None:
     st.info("No data available yet. Start the pipeline to generate logs, then refresh this page.", icon="ℹ️")
     st.stop()
 
 # Sidebar filters
 st.sidebar.header("🔍 Filter Options")
+if st.sidebar.button("🔄 Refresh"):
+    load_bounds.clear()
 
-camera_options = sorted(df['camera_id'].dropna().unique().tolist())
 selected_camera = st.sidebar.multiselect("Select Camera(s)", camera_options, default=camera_options)
+selected_posture = st.sidebar.multiselect("Select Posture(s)", POSTURE_OPTIONS, default=POSTURE_OPTIONS)
+# Alert filter: an empty selection means "all"
+selected_alert = st.sidebar.multiselect("Select Alert(s)", ALERT_OPTIONS, default=ALERT_OPTIONS)
 
-posture_options = sorted(df['posture'].dropna().unique().tolist())
-selected_posture = st.sidebar.multiselect("Select Posture(s)", posture_options, default=posture_options)
-
-alert_options = sorted([a for a in df['alert'].dropna().unique().tolist() if str(a).strip() != ""])
-selected_alert = st.sidebar.multiselect("Select Alert(s)", alert_options, default=alert_options)
-
-min_time = df['time'].min()
-max_time = df['time'].max()
+min_time = datetime.fromtimestamp(min_ts / 1000).replace(microsecond=0)
+max_time = datetime.fromtimestamp(max_ts / 1000).replace(microsecond=0)
 start_time, end_time = st.sidebar.slider(
     "Select Time Range",
     min_value=min_time,
     max_value=max_time,
     value=(min_time, max_time)
 )
+# A range that ends at the newest row follows new data on refresh
+follow_latest = end_time >= max_time
+
+# Load filtered rows; on reruns with the same filters only fetch rows above the high-water mark
+cache_key = (tuple(selected_camera), tuple(selected_posture), tuple(selected_alert),
+             to_ms(start_time), None if follow_latest else to_ms(end_time) + 999)
+cached = st.session_state.get("log_cache")
+if not selected_camera:
+    filtered_df = pd.DataFrame(columns=['id', 'ts', 'time', 'camera_id', 'in', 'out', 'posture', 'alert'])
+elif cached is not None and cached["key"] == cache_key:
+    new_rows = query_logs(selected_camera, selected_posture, selected_alert,
+                          cache_key[3], cache_key[4], after_id=cached["hwm"])
+    filtered_df = cached["df"]
+    if not new_rows.empty:
+        filtered_df = pd.concat([new_rows, filtered_df], ignore_index=True).head(MAX_ROWS)
+else:
+    filtered_df = query_logs(selected_camera, selected_posture, selected_alert,
+                             cache_key[3], cache_key[4])
 
-# Apply filters
-mask = (
-    df['camera_id'].isin(selected_camera) &
-    df['posture'].isin(selected_posture) &
-    df['time'].between(start_time, end_time)
-)
-# Alert filter: include empty alerts when no alert selected means "all"
-if selected_alert:
-    mask = mask & df['alert'].isin(selected_alert)
-
-filtered_df = df.loc[mask].copy()
+if selected_camera:
+    prev_hwm = cached["hwm"] if cached is not None and cached["key"] == cache_key else 0
+    hwm = max(prev_hwm, int(filtered_df['id'].max()) if not filtered_df.empty else 0)
+    st.session_state["log_cache"] = {"key": cache_key, "df": filtered_df, "hwm": hwm}
 
 st.subheader("📋 Filtered Logs")
+st.caption(f"{len(filtered_df)} rows" + (f" (newest {MAX_ROWS} shown)" if len(filtered_df) >= MAX_ROWS else ""))
 st.dataframe(filtered_df.sort_values(by='time', ascending=False), use_container_width=True)
 
-# Charts: IN/OUT trends
+# Charts: IN/OUT trends from the pre-aggregated rollup tables
 st.subheader("📈 People Flow Trends")
+
+@st.cache_data(ttl=30)
+def load_flow(cameras, start_ms, end_ms):
+    # Minute buckets for short windows, hour buckets beyond two days
+    granularity = "minute" if end_ms - start_ms <= 2 * 24 * 3600 * 1000 else "hour"
+    with closing(get_conn()) as conn:
+        columns, rows = load_rollups(conn, granularity, list(cameras), start_ms, end_ms)
+    flow = pd.DataFrame(rows, columns=columns)
+    if not flow.empty:
+        # Local wall-clock times to match the logged `time` column
+        flow['time'] = pd.to_datetime(flow['bucket_ts'].map(lambda ms: datetime.fromtimestamp(ms / 1000)))
+        flow = flow.groupby('time', as_index=True)[['in_delta', 'out_delta']].sum()
+    return flow
+
+flow_df = load_flow(tuple(selected_camera), to_ms(start_time), to_ms(end_time))
 col1, col2 = st.columns(2)
 
 with col1:
     st.markdown("#### People IN Count")
-    if 'in' in filtered_df.columns:
-        in_trend = filtered_df.groupby('time', as_index=False)['in'].sum()
-        st.line_chart(in_trend.set_index('time').rename(columns={'in': 'People IN'}))
+    if not flow_df.empty:
+        st.line_chart(flow_df[['in_delta']].rename(columns={'in_delta': 'People IN'}))
     else:
-        st.warning("Column 'in' not found in data.")
+        st.warning("No people-flow data in the selected range.")
 
 with col2:
     st.markdown("#### People OUT Count")
-    if 'out' in filtered_df.columns:
-        out_trend = filtered_df.groupby('time', as_index=False)['out'].sum()
-        st.line_chart(out_trend.set_index('time').rename(columns={'out': 'People OUT'}))
+    if not flow_df.empty:
+        st.line_chart(flow_df[['out_delta']].rename(columns={'out_delta': 'People OUT'}))
     else:
-        st.warning("Column 'out' not found in data.")
+        st.warning("No people-flow data in the selected range.")
 
 # Alerts trend
 st.subheader("🚨 Alert Frequency")
@@ -113,8 +175,28 @@ if 'alert' in filtered_df.columns:
 else:
     st.warning("Column 'alert' not found in data.")
 
-# Heatmaps and zone counts (optional image/CSV overlays)
+# Heatmaps and zone counts (optional image/CSV overlays), cached until the file changes
 LOG_FOLDER = "logs"
+
+@st.cache_data(max_entries=256)
+def load_image_bytes(path, mtime):
+    with open(path, "rb") as f:
+        return f.read()
+
+@st.cache_data(max_entries=256)
+def load_zone_matrix(path, mtime):
+    zone_df = pd.read_csv(path)
+    if 'Zone(Row,Col)' not in zone_df.columns or 'Count' not in zone_df.columns:
+        return None
+    zone_df[['Row', 'Col']] = zone_df['Zone(Row,Col)'].astype(str).str.strip('()').str.split(',', expand=True).astype(int)
+    return zone_df.pivot(index='Row', columns='Col', values='Count')
+
+def file_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
 st.subheader("🔥 Visual Overlays")
 for cam_id in selected_camera:
     heatmap_path = os.path.join(LOG_FOLDER, f"heatmap_{cam_id}.jpg")
@@ -124,21 +206,22 @@ for cam_id in selected_camera:
     st.markdown(f"#### {cam_id} Heatmaps")
 
     cols = st.columns(2)
-    if os.path.exists(heatmap_path):
-        with cols:
-            st.image(Image.open(heatmap_path), caption=f"Motion Heatmap - {cam_id}", use_column_width=True)
-    if os.path.exists(zone_path):
-        with cols[22]:
-            st.image(Image.open(zone_path), caption=f"Zone Heatmap - {cam_id}", use_column_width=True)
+    mtime = file_mtime(heatmap_path)
+    if mtime is not None:
+        with cols[0]:
+            st.image(load_image_bytes(heatmap_path, mtime), caption=f"Motion Heatmap - {cam_id}", use_column_width=True)
+    mtime = file_mtime(zone_path)
+    if mtime is not None:
+        with cols[1]:
+            st.image(load_image_bytes(zone_path, mtime), caption=f"Zone Heatmap - {cam_id}", use_column_width=True)
 
     # Zone counts matrix
-    if os.path.exists(zone_csv):
-        zone_df = pd.read_csv(zone_csv)
-        if 'Zone(Row,Col)' in zone_df.columns and 'Count' in zone_df.columns:
-            zone_df[['Row', 'Col']] = zone_df['Zone(Row,Col)'].astype(str).str.strip('()').str.split(',', expand=True).astype(int)
-            zone_matrix = zone_df.pivot(index='Row', columns='Col', values='Count')
-
+    mtime = file_mtime(zone_csv)
+    if mtime is not None:
+        zone_matrix = load_zone_matrix(zone_csv, mtime)
+        if zone_matrix is not None:
             st.markdown("##### Zone Occupancy Matrix")
             fig, ax = plt.subplots()
             sns.heatmap(zone_matrix, annot=True, fmt='d', cmap="YlOrRd", ax=ax)
             st.pyplot(fig)
+            plt.close(fig)
@@ -1,38 +1,107 @@
 # db.py
+import atexit
+import queue
 import sqlite3
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 # Defaults
 DEFAULT_DIR = Path(__file__).resolve().parent / "logs"
 DEFAULT_DB = DEFAULT_DIR / "analytics.db"
 
-# DDL for the canonical table used by the app
+# Bump when the schema changes; stored in PRAGMA user_version (see migrate_db)
+SCHEMA_VERSION = 3
+
+# DDL for the canonical table used by the app. `ts` is the row time as
+# epoch milliseconds (UTC); `time` keeps the local "%Y-%m-%d %H:%M:%S" text.
 DDL_TABLE = """
 CREATE TABLE IF NOT EXISTS traffic_logs (
+    id INTEGER PRIMARY KEY,
+    ts INTEGER,
     time TEXT,
     camera_id TEXT,
     in_count INTEGER,
     out_count INTEGER,
     posture TEXT,
-    alert TEXT
+    alert TEXT,
+    occupancy INTEGER
 );
 """
 
+DDL_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_traffic_logs_camera_ts ON traffic_logs (camera_id, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_traffic_logs_ts ON traffic_logs (ts)",
+)
+
 # A compatibility view so dashboards can SELECT * FROM TrafficLog
-# and get columns: time, "in", "out", camera_id, posture, alert
+# and get columns: id, ts, time, "in", "out", camera_id, posture, alert, occupancy
+# (rowid is the id for legacy tables created without an id column)
 DDL_VIEW = """
 CREATE VIEW IF NOT EXISTS TrafficLog AS
 SELECT
+    rowid AS id,
+    ts,
     time,
     camera_id,
     in_count AS "in",
     out_count AS "out",
     posture,
-    alert
+    alert,
+    occupancy
 FROM traffic_logs;
 """
 
+# Pre-aggregated people-flow rollups, maintained incrementally on insert.
+# in/out are deltas of the cumulative counters; alert_* count logged rows
+# whose alert text contains that type; posture_* count rows per posture.
+ROLLUP_TABLES = {"minute": "traffic_rollup_minute", "hour": "traffic_rollup_hour"}
+ROLLUP_BUCKET_MS = {"minute": 60_000, "hour": 3_600_000}
+ALERT_TYPES = ("fall", "crowd", "intrusion", "loitering")
+POSTURE_TYPES = ("standing", "sitting", "lying")
+ROLLUP_SUM_COLUMNS = (
+    ["in_delta", "out_delta", "samples"]
+    + [f"alert_{a}" for a in ALERT_TYPES] + ["alert_other"]
+    + [f"posture_{p}" for p in POSTURE_TYPES] + ["posture_other"]
+)
+ROLLUP_COLUMNS = ROLLUP_SUM_COLUMNS + ["max_occupancy"]
+
+def _rollup_ddl(table: str) -> str:
+    columns = ",\n    ".join(f"{c} INTEGER NOT NULL DEFAULT 0" for c in ROLLUP_COLUMNS)
+    return f"""
+CREATE TABLE IF NOT EXISTS {table} (
+    camera_id TEXT NOT NULL,
+    bucket_ts INTEGER NOT NULL,
+    {columns},
+    PRIMARY KEY (camera_id, bucket_ts)
+) WITHOUT ROWID;
+"""
+
+def _rollup_upsert_sql(table: str) -> str:
+    names = ", ".join(["camera_id", "bucket_ts"] + ROLLUP_COLUMNS)
+    marks = ", ".join("?" * (2 + len(ROLLUP_COLUMNS)))
+    updates = ", ".join([f"{c} = {c} + excluded.{c}" for c in ROLLUP_SUM_COLUMNS]
+                        + ["max_occupancy = MAX(max_occupancy, excluded.max_occupancy)"])
+    return (f"INSERT INTO {table} ({names}) VALUES ({marks}) "
+            f"ON CONFLICT(camera_id, bucket_ts) DO UPDATE SET {updates}")
+
+# Pending rollup rebuild (at most one row): rows up to snapshot_rowid are
+# replayed in (camera_id, ts, rowid) order; camera_id/ts/row_id is the last
+# replayed row. See run_rollup_backfill.
+DDL_ROLLUP_BACKFILL = """
+CREATE TABLE IF NOT EXISTS rollup_backfill (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    snapshot_rowid INTEGER NOT NULL,
+    camera_id TEXT,
+    ts INTEGER,
+    row_id INTEGER
+);
+"""
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
 def get_db_path(db_path: Optional[str | Path] = None) -> Path:
     """
     Resolve the SQLite file path; ensure the parent directory exists.
@@ -41,6 +110,16 @@ def get_db_path(db_path: Optional[str | Path] = None) -> Path:
     path.parent.mkdir(parents=True, exist_ok=True)  # make sure folder exists
     return path
 
+def configure_connection(conn: sqlite3.Connection) -> None:
+    """
+    WAL lets dashboards read while the pipeline writes; synchronous=NORMAL is
+    durable across application crashes and only fsyncs at checkpoints.
+    """
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
 def init_db(db_path: Optional[str | Path] = None) -> sqlite3.Connection:
     """
     Open the SQLite database, ensure schema exists, and return a connection.
@@ -48,35 +127,479 @@ def init_db(db_path: Optional[str | Path] = None) -> sqlite3.Connection:
     path = get_db_path(db_path)
     # check_same_thread=False allows reuse across threads (e.g., Streamlit/Flask)
     conn = sqlite3.connect(str(path), check_same_thread=False)
+    configure_connection(conn)
     cur = conn.cursor()
     cur.execute(DDL_TABLE)
     cur.execute(DDL_VIEW)
+    for table in ROLLUP_TABLES.values():
+        cur.execute(_rollup_ddl(table))
+    cur.execute(DDL_ROLLUP_BACKFILL)
     conn.commit()
+    migrate_db(conn)
     return conn
 
-def insert_log(conn: sqlite3.Connection, log_entry: Dict[str, Any]) -> None:
+def _backfill_ts(conn: sqlite3.Connection, chunk_size: int) -> int:
+    """
+    Fill traffic_logs.ts from the text `time` column in rowid ranges, one short
+    transaction per chunk so concurrent writers are never locked out for long.
+    """
+    max_rowid = conn.execute("SELECT MAX(rowid) FROM traffic_logs").fetchone()[0] or 0
+    updated = 0
+    last = 0
+    while last < max_rowid:
+        with conn:
+            # 'utc' treats the stored text as local time and converts it to UTC
+            cur = conn.execute(
+                """
+                UPDATE traffic_logs
+                SET ts = CAST(strftime('%s', time, 'utc') AS INTEGER) * 1000
+                WHERE rowid > ? AND rowid <= ? AND ts IS NULL
+                """,
+                (last, last + chunk_size),
+            )
+        updated += cur.rowcount
+        last += chunk_size
+    return updated
+
+def _add_column(conn: sqlite3.Connection, column: str, decl: str) -> None:
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(traffic_logs)")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE traffic_logs ADD COLUMN {column} {decl}")
+
+def _recreate_view(conn: sqlite3.Connection) -> None:
+    # Older setups may have a real TrafficLog table; leave that alone
+    kind = conn.execute("SELECT type FROM sqlite_master WHERE name = 'TrafficLog'").fetchone()
+    if kind is None or kind[0] == "view":
+        conn.execute("DROP VIEW IF EXISTS TrafficLog")
+        conn.execute(DDL_VIEW)
+
+def _begin_step(conn: sqlite3.Connection, version: int) -> bool:
     """
-    Insert a single log row. Accepts either:
+    Start a write transaction for the migration to `version`. user_version is
+    re-read under the lock, so when another process got there first this
+    commits and returns False.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+        conn.commit()
+        return False
+    return True
+
+def migrate_db(conn: sqlite3.Connection, chunk_size: int = 50000) -> None:
+    """
+    Upgrade an existing database in place to SCHEMA_VERSION.
+      v2: add the epoch-millisecond `ts` column to legacy tables, backfill it in
+          chunks (see _backfill_ts), build the (camera_id, ts) and ts indexes.
+      v3: add `occupancy` and schedule a rollup rebuild from existing rows;
+          the rebuild itself runs in the LogWriter thread or via
+          `python db.py`, never here (see run_rollup_backfill).
+    The TrafficLog view is refreshed after each step. Every step re-checks
+    user_version inside BEGIN IMMEDIATE, so concurrent processes run each
+    step once; a no-op once current.
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+
+    if _begin_step(conn, 2):
+        _add_column(conn, "ts", "INTEGER")
+        conn.commit()
+
+        # Idempotent (only fills NULL ts), so a concurrent run does no harm
+        updated = _backfill_ts(conn, chunk_size)
+        if updated:
+            print(f"[INFO] Migrated {updated} traffic_logs rows to epoch timestamps")
+
+        if _begin_step(conn, 2):
+            for ddl in DDL_INDEXES:
+                conn.execute(ddl)
+            _recreate_view(conn)
+            conn.execute("PRAGMA user_version = 2")
+            conn.commit()
+
+    if _begin_step(conn, 3):
+        _add_column(conn, "occupancy", "INTEGER")
+        _recreate_view(conn)
+        if conn.execute("SELECT 1 FROM traffic_logs LIMIT 1").fetchone() is not None:
+            _schedule_rollup_backfill(conn)
+        conn.execute("PRAGMA user_version = 3")
+        conn.commit()
+
+def to_epoch_ms(time_text: Optional[str]) -> Optional[int]:
+    """Local "%Y-%m-%d %H:%M:%S" text to epoch milliseconds (None if unparsable)."""
+    if not time_text:
+        return None
+    try:
+        return int(datetime.strptime(time_text, TIME_FORMAT).timestamp() * 1000)
+    except ValueError:
+        return None
+
+INSERT_SQL = """
+INSERT INTO traffic_logs (ts, time, camera_id, in_count, out_count, posture, alert, occupancy)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _log_params(log_entry: Dict[str, Any]) -> tuple:
+    """
+    Map a log dict to INSERT parameters. Accepts either:
       - in_count/out_count keys, or
       - in/out keys (mapped to in_count/out_count).
+    `ts` (epoch ms) and `time` (local text) are derived from each other when
+    only one is given, and default to now.
     """
     # Map keys for compatibility
     in_count = log_entry.get("in_count", log_entry.get("in", 0))
     out_count = log_entry.get("out_count", log_entry.get("out", 0))
 
-    params = (
-        log_entry.get("time"),
+    time_text = log_entry.get("time")
+    ts = log_entry.get("ts")
+    if ts is None:
+        ts = to_epoch_ms(time_text)
+    if ts is None and time_text is None:
+        ts = int(time.time() * 1000)
+    if time_text is None:
+        time_text = datetime.fromtimestamp(ts / 1000.0).strftime(TIME_FORMAT)
+
+    return (
+        int(ts) if ts is not None else None,
+        time_text,
         log_entry.get("camera_id"),
         int(in_count) if in_count is not None else 0,
         int(out_count) if out_count is not None else 0,
         log_entry.get("posture"),
         log_entry.get("alert"),
+        log_entry.get("occupancy"),
     )
-    conn.execute(
+
+class RollupAccumulator:
+    """
+    Turns logged rows (INSERT_SQL parameter tuples) into minute/hour rollup
+    upserts. The logged in/out values are cumulative per pipeline run, so the
+    last value per camera is remembered (looked up in the DB the first time a
+    camera is seen) and a drop is treated as a counter reset.
+
+    aggregate() does not move that baseline; commit() does, once the rollups
+    are written, so a failed write is retried against the old baseline.
+    """
+
+    def __init__(self):
+        self.last_counts: Dict[str, tuple] = {}
+        self.pending: Dict[str, tuple] = {}
+
+    def _previous(self, conn: sqlite3.Connection, camera_id: str) -> tuple:
+        if camera_id not in self.last_counts:
+            row = conn.execute(
+                "SELECT in_count, out_count FROM traffic_logs WHERE camera_id = ? "
+                "ORDER BY ts DESC LIMIT 1",
+                (camera_id,),
+            ).fetchone()
+            self.last_counts[camera_id] = (row[0] or 0, row[1] or 0) if row else (0, 0)
+        return self.last_counts[camera_id]
+
+    def aggregate(self, conn: Optional[sqlite3.Connection], rows: List[tuple]) -> Dict[str, Dict[tuple, list]]:
         """
-        INSERT INTO traffic_logs (time, camera_id, in_count, out_count, posture, alert)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        params,
-    )
+        Group rows by (camera_id, bucket_ts) per granularity. `rows` must be in
+        time order per camera; with conn=None unseen cameras start from 0.
+        """
+        buckets: Dict[str, Dict[tuple, list]] = {g: {} for g in ROLLUP_TABLES}
+        counts: Dict[str, tuple] = {}
+        for ts, _time, camera_id, in_count, out_count, posture, alert, occupancy in rows:
+            if ts is None:
+                continue
+            if camera_id in counts:
+                prev_in, prev_out = counts[camera_id]
+            elif conn is not None:
+                prev_in, prev_out = self._previous(conn, camera_id)
+            else:
+                prev_in, prev_out = self.last_counts.get(camera_id, (0, 0))
+            in_delta = in_count - prev_in if in_count >= prev_in else in_count
+            out_delta = out_count - prev_out if out_count >= prev_out else out_count
+            counts[camera_id] = (in_count, out_count)
+
+            tokens = (alert or "").lower().split()
+            alerts = [int(a in tokens) for a in ALERT_TYPES]
+            alert_other = int(any(t not in ALERT_TYPES for t in tokens))
+            label = (posture or "").lower()
+            postures = [int(label == p) for p in POSTURE_TYPES]
+            posture_other = int(label not in POSTURE_TYPES)
+            values = ([in_delta, out_delta, 1] + alerts + [alert_other]
+                      + postures + [posture_other, occupancy or 0])
+
+            for granularity, size in ROLLUP_BUCKET_MS.items():
+                key = (camera_id, ts - ts % size)
+                acc = buckets[granularity].get(key)
+                if acc is None:
+                    buckets[granularity][key] = values[:]
+                else:
+                    for i in range(len(ROLLUP_SUM_COLUMNS)):
+                        acc[i] += values[i]
+                    acc[-1] = max(acc[-1], values[-1])
+        self.pending = counts
+        return buckets
+
+    def commit(self) -> None:
+        """Advance the baselines past the last aggregated rows (after their write committed)."""
+        self.last_counts.update(self.pending)
+        self.pending = {}
+
+    def apply(self, conn: sqlite3.Connection, buckets: Dict[str, Dict[tuple, list]]) -> None:
+        """Upsert aggregated buckets (call inside the same transaction as the inserts)."""
+        for granularity, groups in buckets.items():
+            if groups:
+                conn.executemany(_rollup_upsert_sql(ROLLUP_TABLES[granularity]),
+                                 [key + tuple(values) for key, values in groups.items()])
+
+def _schedule_rollup_backfill(conn: sqlite3.Connection) -> None:
+    # Call inside a write transaction; rows after the snapshot are rolled up by their writers
+    max_rowid = conn.execute("SELECT MAX(rowid) FROM traffic_logs").fetchone()[0] or 0
+    conn.execute("INSERT OR REPLACE INTO rollup_backfill (id, snapshot_rowid) VALUES (1, ?)",
+                 (max_rowid,))
+
+def run_rollup_backfill(conn: sqlite3.Connection, chunk_size: int = 50000) -> int:
+    """
+    Replay the rows of a pending rollup_backfill into the rollup tables.
+    Each chunk reads the progress, upserts its rollups and advances the
+    progress in one BEGIN IMMEDIATE transaction, so every row is applied
+    exactly once even when several processes run this at the same time or
+    one is interrupted. Returns the rows replayed by this call.
+    """
+    total = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            task = conn.execute(
+                "SELECT snapshot_rowid, camera_id, ts, row_id FROM rollup_backfill WHERE id = 1"
+            ).fetchone()
+            if task is None:
+                conn.commit()
+                return total
+            snapshot_rowid, camera_id, ts, row_id = task
+
+            accumulator = RollupAccumulator()
+            after, params = "", []
+            if row_id is not None:
+                # Resume after the last replayed row, from that row's counters
+                after, params = "AND (camera_id, ts, rowid) > (?, ?, ?)", [camera_id, ts, row_id]
+                prev = conn.execute("SELECT in_count, out_count FROM traffic_logs WHERE rowid = ?",
+                                    (row_id,)).fetchone()
+                accumulator.last_counts[camera_id] = (prev[0] or 0, prev[1] or 0) if prev else (0, 0)
+            rows = conn.execute(
+                "SELECT rowid, ts, time, camera_id, in_count, out_count, posture, alert, occupancy "
+                "FROM traffic_logs WHERE rowid <= ? AND ts IS NOT NULL AND camera_id IS NOT NULL "
+                f"{after} ORDER BY camera_id, ts, rowid LIMIT ?",
+                [snapshot_rowid] + params + [chunk_size],
+            ).fetchall()
+            if not rows:
+                conn.execute("DELETE FROM rollup_backfill")
+                conn.commit()
+                return total
+
+            accumulator.apply(conn, accumulator.aggregate(
+                None, [(ts, t, cam, i or 0, o or 0, p, a, occ) for _, ts, t, cam, i, o, p, a, occ in rows]))
+            last_rowid, last_ts, _, last_camera = rows[-1][:4]
+            conn.execute("UPDATE rollup_backfill SET camera_id = ?, ts = ?, row_id = ? WHERE id = 1",
+                         (last_camera, last_ts, last_rowid))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        total += len(rows)
+
+def backfill_rollups(conn: sqlite3.Connection, chunk_size: int = 50000) -> int:
+    """
+    Rebuild the rollup tables from traffic_logs. The rollups are cleared and
+    the rebuild scheduled in one transaction, then replayed chunk by chunk
+    (see run_rollup_backfill); rows written meanwhile are rolled up by their
+    writers.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    for table in ROLLUP_TABLES.values():
+        conn.execute(f"DELETE FROM {table}")
+    _schedule_rollup_backfill(conn)
     conn.commit()
+    return run_rollup_backfill(conn, chunk_size)
+
+def insert_log(conn: sqlite3.Connection, log_entry: Dict[str, Any],
+               rollups: Optional[RollupAccumulator] = None) -> None:
+    """
+    Insert a single log row (updating the rollups) and commit. For the video
+    pipeline prefer LogWriter, which batches rows on a background thread.
+    """
+    rollups = rollups if rollups is not None else RollupAccumulator()
+    row = _log_params(log_entry)
+    with conn:
+        rollups.apply(conn, rollups.aggregate(conn, [row]))
+        conn.execute(INSERT_SQL, row)
+    rollups.commit()
+
+def load_rollups(conn: sqlite3.Connection, granularity: str = "minute",
+                 camera_ids: Optional[List[str]] = None,
+                 start_ts: Optional[int] = None, end_ts: Optional[int] = None):
+    """
+    Read pre-aggregated rows for a time window (epoch ms, inclusive).
+    Returns (column_names, rows) ordered by bucket_ts.
+    """
+    table = ROLLUP_TABLES[granularity]
+    where, params = [], []
+    if camera_ids is not None:
+        if not camera_ids:
+            return ["camera_id", "bucket_ts"] + ROLLUP_COLUMNS, []
+        where.append(f"camera_id IN ({', '.join('?' * len(camera_ids))})")
+        params.extend(camera_ids)
+    if start_ts is not None:
+        where.append("bucket_ts >= ?")
+        params.append(int(start_ts) - int(start_ts) % ROLLUP_BUCKET_MS[granularity])
+    if end_ts is not None:
+        where.append("bucket_ts <= ?")
+        params.append(int(end_ts))
+    sql = f"SELECT * FROM {table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    cur = conn.execute(sql + " ORDER BY bucket_ts", params)
+    return [d[0] for d in cur.description], cur.fetchall()
+
+class LogWriter:
+    """
+    Background writer for traffic_logs.
+
+    write() only enqueues (never blocks the frame loop); a single writer
+    thread owns its own connection and groups queued rows into one
+    executemany transaction (together with their rollup updates) once
+    `batch_size` rows are pending or `flush_interval` seconds have passed. When the bounded queue is full,
+    new rows are dropped and counted rather than stalling video processing.
+    """
+
+    _STOP = object()
+
+    def __init__(self, db_path: Optional[str | Path] = None, max_queue: int = 10000,
+                 batch_size: int = 200, flush_interval: float = 1.0):
+        self.path = get_db_path(db_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self.rollups = RollupAccumulator()
+
+        # Stats
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failed = 0
+        self.last_write_ms = 0.0
+        self.total_write_ms = 0.0
+
+        self._thread = threading.Thread(target=self._run, daemon=True, name="sqlite-log-writer")
+        self._thread.start()
+
+    def write(self, log_entry: Dict[str, Any]) -> bool:
+        """Queue one row; returns False (and counts a drop) if the queue is full."""
+        try:
+            self._queue.put_nowait(_log_params(log_entry))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _commit(self, conn: sqlite3.Connection, rows: List[tuple]) -> None:
+        if not rows:
+            return
+        started = time.perf_counter()
+        try:
+            with conn:
+                self.rollups.apply(conn, self.rollups.aggregate(conn, rows))
+                conn.executemany(INSERT_SQL, rows)
+            self.rollups.commit()
+            self.written += len(rows)
+            self.batches += 1
+        except sqlite3.Error as e:
+            self.failed += len(rows)
+            print(f"[ERROR] LogWriter failed to write {len(rows)} rows: {e}")
+        self.last_write_ms = (time.perf_counter() - started) * 1000.0
+        self.total_write_ms += self.last_write_ms
+        rows.clear()
+
+    def _run(self) -> None:
+        conn = init_db(self.path)
+        try:
+            # A rollup rebuild left by a migration runs here, off the dashboards' request path
+            replayed = run_rollup_backfill(conn)
+            if replayed:
+                print(f"[INFO] Built traffic rollups from {replayed} existing rows")
+        except sqlite3.Error as e:
+            print(f"[ERROR] Rollup backfill failed: {e}")
+        pending: List[tuple] = []
+        deadline = time.monotonic() + self.flush_interval
+        try:
+            while True:
+                timeout = max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is self._STOP:
+                    self._commit(conn, pending)
+                    break
+                if isinstance(item, threading.Event):
+                    self._commit(conn, pending)
+                    item.set()
+                elif item is not None:
+                    pending.append(item)
+
+                if len(pending) >= self.batch_size or time.monotonic() >= deadline:
+                    self._commit(conn, pending)
+                    deadline = time.monotonic() + self.flush_interval
+        finally:
+            conn.close()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything queued so far is committed (or timeout)."""
+        if not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write remaining rows and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_write_ms": round(self.last_write_ms, 2),
+            "avg_write_ms": round(self.total_write_ms / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+_log_writer: Optional[LogWriter] = None
+_log_writer_lock = threading.Lock()
+
+def get_log_writer() -> LogWriter:
+    """Process-wide LogWriter for the default database, closed (flushed) at exit."""
+    global _log_writer
+    with _log_writer_lock:
+        if _log_writer is None:
+            _log_writer = LogWriter()
+            atexit.register(_log_writer.close)
+        return _log_writer
+
+if __name__ == "__main__":
+    import sys
+
+    # Create or upgrade logs/analytics.db in place
+    conn = init_db()
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill-rollups":
+        print(f"Rebuilt rollups from {backfill_rollups(conn)} rows.")
+    else:
+        replayed = run_rollup_backfill(conn)
+        if replayed:
+            print(f"Built rollups from {replayed} existing rows.")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    rows = conn.execute("SELECT COUNT(*) FROM traffic_logs").fetchone()[0]
+    conn.close()
+    print(f"Database ready at {get_db_path()} (schema v{version}, {rows} rows).")
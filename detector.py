@@ -1,21 +1,151 @@
+import threading
+
 import cv2
-from ultralytics import YOLO
+import numpy as np
 
 class PersonDetector:
-    def __init__(self, model_path="yolov8n.pt"):
-        self.model = YOLO(model_path)
+    """
+    YOLO person detector. ultralytics is imported and the weights are loaded
+    on first use (or by warmup()), so constructing one is free.
+    """
+    PERSON_CLASS_ID = 0
+    WARMUP_SIZE = (640, 480)
+
+    def __init__(self, model_path="yolov8n.pt", score_threshold=0.5):
+        self.model_path = model_path
+        self.score_threshold = score_threshold
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from ultralytics import YOLO
+                    model = YOLO(self.model_path)
+                    # The first call builds the predictor; do it on a blank frame
+                    # before anyone else can use the model
+                    w, h = self.WARMUP_SIZE
+                    model(np.zeros((h, w, 3), dtype=np.uint8), classes=[self.PERSON_CLASS_ID],
+                          verbose=False)
+                    self._model = model
+        return self._model
+
+    def warmup(self):
+        """Load the model now (e.g. from a background thread) instead of on the first frame."""
+        return self.model is not None
 
     def detect(self, frame):
-        results = self.model(frame)[0]
-        boxes = []
-        for r in results.boxes.data.tolist():
-            x1, y1, x2, y2, score, cls_id = r
-            if int(cls_id) == 0 and score > 0.5:
-                boxes.append([int(x1), int(y1), int(x2), int(y2)])
-        return boxes
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames):
+        """
+        Run one forward pass over a list of BGR frames (e.g. one per camera).
+        Returns a list of box lists, one per input frame, in the same order.
+        """
+        if not frames:
+            return []
+        # Let the predictor drop other classes/low scores during NMS as well
+        results = self.model(list(frames), classes=[self.PERSON_CLASS_ID],
+                             conf=self.score_threshold, verbose=False)
+        return [self._person_boxes(result) for result in results]
+
+    def _person_boxes(self, result):
+        # data rows: x1, y1, x2, y2, score, cls_id
+        data = result.boxes.data
+        if len(data) == 0:
+            return []
+        data = data.cpu().numpy()
+        keep = (data[:, 5].astype(np.int32) == self.PERSON_CLASS_ID) & (data[:, 4] > self.score_threshold)
+        return data[keep, :4].astype(np.int32).tolist()
     
+FACE_CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+_face_cascade = None
+
+def _get_face_cascade():
+    # Parse the cascade XML once per process instead of once per frame
+    global _face_cascade
+    if _face_cascade is None:
+        _face_cascade = cv2.CascadeClassifier(FACE_CASCADE_PATH)
+    return _face_cascade
+
 def detect_faces(frame):
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+    faces = _get_face_cascade().detectMultiScale(gray, 1.3, 5)
     return faces
+
+
+class FaceDetector:
+    """
+    Face detection restricted to person boxes.
+
+    Only the upper `upper_fraction` of each tracked person box is searched,
+    optionally downscaled by `scale`, and results are reused for
+    `reuse_frames` frames per track (stored relative to the person box so
+    they follow the person while cached).
+    """
+
+    def __init__(self, upper_fraction=0.45, scale=0.5, reuse_frames=5,
+                 scale_factor=1.2, min_neighbors=5, min_face=16):
+        # Own classifier instance: detectMultiScale is not safe to share across threads
+        self.cascade = cv2.CascadeClassifier(FACE_CASCADE_PATH)
+        self.upper_fraction = upper_fraction
+        self.scale = scale
+        self.reuse_frames = reuse_frames
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_face = min_face
+        self.frame_index = 0
+        self._cache = {}  # track_id -> (frame_index, [(rx, ry, rw, rh), ...]) relative to box
+
+    def detect(self, frame, person_boxes):
+        """
+        person_boxes: {track_id: (x1, y1, x2, y2)}.
+        Returns {track_id: [(x, y, w, h), ...]} in frame coordinates.
+        """
+        self.frame_index += 1
+        h, w = frame.shape[:2]
+        faces_by_track = {}
+
+        for track_id, box in person_boxes.items():
+            x1, y1, x2, y2 = (int(v) for v in box)
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(w, x2), min(h, y2)
+            bw, bh = x2 - x1, y2 - y1
+            if bw <= 0 or bh <= 0:
+                continue
+
+            cached = self._cache.get(track_id)
+            if cached is None or self.frame_index - cached[0] >= self.reuse_frames:
+                relative = self._detect_in_box(frame, x1, y1, bw, bh)
+                self._cache[track_id] = (self.frame_index, relative)
+            else:
+                relative = cached[1]
+
+            faces_by_track[track_id] = [
+                (x1 + int(rx * bw), y1 + int(ry * bh), int(rw * bw), int(rh * bh))
+                for rx, ry, rw, rh in relative
+            ]
+
+        # Forget tracks that are gone
+        for track_id in list(self._cache):
+            if track_id not in person_boxes:
+                del self._cache[track_id]
+
+        return faces_by_track
+
+    def _detect_in_box(self, frame, x1, y1, bw, bh):
+        roi_h = max(1, int(bh * self.upper_fraction))
+        roi = frame[y1:y1 + roi_h, x1:x1 + bw]
+        scale = self.scale if min(roi.shape[:2]) * self.scale >= self.min_face else 1.0
+        if scale != 1.0:
+            roi = cv2.resize(roi, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        min_side = max(8, int(self.min_face * scale))
+        faces = self.cascade.detectMultiScale(gray, self.scale_factor, self.min_neighbors,
+                                              minSize=(min_side, min_side))
+        return [
+            (fx / scale / bw, fy / scale / bh, fw / scale / bw, fh / scale / bh)
+            for (fx, fy, fw, fh) in faces
+        ]
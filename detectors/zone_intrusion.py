@@ -3,9 +3,97 @@ import numpy as np
 import json
 import os
 
+
+def _polygon_mask(polygon, xs, ys):
+    """
+    (len(ys), len(xs)) bool grid: point (xs[j], ys[i]) is inside the polygon
+    (even-odd rule, one vectorized pass per edge).
+    """
+    polygon = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+    inside = np.zeros((len(ys), len(xs)), dtype=bool)
+    for (x1, y1), (x2, y2) in zip(polygon, np.roll(polygon, -1, axis=0)):
+        if y1 == y2:
+            continue
+        # Rows the edge spans (half-open, so a shared vertex toggles once)
+        rows = (ys >= min(y1, y2)) & (ys < max(y1, y2))
+        x_cross = x1 + (ys[rows] - y1) * (x2 - x1) / (y2 - y1)
+        inside[rows] ^= xs[None, :] < x_cross[:, None]
+    return inside
+
+
+class CompiledZones:
+    """
+    Zones of one camera rasterized once into a per-pixel bitmask image.
+
+    Bit i of raster[y, x] is set when the center of raster cell (x, y), which
+    covers a downscale x downscale block of frame pixels, lies inside zone i.
+    Overlapping zones are supported and any number of points is classified
+    with one vectorized index lookup.
+    """
+
+    def __init__(self, zones, frame_size, downscale):
+        if len(zones) > 64:
+            raise ValueError(f"At most 64 zones per camera are supported, got {len(zones)}")
+        self.zones = zones
+        self.zone_ids = [zone["id"] for zone in zones]
+        self.frame_size = frame_size
+        self.downscale = downscale
+
+        if len(zones) <= 8:
+            self.dtype = np.uint8
+        elif len(zones) <= 16:
+            self.dtype = np.uint16
+        elif len(zones) <= 32:
+            self.dtype = np.uint32
+        else:
+            self.dtype = np.uint64
+
+        w, h = frame_size
+        self.width = -(-w // downscale)
+        self.height = -(-h // downscale)
+        self.raster = np.zeros((self.height, self.width), dtype=self.dtype)
+        self.restricted_bits = 0
+        self.restricted = []  # (bit, zone_id) of the restricted zones
+        # Optional per-zone dwell threshold for loitering ("loiter_seconds"); inf = none
+        self.loiter_seconds = np.array([float(zone.get("loiter_seconds", np.inf)) for zone in zones],
+                                       dtype=np.float64)
+
+        # Frame coordinates of the cell centers; sampling those (rather than
+        # filling the scaled polygon, which also covers every cell the outline
+        # touches) keeps the raster unbiased at the zone edges
+        xs = np.arange(self.width) * downscale + (downscale - 1) / 2.0
+        ys = np.arange(self.height) * downscale + (downscale - 1) / 2.0
+        for bit, zone in enumerate(zones):
+            inside = _polygon_mask(zone["points"], xs, ys)
+            self.raster |= inside.astype(self.dtype) << self.dtype(bit)
+            if zone.get("type") == "restricted":
+                self.restricted_bits |= 1 << bit
+                self.restricted.append((bit, zone["id"]))
+
+    def lookup(self, points):
+        """Bitmask per (x, y) pixel point; points outside the frame get 0."""
+        pts = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        masks = np.zeros(len(pts), dtype=self.dtype)
+        if len(pts) == 0:
+            return masks
+        ix = pts[:, 0] // self.downscale
+        iy = pts[:, 1] // self.downscale
+        inside = (ix >= 0) & (iy >= 0) & (ix < self.width) & (iy < self.height)
+        masks[inside] = self.raster[iy[inside], ix[inside]]
+        return masks
+
+    def zones_in(self, mask):
+        """Zone ids encoded in one bitmask."""
+        mask = int(mask)
+        return [zone_id for bit, zone_id in enumerate(self.zone_ids) if mask >> bit & 1]
+
+
 class ZoneIntrusionDetector:
-    def __init__(self, zone_config_path="zones/zone_config.json"):
+    def __init__(self, zone_config_path="zones/zone_config.json", frame_size=(1280, 720), downscale=4):
         self.zones = self.load_zones(zone_config_path)
+        self.frame_size = frame_size
+        self.downscale = downscale
+        self._compiled = {}  # camera_name -> CompiledZones
 
     def load_zones(self, path):
         with open(path, 'r') as f:
@@ -14,24 +102,61 @@ class ZoneIntrusionDetector:
     def point_in_polygon(self, point, polygon):
         return cv2.pointPolygonTest(np.array(polygon, dtype=np.int32), point, False) >= 0
 
-    def detect_intrusions(self, camera_name, tracked_objects):
+    def compiled(self, camera_name, frame_size=None):
+        """
+        CompiledZones for a camera (None if it has no zones). Compiled once and
+        re-compiled only if the frame size changes.
+        """
+        zones = [zone for zone in self.zones.get(camera_name, []) if zone.get("type") != "line"]
+        if not zones:
+            return None
+        frame_size = tuple(frame_size) if frame_size is not None else tuple(self.frame_size)
+        compiled = self._compiled.get(camera_name)
+        if compiled is None or compiled.frame_size != frame_size:
+            compiled = CompiledZones(zones, frame_size, self.downscale)
+            self._compiled[camera_name] = compiled
+        return compiled
+
+    def lines(self, camera_name):
+        """Counting lines ("type": "line" entries) configured for a camera; see line_counter.LineCounter."""
+        return [zone for zone in self.zones.get(camera_name, []) if zone.get("type") == "line"]
+
+    def classify(self, camera_name, points, frame_size=None):
+        """Zone bitmask for each (x, y) point (all zeros if the camera has no zones)."""
+        compiled = self.compiled(camera_name, frame_size)
+        if compiled is None:
+            return np.zeros(len(points), dtype=np.uint8)
+        return compiled.lookup(points)
+
+    def detect_intrusions(self, camera_name, tracked_objects, frame_size=None):
+        """
+        tracked_objects: {object_id: (cx, cy)} as returned by CentroidTracker
+        (dicts with a "centroid" key are accepted too). Returns one entry per
+        object per restricted zone it is inside.
+        """
         intrusions = []
-        if camera_name not in self.zones:
+        compiled = self.compiled(camera_name, frame_size)
+        if compiled is None or not compiled.restricted_bits or not tracked_objects:
             return intrusions
 
-        for obj_id, obj in tracked_objects.items():
-            centroid = obj.get("centroid", None)
-            if not centroid:
-                continue
+        if isinstance(next(iter(tracked_objects.values())), dict):
+            tracked_objects = {obj_id: obj["centroid"] for obj_id, obj in tracked_objects.items()
+                               if obj.get("centroid") is not None}
+            if not tracked_objects:
+                return intrusions
+        count = len(tracked_objects)
+        object_ids = list(tracked_objects)
+        centroids = np.array(list(tracked_objects.values()), dtype=np.int64).reshape(count, 2)
 
-            for zone in self.zones[camera_name]:
-                if zone["type"] == "restricted":
-                    if self.point_in_polygon(tuple(centroid), zone["points"]):
-                        intrusions.append({
-                            "object_id": obj_id,
-                            "zone_id": zone["id"],
-                            "centroid": centroid
-                        })
+        masks = compiled.lookup(centroids)
+        # One pass per restricted zone over the objects inside it
+        for bit, zone_id in compiled.restricted:
+            inside = np.flatnonzero((masks >> compiled.dtype(bit)) & compiled.dtype(1))
+            intrusions.extend({
+                "object_id": object_ids[idx],
+                "zone_id": zone_id,
+                "centroid": (cx, cy)
+            } for idx, (cx, cy) in zip(inside.tolist(), centroids[inside].tolist()))
 
         return intrusions
 
@@ -40,6 +165,12 @@ class ZoneIntrusionDetector:
             return frame
 
         for zone in self.zones[camera_name]:
+            if zone["type"] == "line":
+                # Arrow points from p1 to p2; crossing it left-to-right counts as "in"
+                (x1, y1), (x2, y2) = zone["points"]
+                cv2.arrowedLine(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 255), 2, tipLength=0.03)
+                cv2.putText(frame, zone["id"], (int(x1), int(y1)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+                continue
             color = (0, 0, 255) if zone["type"] == "restricted" else (255, 255, 0)
             cv2.polylines(frame, [np.array(zone["points"], dtype=np.int32)], isClosed=True, color=color, thickness=2)
             cv2.putText(frame, zone["id"], tuple(zone["points"][0]), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
@@ -0,0 +1,168 @@
+# frame_source.py
+import sys
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+def is_file_source(video_source):
+    """True for local video files; camera indices and network streams are live."""
+    if isinstance(video_source, int):
+        return False
+    source = str(video_source)
+    if source.isdigit():
+        return False
+    return "://" not in source
+
+
+def open_capture(video_source, width=1280, height=720):
+    """
+    Open a webcam (index like 0 or 1) or a file path.
+    On Windows, try Media Foundation (MSMF) then DirectShow (DSHOW) for reliability.
+    Returns the cv2.VideoCapture (check isOpened()).
+    """
+    # Prefer Windows backends when available for camera indices
+    backend = cv2.CAP_MSMF if sys.platform.startswith("win") else cv2.CAP_ANY
+    cap = cv2.VideoCapture(video_source, backend)
+
+    # Fallback to DirectShow on Windows if MSMF fails
+    if not cap.isOpened() and sys.platform.startswith("win"):
+        cap = cv2.VideoCapture(video_source, cv2.CAP_DSHOW)
+
+    print(f"[DEBUG] Opening source: {video_source} (backend={backend})")
+    if not cap.isOpened():
+        return cap
+
+    # Optional capture properties (may be ignored by drivers)
+    if not is_file_source(video_source):
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        # Keep the driver queue short; the grabber thread holds what we need
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+class FrameGrabber:
+    """
+    Reads a capture continuously on its own thread into a small buffer so
+    the analysis loop always works on fresh frames.
+
+    Policies:
+      - "latest": one-slot buffer, each new frame replaces the unread one
+      - "nth":    like "latest" but only every `every_n`-th captured frame is offered
+      - "fifo":   bounded queue, capture waits when full (no drops; for files)
+
+    The default policy is "fifo" for file sources and "latest" otherwise.
+    Counters: captured, dropped, processed (handed to the caller).
+    """
+
+    POLICIES = ("latest", "nth", "fifo")
+
+    def __init__(self, video_source, policy=None, every_n=2, buffer_size=8,
+                 width=1280, height=720):
+        if policy is None:
+            policy = "fifo" if is_file_source(video_source) else "latest"
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown frame policy: {policy!r} (expected one of {self.POLICIES})")
+
+        self.video_source = video_source
+        self.policy = policy
+        self.every_n = max(1, int(every_n))
+        self.width = width
+        self.height = height
+        self.is_file = is_file_source(video_source)
+
+        maxlen = buffer_size if policy == "fifo" else 1
+        self._buffer = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._ended = False
+        self.cap = None
+
+        self.captured = 0
+        self.dropped = 0
+        self.processed = 0
+        self.last_latency = 0.0  # seconds between capture and hand-off
+
+    def start(self):
+        """Open the source and start the capture thread. Returns False if it cannot be opened."""
+        self.cap = open_capture(self.video_source, self.width, self.height)
+        if not self.cap.isOpened():
+            return False
+        self._running = True
+        self._ended = False
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True,
+                                        name=f"capture-{self.video_source}")
+        self._thread.start()
+        return True
+
+    def _capture_loop(self):
+        while self._running:
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+
+            captured_at = time.time()
+            # For files use media time so replays report the recorded timeline
+            if self.is_file:
+                timestamp = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            else:
+                timestamp = captured_at
+
+            with self._cond:
+                self.captured += 1
+                if self.policy == "nth" and (self.captured - 1) % self.every_n:
+                    self.dropped += 1
+                    continue
+
+                if self.policy == "fifo":
+                    while self._running and len(self._buffer) >= self._buffer.maxlen:
+                        self._cond.wait(0.1)
+                elif self._buffer:
+                    # Slot still holds an unread frame: it is now stale
+                    self.dropped += 1
+
+                self._buffer.append((frame, timestamp, captured_at))
+                self._cond.notify_all()
+
+        with self._cond:
+            self._ended = True
+            self._cond.notify_all()
+
+    def read(self, timeout=1.0):
+        """
+        Return (frame, timestamp) for the next frame to analyse, or None when the
+        stream has ended (or was stopped). Blocks up to `timeout` per wait and
+        keeps waiting while the source is still live.
+        """
+        with self._cond:
+            while not self._buffer:
+                if self._ended or not self._running:
+                    return None
+                self._cond.wait(timeout)
+            frame, timestamp, captured_at = self._buffer.popleft()
+            self.processed += 1
+            self.last_latency = time.time() - captured_at
+            self._cond.notify_all()
+        return frame, timestamp
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(2.0)
+        if self.cap is not None:
+            self.cap.release()
+
+    def stats(self):
+        return {
+            "policy": self.policy,
+            "captured": self.captured,
+            "dropped": self.dropped,
+            "processed": self.processed,
+            "latency_ms": round(self.last_latency * 1000.0, 1),
+        }
@@ -0,0 +1,149 @@
+# heatmap.py
+import csv
+import os
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from db import DEFAULT_DIR
+
+
+class HeatmapAccumulator:
+    """
+    Per-camera occupancy heatmap fed with tracker centroids.
+
+    Points are binned into a float32 grid of `cell`-pixel cells with one
+    bincount scatter-add per frame, and the grid decays with a half-life of
+    `half_life` seconds, so memory is constant however long the camera runs.
+    A background thread periodically writes, into `log_dir`:
+      - heatmap_{camera}.jpg       colour-mapped fine grid at frame size
+      - zone_heatmap_{camera}.jpg  coarse zone_rows x zone_cols occupancy
+      - zone_counts_{camera}.csv   the same coarse grid ("Zone(Row,Col)", "Count")
+    """
+
+    def __init__(self, camera_id, frame_size=(1280, 720), cell=8, half_life=900.0,
+                 zone_grid=(4, 6), log_dir=DEFAULT_DIR):
+        self.camera_id = camera_id
+        self.cell = cell
+        self.half_life = half_life
+        self.zone_rows, self.zone_cols = zone_grid
+        self.log_dir = Path(log_dir)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._reset(frame_size)
+
+    def _reset(self, frame_size):
+        self.frame_w, self.frame_h = int(frame_size[0]), int(frame_size[1])
+        self.grid_w = -(-self.frame_w // self.cell)
+        self.grid_h = -(-self.frame_h // self.cell)
+        self.grid = np.zeros((self.grid_h, self.grid_w), dtype=np.float32)
+        self._last_decay = None
+
+    def ensure_frame_size(self, width, height):
+        """Re-create the grid if the camera resolution changed."""
+        if (width, height) != (self.frame_w, self.frame_h):
+            with self._lock:
+                self._reset((width, height))
+
+    def add(self, points, timestamp=None):
+        """Accumulate an (N, 2) array-like of x, y pixel centroids."""
+        now = time.time() if timestamp is None else timestamp
+        pts = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+
+        with self._lock:
+            # Decay at most once per second; the grid is small so this is cheap
+            if self._last_decay is None:
+                self._last_decay = now
+            elif now - self._last_decay >= 1.0:
+                self.grid *= np.float32(0.5 ** ((now - self._last_decay) / self.half_life))
+                self._last_decay = now
+
+            if len(pts) == 0:
+                return
+            ix = np.clip(pts[:, 0] // self.cell, 0, self.grid_w - 1)
+            iy = np.clip(pts[:, 1] // self.cell, 0, self.grid_h - 1)
+            flat = np.bincount(iy * self.grid_w + ix, minlength=self.grid.size)
+            self.grid += flat.reshape(self.grid.shape).astype(np.float32)
+
+    def snapshot(self):
+        with self._lock:
+            return self.grid.copy()
+
+    def zone_counts(self, grid=None):
+        """Sum the fine grid into zone_rows x zone_cols cells (rounded to ints)."""
+        grid = self.snapshot() if grid is None else grid
+        row_edges = np.linspace(0, grid.shape[0], self.zone_rows + 1).astype(int)
+        col_edges = np.linspace(0, grid.shape[1], self.zone_cols + 1).astype(int)
+        rows = np.add.reduceat(grid, row_edges[:-1], axis=0)
+        return np.rint(np.add.reduceat(rows, col_edges[:-1], axis=1)).astype(np.int64)
+
+    @staticmethod
+    def _colorize(values):
+        peak = float(values.max())
+        scaled = values / peak * 255.0 if peak > 0 else np.zeros_like(values)
+        return cv2.applyColorMap(scaled.astype(np.uint8), cv2.COLORMAP_JET)
+
+    @staticmethod
+    def _write_image(path, image):
+        # Write then rename so the dashboard never reads a half-written file
+        tmp = path.with_name(path.stem + ".tmp" + path.suffix)
+        cv2.imwrite(str(tmp), image)
+        os.replace(tmp, path)
+
+    def write(self):
+        """Render the heatmap images and zone CSV for this camera."""
+        grid = self.snapshot()
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+
+        heat = cv2.GaussianBlur(grid, (0, 0), 1.5)
+        heat_img = cv2.resize(self._colorize(heat), (self.frame_w, self.frame_h),
+                              interpolation=cv2.INTER_LINEAR)
+        self._write_image(self.log_dir / f"heatmap_{self.camera_id}.jpg", heat_img)
+
+        zones = self.zone_counts(grid)
+        zone_img = cv2.resize(self._colorize(zones.astype(np.float32)), (self.frame_w, self.frame_h),
+                              interpolation=cv2.INTER_NEAREST)
+        cell_w = self.frame_w / self.zone_cols
+        cell_h = self.frame_h / self.zone_rows
+        for (r, c), count in np.ndenumerate(zones):
+            cv2.putText(zone_img, str(count), (int(c * cell_w + 10), int(r * cell_h + 30)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        self._write_image(self.log_dir / f"zone_heatmap_{self.camera_id}.jpg", zone_img)
+
+        csv_path = self.log_dir / f"zone_counts_{self.camera_id}.csv"
+        tmp = csv_path.with_name(csv_path.name + ".tmp")
+        with open(tmp, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Zone(Row,Col)", "Count"])
+            for (r, c), count in np.ndenumerate(zones):
+                writer.writerow([f"({r},{c})", int(count)])
+        os.replace(tmp, csv_path)
+
+    def start(self, interval=30.0):
+        """Write outputs every `interval` seconds on a background thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.write()
+                except Exception as e:
+                    print(f"[WARN] heatmap write failed for {self.camera_id}: {e}")
+
+        self._thread = threading.Thread(target=run, daemon=True, name=f"heatmap-{self.camera_id}")
+        self._thread.start()
+
+    def stop(self, flush=True):
+        """Stop the writer thread and optionally write a final snapshot."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+            self._thread = None
+        if flush:
+            self.write()
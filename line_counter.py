@@ -1,32 +1,164 @@
 from datetime import datetime
+import time
+
+import numpy as np
+
+# A horizontal line long enough to span any frame (the legacy single counting line)
+DEFAULT_LINE_EXTENT = 1_000_000
+
 
 class LineCounter:
-    def __init__(self, line_position):
+    """
+    Counts tracks crossing any number of line segments.
+
+    Lines are {"id", "points": [[x1, y1], [x2, y2]]} (type "line" entries in
+    zones/zone_config.json). A crossing from the left of the directed
+    segment p1->p2 to its right (in image coordinates, y down) counts as
+    "in", the opposite as "out"; a line drawn left to right therefore counts
+    downward movement as "in". Without configured lines a single horizontal
+    line at `line_position` is used. Segments include both end points; a
+    move through a point shared by several lines (doors chained head to
+    tail, or drawn from one corner) is counted once, on the first of those
+    lines in configuration order.
+
+    All tracks are tested against all lines in one vectorized pass. Previous
+    positions are kept only for tracks present in the last update, and the
+    history is a ring of `history_minutes` per-minute bins keyed by wall-clock
+    time, so a replayed file is binned when it is processed, not at its media
+    time.
+    """
+
+    def __init__(self, line_position, lines=None, history_minutes=24 * 60):
         self.line_y = line_position
-        self.count_in = 0
-        self.count_out = 0
-        self.history = []
-        self.previous_positions = {}
-
-    def update(self, tracked_objects):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-        in_this_frame = 0
-        out_this_frame = 0
-
-        for obj_id, (cx, cy) in tracked_objects.items():
-            if obj_id in self.previous_positions:
-                prev_y = self.previous_positions[obj_id]
-                if prev_y < self.line_y and cy >= self.line_y:
-                    in_this_frame += 1
-                    self.count_in += 1
-                elif prev_y > self.line_y and cy <= self.line_y:
-                    out_this_frame += 1
-                    self.count_out += 1
-            self.previous_positions[obj_id] = cy
-
-        if in_this_frame > 0 or out_this_frame > 0:
-            self.history.append({
-                "time": timestamp,
-                "in": in_this_frame,
-                "out": out_this_frame
-            })
+        self.history_minutes = history_minutes
+        self.configure(lines)
+
+    def configure(self, lines=None):
+        """Replace the counting lines (resets counts, positions and history)."""
+        if not lines:
+            lines = [{"id": "line", "points": [[-DEFAULT_LINE_EXTENT, self.line_y],
+                                               [DEFAULT_LINE_EXTENT, self.line_y]]}]
+        self.line_ids = [line["id"] for line in lines]
+        segments = np.array([line["points"] for line in lines], dtype=np.float64).reshape(-1, 2, 2)
+        self.starts = segments[:, 0]
+        self.directions = segments[:, 1] - segments[:, 0]
+        # Id of each segment's p1/p2 point; equal ids mark end points shared between lines
+        _, vertex_ids = np.unique(segments.reshape(-1, 2), axis=0, return_inverse=True)
+        self.vertex_ids = vertex_ids.reshape(-1, 2)
+        self.shared_points = len(np.unique(vertex_ids)) < vertex_ids.size
+
+        count = len(self.line_ids)
+        self.counts_in = np.zeros(count, dtype=np.int64)
+        self.counts_out = np.zeros(count, dtype=np.int64)
+        self.track_ids = np.zeros(0, dtype=np.int64)
+        self.positions = np.zeros((0, 2), dtype=np.float64)
+
+        self.bin_minute = np.full(self.history_minutes, -1, dtype=np.int64)
+        self.bin_in = np.zeros((self.history_minutes, count), dtype=np.int64)
+        self.bin_out = np.zeros((self.history_minutes, count), dtype=np.int64)
+
+    @property
+    def count_in(self):
+        return int(self.counts_in.sum())
+
+    @property
+    def count_out(self):
+        return int(self.counts_out.sum())
+
+    def counts(self):
+        """{line_id: {"in": n, "out": n}}"""
+        return {line_id: {"in": int(i), "out": int(o)}
+                for line_id, i, o in zip(self.line_ids, self.counts_in, self.counts_out)}
+
+    def update(self, tracked_objects, now=None):
+        """
+        tracked_objects: {object_id: (cx, cy)} from CentroidTracker.
+        now: wall-clock epoch seconds for the history bin (defaults to
+        time.time()); not a capture timestamp, which is media time for files.
+        Returns (in, out) crossings counted in this update.
+        """
+        count = len(tracked_objects)
+        if count == 0:
+            self.track_ids = np.zeros(0, dtype=np.int64)
+            self.positions = np.zeros((0, 2), dtype=np.float64)
+            return 0, 0
+
+        ids = np.fromiter(tracked_objects.keys(), dtype=np.int64, count=count)
+        points = np.array(list(tracked_objects.values()), dtype=np.float64).reshape(count, 2)
+        order = np.argsort(ids)
+        ids, points = ids[order], points[order]
+
+        # Previous position of tracks seen in the last update; departed tracks drop out
+        crossed_in = crossed_out = None
+        if len(self.track_ids):
+            pos = np.minimum(np.searchsorted(self.track_ids, ids), len(self.track_ids) - 1)
+            known = self.track_ids[pos] == ids
+            if known.any():
+                prev = self.positions[pos[known]][:, None, :]   # (k, 1, 2)
+                cur = points[known][:, None, :]
+                starts, directions = self.starts[None], self.directions[None]  # (1, m, 2)
+
+                # Side of each line before and after the move (cross product sign)
+                side_prev = _cross(directions, prev - starts)
+                side_cur = _cross(directions, cur - starts)
+                # The move must pass between (or through) the segment's end points
+                move = cur - prev
+                end_a = _cross(move, starts - prev)
+                end_b = _cross(move, starts + directions - prev)
+                within = end_a * end_b <= 0
+
+                crossed_in = (side_prev < 0) & (side_cur >= 0) & within
+                crossed_out = (side_prev > 0) & (side_cur <= 0) & within
+                if self.shared_points:
+                    shadowed = _shadowed_at_shared_points(crossed_in | crossed_out, end_a, end_b,
+                                                          self.vertex_ids)
+                    crossed_in &= ~shadowed
+                    crossed_out &= ~shadowed
+
+        self.track_ids, self.positions = ids, points
+        if crossed_in is None:
+            return 0, 0
+
+        line_in = crossed_in.sum(axis=0)
+        line_out = crossed_out.sum(axis=0)
+        total_in, total_out = int(line_in.sum()), int(line_out.sum())
+        if total_in or total_out:
+            self.counts_in += line_in
+            self.counts_out += line_out
+            minute = int((time.time() if now is None else now) // 60)
+            slot = minute % self.history_minutes
+            if self.bin_minute[slot] != minute:
+                self.bin_minute[slot] = minute
+                self.bin_in[slot] = 0
+                self.bin_out[slot] = 0
+            self.bin_in[slot] += line_in
+            self.bin_out[slot] += line_out
+        return total_in, total_out
+
+    @property
+    def history(self):
+        """Per-minute totals, oldest first: [{"time": "YYYY-mm-dd HH:MM", "in": n, "out": n}]."""
+        used = np.flatnonzero(self.bin_minute >= 0)
+        used = used[np.argsort(self.bin_minute[used])]
+        return [{
+            "time": datetime.fromtimestamp(int(self.bin_minute[slot]) * 60).strftime("%Y-%m-%d %H:%M"),
+            "in": int(self.bin_in[slot].sum()),
+            "out": int(self.bin_out[slot].sum()),
+        } for slot in used]
+
+
+def _cross(a, b):
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def _shadowed_at_shared_points(crossed, end_a, end_b, vertex_ids):
+    """
+    (k, m) mask of crossings to drop: a move through an end point counts only
+    on the lowest-indexed line it crosses at that point.
+    """
+    # Id of the end point each crossing passes through (-1: between the end points)
+    hit = np.where(end_a == 0, vertex_ids[:, 0], np.where(end_b == 0, vertex_ids[:, 1], -1))
+    hit = np.where(crossed, hit, -1)
+    m = hit.shape[1]
+    same = (hit[:, :, None] == hit[:, None, :]) & (hit[:, :, None] >= 0)   # (k, m, m)
+    return (same & np.tri(m, m, -1, dtype=bool)[None]).any(axis=2)
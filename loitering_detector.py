@@ -1,25 +1,101 @@
-from datetime import datetime
+import numpy as np
+
 
 class LoiteringDetector:
-    def __init__(self, loitering_threshold=300):
+    """
+    Dwell-time engine driven by capture timestamps.
+
+    update() is called once per frame with the tracker's objects and the
+    frame's timestamp (media time for files, so replays faster than real
+    time give the same dwell times). Per-track entry time and per-zone dwell
+    are kept in arrays sorted by track id; tracks the tracker no longer
+    holds are simply not carried over, so state never outlives a track.
+
+    A track loiters when it has been in view for `loitering_threshold`
+    seconds, or inside a zone for longer than that zone's `loiter_seconds`
+    (from zone_config.json, see detectors.zone_intrusion.CompiledZones).
+    """
+
+    def __init__(self, loitering_threshold=300, max_gap=1.0):
         self.loitering_threshold = loitering_threshold  # Time in seconds
-        self.loitering_objects = {}
-
-    def update(self, tracked_objects):
-        alert_text = []
-        for object_id, (cx, cy) in tracked_objects.items():
-            # If object already being tracked for loitering
-            if object_id in self.loitering_objects:
-                last_seen, timer = self.loitering_objects[object_id]
-                if (datetime.now() - last_seen).total_seconds() < self.loitering_threshold:
-                    self.loitering_objects[object_id] = (datetime.now(), timer + 1)
-                else:
-                    self.loitering_objects[object_id] = (datetime.now(), 0)
-            else:
-                self.loitering_objects[object_id] = (datetime.now(), 0)
-
-            # Check loitering condition
-            if self.loitering_objects[object_id][1] >= self.loitering_threshold:
-                alert_text.append(f"⚠️ Loitering Detected for Object {object_id}")
-
-        return alert_text
+        self.max_gap = max_gap  # cap on per-frame dwell increments (stalls, dropped frames)
+        self.reset()
+
+    def reset(self):
+        self.track_ids = np.zeros(0, dtype=np.int64)
+        self.entered = np.zeros(0, dtype=np.float64)
+        self.zone_dwell = np.zeros((0, 0), dtype=np.float64)
+        self.zone_ids = []
+        self.last_timestamp = None
+
+    def dwell_times(self):
+        """{track_id: seconds in view} as of the last update."""
+        if self.last_timestamp is None:
+            return {}
+        return dict(zip(self.track_ids.tolist(), (self.last_timestamp - self.entered).tolist()))
+
+    def update(self, tracked_objects, timestamp, zones=None):
+        """
+        tracked_objects: {object_id: (cx, cy)} from CentroidTracker.
+        timestamp: capture time of the frame in seconds.
+        zones: optional CompiledZones for the camera (per-zone dwell/thresholds).
+
+        Returns one dict per current loitering condition:
+        {"object_id", "zone_id" (None = anywhere in view), "dwell" (seconds)}.
+        """
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            # Clock went backwards (e.g. a replayed file restarted): start over
+            self.reset()
+        dt = 0.0 if self.last_timestamp is None else min(timestamp - self.last_timestamp, self.max_gap)
+        self.last_timestamp = timestamp
+
+        count = len(tracked_objects)
+        zone_ids = zones.zone_ids if zones is not None else []
+        if zone_ids != self.zone_ids:
+            self.zone_dwell = np.zeros((len(self.track_ids), len(zone_ids)), dtype=np.float64)
+            self.zone_ids = list(zone_ids)
+        if count == 0:
+            self.reset_tracks()
+            return []
+
+        ids = np.fromiter(tracked_objects.keys(), dtype=np.int64, count=count)
+        points = np.array(list(tracked_objects.values()), dtype=np.int64).reshape(count, 2)
+        order = np.argsort(ids)
+        ids, points = ids[order], points[order]
+
+        # Carry over state for known tracks; departed tracks drop out here
+        if len(self.track_ids):
+            pos = np.minimum(np.searchsorted(self.track_ids, ids), len(self.track_ids) - 1)
+            known = self.track_ids[pos] == ids
+        else:
+            pos = np.zeros(count, dtype=np.int64)
+            known = np.zeros(count, dtype=bool)
+        entered = np.where(known, self.entered[pos] if len(self.entered) else timestamp, timestamp)
+        zone_dwell = np.zeros((count, len(self.zone_ids)), dtype=np.float64)
+        if len(self.zone_ids) and known.any():
+            zone_dwell[known] = self.zone_dwell[pos[known]]
+
+        self.track_ids, self.entered, self.zone_dwell = ids, entered, zone_dwell
+
+        events = []
+        dwell = timestamp - entered
+        for idx in np.flatnonzero(dwell >= self.loitering_threshold):
+            events.append({"object_id": int(ids[idx]), "zone_id": None, "dwell": float(dwell[idx])})
+
+        if self.zone_ids:
+            masks = zones.lookup(points).astype(np.uint64)
+            inside = (masks[:, None] >> np.arange(len(self.zone_ids), dtype=np.uint64)) & np.uint64(1)
+            inside = inside.astype(bool)
+            # Dwell accumulates while inside and resets when the track leaves the zone
+            zone_dwell[inside] += dt
+            zone_dwell[~inside] = 0.0
+            over = inside & (zone_dwell >= zones.loiter_seconds)
+            for idx, bit in zip(*np.nonzero(over)):
+                events.append({"object_id": int(ids[idx]), "zone_id": self.zone_ids[bit],
+                               "dwell": float(zone_dwell[idx, bit])})
+        return events
+
+    def reset_tracks(self):
+        self.track_ids = np.zeros(0, dtype=np.int64)
+        self.entered = np.zeros(0, dtype=np.float64)
+        self.zone_dwell = np.zeros((0, len(self.zone_ids)), dtype=np.float64)
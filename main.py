@@ -2,11 +2,14 @@
 import os
 import cv2
 import csv
+import time
 import numpy as np
 from datetime import datetime
 from db import init_db, insert_log
 from dashboard import app as dashboard_app
-from core_processing import SurveillanceProcessor
+from camera_supervisor import CameraSupervisor
+from metrics import get_metrics
+from utils import load_config, processor_options
 # Remove: from app import send_alert  # This caused the circular import!
 
 camera_feeds = {
@@ -14,13 +17,34 @@ camera_feeds = {
     # "secondary_cam": 1,   # uncomment if a second camera is connected
 }
 
-def main():
-    processor = SurveillanceProcessor()
-    
+# "thread" shares one detector between cameras; "process" isolates each camera
+WORKER_MODE = "thread"
+STATS_INTERVAL = 10  # seconds between per-camera FPS reports
+METRICS_LOG_INTERVAL = 60  # seconds between [METRICS] stage-latency dumps (0 disables)
+
+def main(worker_mode=WORKER_MODE):
+    # Enabled stages and keyframe interval come from config.yaml
+    supervisor = CameraSupervisor(mode=worker_mode,
+                                  processor_options=processor_options(load_config()))
+    if METRICS_LOG_INTERVAL and worker_mode == "thread":
+        # Process workers keep their own registries, so only thread mode is dumped here
+        get_metrics().start_log_dump(METRICS_LOG_INTERVAL)
+
     for camera_id, path in camera_feeds.items():
         print(f"Starting surveillance for {camera_id}")
-        processor.process_camera_stream(camera_id, path)
-    
+        supervisor.add_camera(camera_id, path)
+
+    try:
+        while supervisor.any_alive():
+            time.sleep(STATS_INTERVAL)
+            for camera_id, stats in supervisor.stats().items():
+                print(f"[STATS] {camera_id}: {stats['fps']} FPS, {stats['frames']} frames, "
+                      f"{stats['dropped']} dropped, alive={stats['alive']}")
+    except KeyboardInterrupt:
+        print("Stopping all cameras...")
+    finally:
+        supervisor.stop_all()
+
     cv2.destroyAllWindows()
 
 if __name__ == "__main__":
@@ -28,5 +52,7 @@ if __name__ == "__main__":
     import sys
     if len(sys.argv) > 1 and sys.argv[1] == "dashboard":
         dashboard_app.run_server(debug=True)
+    elif len(sys.argv) > 1 and sys.argv[1] in ("thread", "process"):
+        main(worker_mode=sys.argv[1])
     else:
         main()
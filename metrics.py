@@ -0,0 +1,181 @@
+# metrics.py
+import bisect
+import json
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds (100 µs .. 2 s)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.0)
+WINDOW = 1024  # recent samples kept per stage for percentiles
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class StageHistogram:
+    """
+    Cumulative bucket counts (for Prometheus) plus a ring of the most recent
+    samples (for rolling percentiles). observe() is a bisect and a few
+    integer updates; each stage of each camera is written by one thread.
+    """
+
+    __slots__ = ("counts", "total", "count", "recent", "pos")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent = [0.0] * WINDOW
+        self.pos = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        self.recent[self.pos] = seconds
+        self.pos = (self.pos + 1) % WINDOW
+
+    def percentiles(self, quantiles=QUANTILES):
+        samples = sorted(self.recent[:min(self.count, WINDOW)])
+        if not samples:
+            return {q: 0.0 for q in quantiles}
+        last = len(samples) - 1
+        return {q: samples[min(last, int(round(q * last)))] for q in quantiles}
+
+
+class PipelineMetrics:
+    """
+    Per-camera stage timers and counters.
+
+    Usage in the hot path:
+        t = time.perf_counter()
+        ... stage ...
+        t = metrics.lap(camera_id, "detect", t)
+    """
+
+    def __init__(self):
+        self._stages = {}    # (camera_id, stage) -> StageHistogram
+        self._counters = {}  # (camera_id, name) -> number
+        self._lock = threading.Lock()
+        self._dump_thread = None
+        self._dump_stop = threading.Event()
+
+    def _histogram(self, key):
+        with self._lock:
+            hist = self._stages.get(key)
+            if hist is None:
+                hist = self._stages[key] = StageHistogram()
+            return hist
+
+    def observe(self, camera_id, stage, seconds):
+        key = (camera_id, stage)
+        hist = self._stages.get(key)
+        if hist is None:
+            hist = self._histogram(key)
+        hist.observe(seconds)
+
+    def lap(self, camera_id, stage, started):
+        """Record time since `started` for a stage; returns now for the next stage."""
+        now = time.perf_counter()
+        self.observe(camera_id, stage, now - started)
+        return now
+
+    def count(self, camera_id, name, amount=1):
+        key = (camera_id, name)
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set(self, camera_id, name, value):
+        """Set a counter to an absolute value (e.g. cumulative drops reported by the grabber)."""
+        self._counters[(camera_id, name)] = value
+
+    def snapshot(self):
+        """{camera_id: {"stages": {stage: {...}}, "counters": {...}}} with times in ms."""
+        with self._lock:
+            stages = list(self._stages.items())
+            counters = list(self._counters.items())
+        result = {}
+        for (camera_id, stage), hist in stages:
+            pct = hist.percentiles()
+            result.setdefault(camera_id, {"stages": {}, "counters": {}})["stages"][stage] = {
+                "count": hist.count,
+                "mean_ms": round(hist.total / hist.count * 1000.0, 3) if hist.count else 0.0,
+                **{f"p{int(q * 100)}_ms": round(v * 1000.0, 3) for q, v in pct.items()},
+            }
+        for (camera_id, name), value in counters:
+            result.setdefault(camera_id, {"stages": {}, "counters": {}})["counters"][name] = value
+        return result
+
+    def prometheus(self, prefix="surveillance"):
+        """Prometheus text exposition format."""
+        with self._lock:
+            stages = sorted(self._stages.items(), key=lambda item: (str(item[0][0]), item[0][1]))
+            counters = sorted(self._counters.items(), key=lambda item: (str(item[0][0]), item[0][1]))
+
+        lines = [f"# HELP {prefix}_stage_seconds Processing time per pipeline stage.",
+                 f"# TYPE {prefix}_stage_seconds histogram"]
+        for (camera_id, stage), hist in stages:
+            labels = f'camera="{_escape(camera_id)}",stage="{stage}"'
+            cumulative = 0
+            for bound, n in zip(BUCKETS, hist.counts):
+                cumulative += n
+                lines.append(f'{prefix}_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{{labels},le="+Inf"}} {hist.count}')
+            lines.append(f"{prefix}_stage_seconds_sum{{{labels}}} {hist.total:.6f}")
+            lines.append(f"{prefix}_stage_seconds_count{{{labels}}} {hist.count}")
+
+        lines += [f"# HELP {prefix}_stage_recent_seconds Percentiles over the last {WINDOW} samples.",
+                  f"# TYPE {prefix}_stage_recent_seconds gauge"]
+        for (camera_id, stage), hist in stages:
+            labels = f'camera="{_escape(camera_id)}",stage="{stage}"'
+            for q, v in hist.percentiles().items():
+                lines.append(f'{prefix}_stage_recent_seconds{{{labels},quantile="{q}"}} {v:.6f}')
+
+        names = sorted({name for (_, name), _ in counters})
+        for name in names:
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for (camera_id, counter_name), value in counters:
+                if counter_name == name:
+                    lines.append(f'{prefix}_{name}_total{{camera="{_escape(camera_id)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def start_log_dump(self, interval=60.0, path=None):
+        """Every `interval` seconds print a [METRICS] summary, or append JSON lines to `path`."""
+        if self._dump_thread is not None:
+            return
+        self._dump_stop.clear()
+
+        def loop():
+            while not self._dump_stop.wait(interval):
+                snapshot = self.snapshot()
+                if path:
+                    with open(path, "a") as f:
+                        f.write(json.dumps({"time": time.time(), "metrics": snapshot}) + "\n")
+                    continue
+                for camera_id, data in snapshot.items():
+                    stages = ", ".join(f"{stage} p50={s['p50_ms']}ms p99={s['p99_ms']}ms"
+                                       for stage, s in data["stages"].items())
+                    print(f"[METRICS] {camera_id}: {data['counters']} {stages}")
+
+        self._dump_thread = threading.Thread(target=loop, daemon=True, name="metrics-dump")
+        self._dump_thread.start()
+
+    def stop_log_dump(self):
+        self._dump_stop.set()
+        if self._dump_thread is not None:
+            self._dump_thread.join(2.0)
+            self._dump_thread = None
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_metrics():
+    """Process-wide metrics registry shared by all processors in this process."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = PipelineMetrics()
+        return _metrics
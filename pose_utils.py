@@ -1,24 +1,200 @@
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
-import mediapipe as mp
+import numpy as np
+
+_mp = None
+
+def _mediapipe():
+    # mediapipe takes seconds to import; only pay for it once pose runs
+    global _mp
+    if _mp is None:
+        import mediapipe
+        _mp = mediapipe
+    return _mp
+
+NUM_LANDMARKS = 33
+
+# One pose per tracked person: landmarks is a (33, 4) array of x, y, z, visibility
+# normalized to a square around the person box; box is the crop in frame pixels.
+PersonPose = namedtuple("PersonPose", ["landmarks", "result", "box"])
+
+
+def landmarks_to_array(pose_landmarks, crop_size=None):
+    """
+    Convert MediaPipe pose landmarks into a (33, 4) float32 array.
+    With crop_size=(w, h), coordinates are rescaled from crop-normalized to a
+    square of side max(w, h) so vertical distances keep the person's aspect.
+    """
+    arr = np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark],
+                   dtype=np.float32)
+    if crop_size is not None:
+        w, h = crop_size
+        side = float(max(w, h))
+        arr[:, 0] *= w / side
+        arr[:, 1] *= h / side
+    return arr
 
-mp_pose = mp.solutions.pose
 
 class PoseDetector:
-    def __init__(self, static_image_mode=False, min_detection_confidence=0.5, min_tracking_confidence=0.5):
-        self.pose = mp_pose.Pose(static_image_mode=static_image_mode,
-                                 min_detection_confidence=min_detection_confidence,
-                                 min_tracking_confidence=min_tracking_confidence)
+    def __init__(self, static_image_mode=False, min_detection_confidence=0.5, min_tracking_confidence=0.5,
+                 workers=0, crop_padding=0.1, min_crop_height=48):
+        self.static_image_mode = static_image_mode
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+        self.crop_padding = crop_padding
+        self.min_crop_height = min_crop_height
+
+        # Crops of different people must not share tracking state, so per-crop
+        # estimation uses static-image Pose instances: one per executor worker
+        # thread, plus one (behind a lock) for crops estimated inline.
+        self._local = threading.local()
+        self._inline_pose = None
+        self._inline_lock = threading.Lock()
+        self._crop_poses = []  # every crop model created, released by close()
+        self._crop_poses_lock = threading.Lock()
+        self._pose = None
+        self.workers = workers if workers > 1 else 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pose") \
+            if workers > 1 else None
+
+    @property
+    def pose(self):
+        # Full-frame tracker, created on first detect_pose()
+        if self._pose is None:
+            self._pose = _mediapipe().solutions.pose.Pose(
+                static_image_mode=self.static_image_mode,
+                min_detection_confidence=self.min_detection_confidence,
+                min_tracking_confidence=self.min_tracking_confidence)
+        return self._pose
+
+    def warmup(self, size=(256, 256)):
+        """
+        Build the crop models and run each once ahead of the first frame: the
+        inline one and, with workers, one on every executor thread, since a
+        worker only ever uses the model it built itself.
+        """
+        blank = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+        with self._inline_lock:
+            self._get_inline_pose().process(blank)
+        if self._executor is None:
+            return
+
+        # Each job holds its thread until all have started, so every worker gets one
+        barrier = threading.Barrier(self.workers)
+
+        def warm():
+            try:
+                self._crop_pose().process(blank)
+            finally:
+                barrier.wait(timeout=60.0)
+
+        for future in [self._executor.submit(warm) for _ in range(self.workers)]:
+            future.result()
 
     def detect_pose(self, frame):
         rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         result = self.pose.process(rgb)
         return result
 
+    def _new_crop_pose(self):
+        pose = _mediapipe().solutions.pose.Pose(
+            static_image_mode=True, min_detection_confidence=self.min_detection_confidence)
+        with self._crop_poses_lock:
+            self._crop_poses.append(pose)
+        return pose
+
+    def _crop_pose(self):
+        # Executor workers: one model per thread
+        pose = getattr(self._local, "pose", None)
+        if pose is None:
+            pose = self._local.pose = self._new_crop_pose()
+        return pose
+
+    def _get_inline_pose(self):
+        # Call with _inline_lock held
+        if self._inline_pose is None:
+            self._inline_pose = self._new_crop_pose()
+        return self._inline_pose
+
+    def _crop_box(self, box, frame_w, frame_h):
+        x1, y1, x2, y2 = (int(v) for v in box)
+        pad_x = int((x2 - x1) * self.crop_padding)
+        pad_y = int((y2 - y1) * self.crop_padding)
+        return (max(0, x1 - pad_x), max(0, y1 - pad_y),
+                min(frame_w, x2 + pad_x), min(frame_h, y2 + pad_y))
+
+    def _estimate(self, frame, crop_box, inline=False):
+        x1, y1, x2, y2 = crop_box
+        rgb = cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2RGB)
+        if inline:
+            with self._inline_lock:
+                result = self._get_inline_pose().process(rgb)
+        else:
+            result = self._crop_pose().process(rgb)
+        if not result.pose_landmarks:
+            return None
+        landmarks = landmarks_to_array(result.pose_landmarks, (x2 - x1, y2 - y1))
+        return PersonPose(landmarks, result, crop_box)
+
+    def detect_poses(self, frame, person_boxes):
+        """
+        Estimate one pose per tracked person on padded crops of their boxes.
+        person_boxes: {track_id: (x1, y1, x2, y2)}. Returns {track_id: PersonPose}
+        for crops where a pose was found; empty (and free) when nobody is tracked.
+        """
+        if not person_boxes:
+            return {}
+
+        h, w = frame.shape[:2]
+        jobs = {}
+        for track_id, box in person_boxes.items():
+            crop_box = self._crop_box(box, w, h)
+            if crop_box[3] - crop_box[1] < self.min_crop_height or crop_box[2] <= crop_box[0]:
+                continue
+            jobs[track_id] = crop_box
+
+        if self._executor is not None and len(jobs) > 1:
+            futures = {tid: self._executor.submit(self._estimate, frame, cb) for tid, cb in jobs.items()}
+            poses = {tid: f.result() for tid, f in futures.items()}
+        else:
+            poses = {tid: self._estimate(frame, cb, inline=True) for tid, cb in jobs.items()}
+        return {tid: pose for tid, pose in poses.items() if pose is not None}
+
     def draw_landmarks(self, frame, result):
         if result.pose_landmarks:
+            mp = _mediapipe()
             mp.solutions.drawing_utils.draw_landmarks(
                 frame,
                 result.pose_landmarks,
-                mp_pose.POSE_CONNECTIONS,
+                mp.solutions.pose.POSE_CONNECTIONS,
                 mp.solutions.drawing_styles.get_default_pose_landmarks_style())
         return frame
+
+    def draw_poses(self, frame, poses):
+        """Draw per-person landmarks; each crop is a view into frame, so drawing lands in place."""
+        for pose in poses.values():
+            x1, y1, x2, y2 = pose.box
+            self.draw_landmarks(frame[y1:y2, x1:x2], pose.result)
+        return frame
+
+    def close(self):
+        """Stop the worker threads and release every MediaPipe graph; the detector can be reused."""
+        if self._executor is not None:
+            # Wait, so no worker is still inside a graph that is closed below
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            self.workers = 0
+        # The lock also waits out a warm-up still running on the inline model
+        with self._inline_lock:
+            with self._crop_poses_lock:
+                poses, self._crop_poses = self._crop_poses, []
+            if self._pose is not None:
+                poses.append(self._pose)
+                self._pose = None
+            self._local = threading.local()
+            self._inline_pose = None
+            for pose in poses:
+                pose.close()
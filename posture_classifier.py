@@ -1,58 +1,128 @@
+import threading
+import time
+from collections import deque
 import numpy as np
 import cv2
-import mediapipe as mp
 from pathlib import Path
-from typing import Tuple
+from typing import Dict, List, Tuple
+
+# MediaPipe Pose landmark indices used for posture (left, right)
+SHOULDERS = (11, 12)
+HIPS = (23, 24)
+KNEES = (25, 26)
+KEYPOINTS = SHOULDERS + HIPS + KNEES
+
+POSTURES = ("Standing", "Sitting", "Lying", "Unknown", "Uncertain")
+STANDING, SITTING, LYING, UNKNOWN, UNCERTAIN = range(len(POSTURES))
+
+
+def as_landmark_array(landmarks) -> np.ndarray:
+    """(33, 4) x/y/z/visibility array from a MediaPipe landmark list (arrays pass through)."""
+    if isinstance(landmarks, np.ndarray):
+        return landmarks
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks.landmark], dtype=np.float32)
 
-# MediaPipe Pose landmarks enum
-PoseLandmark = mp.solutions.pose.PoseLandmark
 
 class PostureClassifier:
-    def __init__(self):
-        self.prev_state = {}
+    """
+    Shoulder/hip/knee heuristics over (N, 33, 4) landmark arrays, with
+    per-track smoothing: the last `window` labels of each track are kept in
+    a ring buffer and the reported posture only changes once a new label
+    has at least `min_votes` of them, so one noisy frame cannot flip a
+    standing person to "Lying". New tracks report "Uncertain" until then.
+    """
+
+    def __init__(self, window: int = 5, min_votes: int = 3):
+        self.window = window
+        self.min_votes = min_votes
+        self.history: Dict[int, deque] = {}
+        self.prev_state: Dict[int, str] = {}
+
+    def classify_batch(self, landmarks: np.ndarray, visibility_threshold: float = 0.5) -> np.ndarray:
+        """
+        landmarks: (N, 33, 4) normalized x/y/z/visibility (see pose_utils.landmarks_to_array).
+        Returns N posture codes (indices into POSTURES).
+        """
+        landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, 33, 4)
+        points = landmarks[:, KEYPOINTS]                       # (N, 6, 4)
+        visible = (points[..., 3] > visibility_threshold).all(axis=1)
+
+        y = points[..., 1]
+        shoulders_y = y[:, 0:2].mean(axis=1)
+        hips_y = y[:, 2:4].mean(axis=1)
+        knees_y = y[:, 4:6].mean(axis=1)
+        shoulder_hip_dist = hips_y - shoulders_y
+        hip_knee_dist = knees_y - hips_y
+        total_height = knees_y - shoulders_y
+
+        # Heuristics on normalized y-distances (tune as needed); later
+        # assignments take precedence: Uncertain > Lying > Sitting > Standing
+        codes = np.full(len(landmarks), UNKNOWN, dtype=np.int8)
+        codes[(shoulder_hip_dist > 0.1) & (hip_knee_dist > 0.1)] = STANDING
+        codes[(shoulder_hip_dist < 0.1) & (hip_knee_dist > 0.1)] = SITTING
+        codes[total_height < 0.15] = LYING
+        codes[~visible] = UNCERTAIN
+        return codes
 
     def classify(self, landmarks, visibility_threshold: float = 0.5) -> str:
         """
-        Classify posture using vertical relationships of shoulders, hips, and knees
-        from MediaPipe pose landmarks (normalized coordinates). Returns one of:
-        'Standing', 'Sitting', 'Lying', 'Unknown', or 'Uncertain'.
+        Classify one person from a MediaPipe landmark list or a (33, 4) array.
+        Returns one of 'Standing', 'Sitting', 'Lying', 'Unknown', or 'Uncertain'.
         """
         if landmarks is None:
             return "Unknown"
+        return POSTURES[int(self.classify_batch(as_landmark_array(landmarks)[None], visibility_threshold)[0])]
 
-        def get_point(lm):
-            return np.array([lm.x, lm.y], dtype=np.float32) if lm.visibility > visibility_threshold else None
-
-        keypoints = {
-            "left_shoulder": get_point(landmarks.landmark[PoseLandmark.LEFT_SHOULDER]),
-            "right_shoulder": get_point(landmarks.landmark[PoseLandmark.RIGHT_SHOULDER]),
-            "left_hip": get_point(landmarks.landmark[PoseLandmark.LEFT_HIP]),
-            "right_hip": get_point(landmarks.landmark[PoseLandmark.RIGHT_HIP]),
-            "left_knee": get_point(landmarks.landmark[PoseLandmark.LEFT_KNEE]),
-            "right_knee": get_point(landmarks.landmark[PoseLandmark.RIGHT_KNEE]),
-        }
+    def _smooth(self, track_id: int, code: int) -> str:
+        buffer = self.history.get(track_id)
+        if buffer is None:
+            buffer = self.history[track_id] = deque(maxlen=self.window)
+        buffer.append(code)
 
-        if any(v is None for v in keypoints.values()):
-            return "Uncertain"
+        votes = np.bincount(np.fromiter(buffer, dtype=np.int8, count=len(buffer)),
+                            minlength=len(POSTURES))
+        leader = int(np.argmax(votes))
+        if votes[leader] >= self.min_votes:
+            label = POSTURES[leader]
+        else:
+            # New tracks stay "Uncertain" until a posture has enough votes
+            label = self.prev_state.get(track_id, POSTURES[UNCERTAIN])
+        self.prev_state[track_id] = label
+        return label
 
-        # Use y at index 1 (not 22)
-        shoulders_y = float(np.mean([keypoints["left_shoulder"][2], keypoints["right_shoulder"][2]]))
-        hips_y = float(np.mean([keypoints["left_hip"][2], keypoints["right_hip"][2]]))
-        knees_y = float(np.mean([keypoints["left_knee"][2], keypoints["right_knee"][2]]))
+    def classify_tracks(self, poses, visibility_threshold: float = 0.5, active_ids=None) -> dict:
+        """
+        Classify every tracked person in one vectorized pass: poses is
+        {track_id: PersonPose} from PoseDetector.detect_poses. Returns
+        {track_id: smoothed posture}. History of tracks not in active_ids
+        (default: the tracks in poses) is dropped.
+        """
+        postures = {}
+        if poses:
+            track_ids = list(poses)
+            codes = self.classify_batch(np.stack([as_landmark_array(poses[tid].landmarks) for tid in track_ids]),
+                                        visibility_threshold)
+            for track_id, code in zip(track_ids, codes):
+                postures[track_id] = self._smooth(track_id, int(code))
 
-        shoulder_hip_dist = hips_y - shoulders_y
-        hip_knee_dist = knees_y - hips_y
-        total_height = knees_y - shoulders_y
+        keep = poses if active_ids is None else active_ids
+        for track_id in [tid for tid in self.history if tid not in keep]:
+            del self.history[track_id]
+            self.prev_state.pop(track_id, None)
+        return postures
 
-        # Heuristics on normalized y-distances (tune as needed)
-        if total_height < 0.15:
-            return "Lying"
-        elif shoulder_hip_dist < 0.1 and hip_knee_dist > 0.1:
-            return "Sitting"
-        elif shoulder_hip_dist > 0.1 and hip_knee_dist > 0.1:
-            return "Standing"
-        else:
+    @staticmethod
+    def summarize(postures: dict) -> str:
+        """Single frame-level label for logging: 'Lying' wins, else the most common known posture."""
+        if not postures:
             return "Unknown"
+        labels = list(postures.values())
+        if "Lying" in labels:
+            return "Lying"
+        known = [p for p in labels if p in ("Standing", "Sitting")]
+        if not known:
+            return labels[0]
+        return max(set(known), key=known.count)
 
 class DemographicsDetector:
     """
@@ -88,17 +158,17 @@ class DemographicsDetector:
         self.age_net = cv2.dnn.readNetFromCaffe(str(age_proto), str(age_weights))
         self.gender_net = cv2.dnn.readNetFromCaffe(str(gender_proto), str(gender_weights))
 
-    def detect_age_gender(self, face_bgr: np.ndarray) -> Tuple[str, str]:
+    def predict_batch(self, faces: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Input: face ROI in BGR color space.
-        Returns: (age_bucket, gender_label)
+        Classify several BGR face crops with one forward pass per network.
+        Returns (age_probs (N, 8), gender_probs (N, 2)).
         """
-        # Ensure BGR input; resize to required input size
-        face_resized = cv2.resize(face_bgr, self.INPUT_SIZE, interpolation=cv2.INTER_LINEAR)
+        if not faces:
+            return np.zeros((0, len(self.AGE_BUCKETS))), np.zeros((0, len(self.GENDER_LIST)))
 
-        # Create blob with documented mean and size; keep BGR channel order
-        blob = cv2.dnn.blobFromImage(
-            face_resized,
+        # blobFromImages resizes every crop to INPUT_SIZE; keep BGR channel order
+        blob = cv2.dnn.blobFromImages(
+            faces,
             scalefactor=1.0,
             size=self.INPUT_SIZE,
             mean=self.MODEL_MEAN_VALUES,
@@ -106,14 +176,154 @@ class DemographicsDetector:
             crop=False,
         )
 
-        # Gender prediction
         self.gender_net.setInput(blob)
-        g_pred = self.gender_net.forward()
-        gender = self.GENDER_LIST[int(np.argmax(g_pred))]
-
-        # Age prediction
+        g_pred = self.gender_net.forward().reshape(len(faces), -1)
         self.age_net.setInput(blob)
-        a_pred = self.age_net.forward()
-        age = self.AGE_BUCKETS[int(np.argmax(a_pred))]
+        a_pred = self.age_net.forward().reshape(len(faces), -1)
+        return a_pred, g_pred
 
+    def detect_age_gender(self, face_bgr: np.ndarray) -> Tuple[str, str]:
+        """
+        Input: face ROI in BGR color space.
+        Returns: (age_bucket, gender_label)
+        """
+        a_pred, g_pred = self.predict_batch([face_bgr])
+        age = self.AGE_BUCKETS[int(np.argmax(a_pred[0]))]
+        gender = self.GENDER_LIST[int(np.argmax(g_pred[0]))]
         return age, gender
+
+
+class _TrackDemographics:
+    __slots__ = ("age_votes", "gender_votes", "samples", "last_sample", "label")
+
+    def __init__(self, age_classes: int, gender_classes: int):
+        self.age_votes = np.zeros(age_classes)
+        self.gender_votes = np.zeros(gender_classes)
+        self.samples = 0
+        self.last_sample = None
+        self.label = None
+
+
+class TrackDemographics:
+    """
+    Per-track age/gender estimates built from a few classifications per visit.
+
+    Each frame, tracks that still need a sample (fewer than `samples_per_visit`
+    so far, at least `sample_interval` seconds since the last, or a refresh
+    after `refresh_after` seconds) have their largest face cropped; up to
+    `max_per_frame` crops are classified in one batch. Every sample adds its
+    confidence to the predicted class, and the label is the class with the
+    highest total. State is dropped when the tracker drops the track.
+    The Caffe networks are loaded on the first update() (or by warmup()); if
+    they cannot be loaded, update() returns {} and sets load_error.
+    """
+
+    def __init__(self, detector: DemographicsDetector | None = None, samples_per_visit: int = 3,
+                 sample_interval: float = 0.5, refresh_after: float = 60.0, max_per_frame: int = 8,
+                 min_face: int = 24, padding: float = 0.15):
+        self._detector = detector
+        self._load_lock = threading.Lock()
+        self.load_error: Exception | None = None
+        self.samples_per_visit = samples_per_visit
+        self.sample_interval = sample_interval
+        self.refresh_after = refresh_after
+        self.max_per_frame = max_per_frame
+        self.min_face = min_face
+        self.padding = padding
+        self.tracks: Dict[int, _TrackDemographics] = {}
+        self.classified = 0
+
+    @property
+    def detector(self) -> DemographicsDetector | None:
+        """The loaded networks, or None once loading has failed (reported once)."""
+        if self._detector is None and self.load_error is None:
+            with self._load_lock:
+                if self._detector is None and self.load_error is None:
+                    try:
+                        detector = DemographicsDetector()
+                        # First forward pass allocates the networks' buffers
+                        detector.predict_batch([np.zeros((*DemographicsDetector.INPUT_SIZE, 3), np.uint8)])
+                    except (OSError, cv2.error) as e:
+                        self.load_error = e
+                        print(f"[ERROR] Age/gender models could not be loaded; demographics disabled: {e}")
+                        return None
+                    self._detector = detector
+        return self._detector
+
+    def warmup(self) -> bool:
+        """Load the networks now (e.g. from a background thread) instead of on first use."""
+        return self.detector is not None
+
+    def _due(self, state: _TrackDemographics, now: float) -> bool:
+        if state.last_sample is None:
+            return True
+        elapsed = now - state.last_sample
+        if state.samples < self.samples_per_visit:
+            return elapsed >= self.sample_interval
+        return elapsed >= self.refresh_after
+
+    def _crop(self, frame: np.ndarray, faces) -> np.ndarray | None:
+        x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+        if min(w, h) < self.min_face:
+            return None
+        pad_w, pad_h = int(w * self.padding), int(h * self.padding)
+        fh, fw = frame.shape[:2]
+        x1, y1 = max(0, x - pad_w), max(0, y - pad_h)
+        x2, y2 = min(fw, x + w + pad_w), min(fh, y + h + pad_h)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return frame[y1:y2, x1:x2]
+
+    def update(self, frame: np.ndarray, faces_by_track: Dict[int, list], active_ids=None,
+               now: float | None = None) -> Dict[int, Tuple[str, str]]:
+        """
+        frame: unblurred BGR frame; faces_by_track: {track_id: [(x, y, w, h), ...]}
+        (see detector.FaceDetector.detect); active_ids: ids the tracker still
+        holds (defaults to the tracks in faces_by_track).
+        Returns {track_id: (age_bucket, gender)} for every track with an estimate.
+        """
+        now = time.monotonic() if now is None else now
+        detector = self.detector
+        if detector is None:
+            return {}
+
+        due = []
+        for track_id, faces in faces_by_track.items():
+            if not faces:
+                continue
+            state = self.tracks.get(track_id)
+            if state is None:
+                state = self.tracks[track_id] = _TrackDemographics(len(detector.AGE_BUCKETS),
+                                                                   len(detector.GENDER_LIST))
+            if self._due(state, now):
+                due.append((state.samples, track_id, faces))
+
+        # Least-sampled tracks first when more faces are due than the frame budget allows
+        due.sort(key=lambda item: item[0])
+        crops, crop_ids = [], []
+        for _, track_id, faces in due:
+            if len(crops) >= self.max_per_frame:
+                break
+            crop = self._crop(frame, faces)
+            if crop is not None:
+                crops.append(crop)
+                crop_ids.append(track_id)
+
+        if crops:
+            age_probs, gender_probs = detector.predict_batch(crops)
+            self.classified += len(crops)
+            for track_id, a_pred, g_pred in zip(crop_ids, age_probs, gender_probs):
+                state = self.tracks[track_id]
+                age_idx, gender_idx = int(np.argmax(a_pred)), int(np.argmax(g_pred))
+                state.age_votes[age_idx] += float(a_pred[age_idx])
+                state.gender_votes[gender_idx] += float(g_pred[gender_idx])
+                state.samples += 1
+                state.last_sample = now
+                state.label = (detector.AGE_BUCKETS[int(np.argmax(state.age_votes))],
+                               detector.GENDER_LIST[int(np.argmax(state.gender_votes))])
+
+        keep = faces_by_track if active_ids is None else active_ids
+        for track_id in [tid for tid in self.tracks if tid not in keep]:
+            del self.tracks[track_id]
+
+        return {tid: state.label for tid, state in self.tracks.items() if state.label is not None}
@@ -0,0 +1,262 @@
+# streaming.py
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+from camera_supervisor import SharedPersonDetector
+from core_processing import SurveillanceProcessor
+
+BOUNDARY = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+
+# width: max output width in pixels (None keeps the source size, aspect is kept)
+# fps:   max encode rate (None encodes every processed frame)
+StreamVariant = namedtuple("StreamVariant", ["width", "fps", "quality"])
+
+STREAM_VARIANTS = {
+    "full": StreamVariant(width=None, fps=None, quality=80),
+    "640p": StreamVariant(width=640, fps=15, quality=70),
+    "thumb": StreamVariant(width=320, fps=5, quality=50),   # grid tiles
+}
+
+
+class FrameHub:
+    """
+    Latest-frame mailbox shared by every viewer of one camera.
+
+    The producer publishes each encoded frame once; subscribers wait for a
+    sequence number newer than the last one they sent. A slow subscriber
+    simply jumps to the newest frame, so it never holds up the producer or
+    the other viewers.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._data = None
+        self._seq = 0
+        self._closed = False
+        self.subscribers = 0
+
+    def publish(self, data):
+        with self._cond:
+            self._data = data
+            self._seq += 1
+            self._cond.notify_all()
+
+    def wait(self, last_seq, timeout=5.0):
+        """Return (seq, data) newer than last_seq, or None on timeout/close."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._closed or self._seq > last_seq, timeout):
+                return None
+            if self._closed:
+                return None
+            return self._seq, self._data
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def _attach(self, delta):
+        with self._cond:
+            self.subscribers += delta
+
+
+class VariantEncoder:
+    """
+    Resizes and JPEG-encodes one variant of a camera's processed frames.
+    Runs only while it has subscribers (all of them share its output) and
+    exits `linger` seconds after the last one leaves.
+    """
+
+    def __init__(self, name, variant, source, release, linger=2.0):
+        self.name = name
+        self.variant = variant
+        self.source = source
+        self.hub = FrameHub()
+        self.frames_encoded = 0
+        self._release = release
+        self._linger = linger
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"encoder-{name}")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def _encode(self, frame):
+        width = self.variant.width
+        if width and frame.shape[1] > width:
+            height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.variant.quality])
+        return buffer.tobytes() if ok else None
+
+    def _run(self):
+        interval = 1.0 / self.variant.fps if self.variant.fps else 0.0
+        seq = 0
+        last_encode = 0.0
+        idle_since = None
+        try:
+            while not self.source.closed:
+                if self.hub.subscribers:
+                    idle_since = None
+                elif idle_since is None:
+                    idle_since = time.monotonic()
+                elif time.monotonic() - idle_since >= self._linger and self._release(self):
+                    return
+
+                packet = self.source.wait(seq, 0.5)
+                if packet is None:
+                    continue
+                seq, frame = packet
+                now = time.monotonic()
+                if not self.hub.subscribers or now - last_encode < interval:
+                    continue
+                data = self._encode(frame)
+                if data is not None:
+                    last_encode = now
+                    self.frames_encoded += 1
+                    self.hub.publish(data)
+        finally:
+            self.hub.close()
+
+
+class CameraStream:
+    """
+    One producer thread per camera: capture -> SurveillanceProcessor. The
+    processed frames go to a raw FrameHub; a VariantEncoder per requested
+    variant (see STREAM_VARIANTS) turns them into JPEGs for its subscribers,
+    so each variant is encoded once no matter how many clients watch it.
+    """
+
+    def __init__(self, camera_id, source, detector=None, processor_options=None, variants=None):
+        self.camera_id = camera_id
+        self.source = source
+        self.variants = dict(variants or STREAM_VARIANTS)
+        self.frames = FrameHub()
+        self.processor = SurveillanceProcessor(detector=detector, **(processor_options or {}))
+        self._encoders = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"stream-{camera_id}")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.processor.process_camera_stream(self.camera_id, self.source,
+                                                 stop_event=self._stop_event, show_windows=False,
+                                                 on_frame=self._publish)
+        except Exception as e:
+            print(f"[ERROR] Stream producer for {self.camera_id} crashed: {e}")
+            self.processor.close()
+        finally:
+            self.frames.close()
+
+    def _publish(self, frame, _timestamp):
+        # Just hands over the reference; encoding happens on the variant threads
+        self.frames.publish(frame)
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def _release(self, encoder):
+        # Called by an idle encoder; refuse if a subscriber attached meanwhile
+        with self._lock:
+            if encoder.hub.subscribers:
+                return False
+            if self._encoders.get(encoder.name) is encoder:
+                del self._encoders[encoder.name]
+            return True
+
+    def _attach(self, variant):
+        with self._lock:
+            encoder = self._encoders.get(variant)
+            if encoder is None or not encoder.is_alive():
+                encoder = VariantEncoder(variant, self.variants[variant], self.frames, self._release)
+                self._encoders[variant] = encoder
+                encoder.start()
+            encoder.hub._attach(1)
+            return encoder
+
+    def subscribe(self, variant="full", timeout=5.0):
+        """Generator of multipart MJPEG chunks of one variant for one HTTP client."""
+        encoder = self._attach(variant)
+        try:
+            seq = 0
+            while not encoder.hub.closed:
+                packet = encoder.hub.wait(seq, timeout)
+                if packet is None:
+                    continue
+                seq, data = packet
+                yield BOUNDARY + data + b"\r\n"
+        finally:
+            encoder.hub._attach(-1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "alive": self.is_alive(),
+                "variants": {name: {"subscribers": encoder.hub.subscribers,
+                                    "frames_encoded": encoder.frames_encoded}
+                             for name, encoder in self._encoders.items()},
+            }
+
+    def stop(self, timeout=5.0):
+        self._stop_event.set()
+        self.frames.close()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+
+class StreamManager:
+    """
+    Owns the CameraStream for each configured camera. Streams start on the
+    first viewer and keep running afterwards (encoders only while watched);
+    all cameras share one detector.
+    """
+
+    def __init__(self, camera_sources, processor_options=None, variants=None):
+        self.camera_sources = dict(camera_sources)
+        self.processor_options = processor_options or {}
+        self.variants = dict(variants or STREAM_VARIANTS)
+        self._streams = {}
+        self._detector = None
+        self._lock = threading.Lock()
+
+    def get(self, camera_id, variant="full"):
+        """Running stream for camera_id (started on demand), or None if the camera/variant is unknown."""
+        if camera_id not in self.camera_sources or variant not in self.variants:
+            return None
+        with self._lock:
+            stream = self._streams.get(camera_id)
+            if stream is None or not stream.is_alive():
+                if self._detector is None:
+                    self._detector = SharedPersonDetector()
+                stream = CameraStream(camera_id, self.camera_sources[camera_id], detector=self._detector,
+                                      processor_options=self.processor_options,
+                                      variants=self.variants).start()
+                self._streams[camera_id] = stream
+            return stream
+
+    def stats(self):
+        with self._lock:
+            streams = dict(self._streams)
+        return {camera_id: stream.stats() for camera_id, stream in streams.items()}
+
+    def stop_all(self):
+        with self._lock:
+            streams = list(self._streams.values())
+            self._streams.clear()
+        for stream in streams:
+            stream.stop()
@@ -0,0 +1,159 @@
+# Alert delivery against a local SMTP stand-in and a fake Twilio endpoint.
+import json
+import smtplib
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from alert_dispatcher import AlertDispatcher
+from alerts import EmailChannel, WhatsAppChannel
+
+aiosmtpd = pytest.importorskip("aiosmtpd.controller")
+
+REJECTED = "nobody@example.com"
+
+
+class _Mailbox:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == REJECTED:
+            return "550 5.1.1 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content.decode("utf-8")))
+        return "250 Message accepted for delivery"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    mailbox = _Mailbox()
+    controller = aiosmtpd.Controller(mailbox, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    yield mailbox, controller.port
+    controller.stop()
+
+
+def _email(port, recipient="ops@example.com"):
+    return EmailChannel(host="127.0.0.1", port=port, use_ssl=False, username=None,
+                        password=None, sender="cam@example.com", recipient=recipient, timeout=5.0)
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_email_reuses_one_connection(smtp_server):
+    mailbox, port = smtp_server
+    channel = _email(port)
+    channel.send("Alert 1", "Fall on live_cam")
+    server = channel._server
+    channel.send("Alert 2", "Crowd on live_cam")
+    assert channel._server is server
+    assert [m[1].splitlines()[0] for m in mailbox.messages] == ["Subject: Alert 1", "Subject: Alert 2"]
+    channel.close()
+
+
+def test_email_reconnects_after_a_dropped_connection(smtp_server):
+    mailbox, port = smtp_server
+    channel = _email(port)
+    channel.send("Alert 1", "first")
+    channel._server.sock.close()  # connection went away under the pool
+    channel.send("Alert 2", "second")
+    assert len(mailbox.messages) == 2
+    channel.close()
+
+
+def test_refused_recipient_is_permanent_and_keeps_the_connection(smtp_server):
+    mailbox, port = smtp_server
+    channel = _email(port, recipient=REJECTED)
+    with pytest.raises(smtplib.SMTPRecipientsRefused) as error:
+        channel.send("Alert", "undeliverable")
+    assert EmailChannel.is_permanent(error.value)
+    assert channel._server is not None
+    assert not mailbox.messages
+    channel.close()
+
+
+def test_dispatcher_does_not_retry_permanent_failures(smtp_server):
+    _, port = smtp_server
+    dispatcher = AlertDispatcher(channels=[_email(port, recipient=REJECTED)], backoff_base=0.01)
+    dispatcher.submit("Alert", "undeliverable")
+    assert _wait_for(lambda: dispatcher.stats()["channels"]["email"]["failed"] == 1)
+    assert dispatcher.stats()["channels"]["email"]["retried"] == 0
+    dispatcher.close()
+
+
+class _FakeTwilio(BaseHTTPRequestHandler):
+    requests = []
+    fail_first = 0
+
+    def do_POST(self):
+        body = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8"))
+        type(self).requests.append((self.path, body))
+        if type(self).fail_first > 0:
+            type(self).fail_first -= 1
+            status, payload = 500, {"code": 20500, "message": "Internal error", "status": 500}
+        else:
+            status, payload = 201, {"sid": f"SM{len(type(self).requests)}", "status": "queued",
+                                    "body": body["Body"][0]}
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def twilio_server():
+    pytest.importorskip("twilio")
+    _FakeTwilio.requests = []
+    _FakeTwilio.fail_first = 0
+    server = HTTPServer(("127.0.0.1", 0), _FakeTwilio)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def _whatsapp(base_url):
+    return WhatsAppChannel(account_sid="AC123", auth_token="token", from_="whatsapp:+100",
+                           to="whatsapp:+200", base_url=base_url)
+
+
+def test_whatsapp_posts_to_the_configured_endpoint(twilio_server):
+    _whatsapp(twilio_server).send("", "Intrusion on live_cam")
+    (path, body), = _FakeTwilio.requests
+    assert path == "/2010-04-01/Accounts/AC123/Messages.json"
+    assert body["Body"] == ["Intrusion on live_cam"]
+    assert body["To"] == ["whatsapp:+200"]
+
+
+def test_dispatcher_retries_transient_whatsapp_failures(twilio_server):
+    _FakeTwilio.fail_first = 1
+    dispatcher = AlertDispatcher(channels=[_whatsapp(twilio_server)], backoff_base=0.01)
+    dispatcher.submit("", "Fall on live_cam")
+    assert _wait_for(lambda: dispatcher.stats()["channels"]["whatsapp"]["sent"] == 1)
+    assert dispatcher.stats()["channels"]["whatsapp"]["retried"] == 1
+    assert len(_FakeTwilio.requests) == 2
+    dispatcher.close()
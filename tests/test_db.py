@@ -0,0 +1,238 @@
+# Schema migration, rollup deltas and the batched LogWriter against temporary databases.
+import sqlite3
+import threading
+
+import pytest
+
+from db import (LogWriter, RollupAccumulator, backfill_rollups, init_db, insert_log,
+                load_rollups, run_rollup_backfill, to_epoch_ms)
+
+BASE_TS = 1_700_000_000_000 - 1_700_000_000_000 % 3_600_000  # start of an hour
+
+LEGACY_DDL = """
+CREATE TABLE traffic_logs (
+    time TEXT, camera_id TEXT, in_count INTEGER, out_count INTEGER, posture TEXT, alert TEXT
+);
+CREATE VIEW TrafficLog AS
+SELECT time, camera_id, in_count AS "in", out_count AS "out", posture, alert FROM traffic_logs;
+"""
+
+# Cumulative counters per row, with a pipeline restart (reset) before the last row
+LEGACY_ROWS = [
+    ("2024-03-01 10:00:05", "cam_a", 0, 0, "Standing", None),
+    ("2024-03-01 10:00:40", "cam_a", 2, 1, "Sitting", "Crowd"),
+    ("2024-03-01 10:01:10", "cam_a", 5, 1, "Lying", "Fall"),
+    ("2024-03-01 10:01:50", "cam_a", 1, 0, None, None),
+    ("2024-03-01 10:00:30", "cam_b", 3, 3, "Standing", "Intrusion Loitering"),
+]
+
+
+def _legacy_db(path, rows=LEGACY_ROWS):
+    conn = sqlite3.connect(str(path))
+    conn.executescript(LEGACY_DDL)
+    conn.executemany("INSERT INTO traffic_logs VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def _totals(conn, granularity="minute"):
+    columns, rows = load_rollups(conn, granularity)
+    totals = {}
+    for row in rows:
+        values = dict(zip(columns, row))
+        acc = totals.setdefault(values["camera_id"], dict.fromkeys(columns[2:], 0))
+        for name in columns[2:]:
+            if name == "max_occupancy":
+                acc[name] = max(acc[name], values[name])
+            else:
+                acc[name] += values[name]
+    return totals
+
+
+def _rollup_rows(conn):
+    return {g: load_rollups(conn, g)[1] for g in ("minute", "hour")}
+
+
+def test_legacy_database_is_migrated_in_place(tmp_path):
+    path = tmp_path / "legacy.db"
+    _legacy_db(path)
+    conn = init_db(path)
+
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 3
+    rows = conn.execute("SELECT time, ts FROM traffic_logs ORDER BY rowid").fetchall()
+    assert [ts for _, ts in rows] == [to_epoch_ms(text) for text, _ in rows]
+    columns = [d[0] for d in conn.execute("SELECT * FROM TrafficLog").description]
+    assert columns == ["id", "ts", "time", "camera_id", "in", "out", "posture", "alert", "occupancy"]
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list(traffic_logs)")}
+    assert {"idx_traffic_logs_camera_ts", "idx_traffic_logs_ts"} <= indexes
+
+    # The rollup rebuild is only scheduled here; the LogWriter thread or `python db.py` runs it
+    assert _totals(conn) == {}
+    assert run_rollup_backfill(conn) == len(LEGACY_ROWS)
+    assert run_rollup_backfill(conn) == 0
+
+    totals = _totals(conn)
+    # cam_a: 0 -> 2 -> 5, then a reset to 1 counts as 1 more
+    assert (totals["cam_a"]["in_delta"], totals["cam_a"]["out_delta"]) == (6, 1)
+    assert totals["cam_a"]["samples"] == 4
+    assert (totals["cam_a"]["alert_fall"], totals["cam_a"]["alert_crowd"]) == (1, 1)
+    assert (totals["cam_a"]["posture_lying"], totals["cam_a"]["posture_other"]) == (1, 1)
+    assert (totals["cam_b"]["alert_intrusion"], totals["cam_b"]["alert_loitering"]) == (1, 1)
+    assert _totals(conn, "hour") == totals
+    conn.close()
+
+
+def test_migration_is_a_no_op_once_current(tmp_path):
+    path = tmp_path / "legacy.db"
+    _legacy_db(path)
+    init_db(path).close()
+    conn = init_db(path)
+    first = _rollup_rows(conn)
+    conn.close()
+    conn = init_db(path)
+    assert _rollup_rows(conn) == first
+    conn.close()
+
+
+def test_insert_log_rolls_up_deltas_of_cumulative_counts(tmp_path):
+    conn = init_db(tmp_path / "analytics.db")
+    rollups = RollupAccumulator()
+    for offset, (in_count, out_count, occupancy) in enumerate([(1, 0, 2), (4, 1, 5), (4, 3, 1), (2, 0, 0)]):
+        insert_log(conn, {"ts": BASE_TS + offset * 20_000, "camera_id": "cam", "in": in_count,
+                          "out": out_count, "posture": "Standing", "alert": None,
+                          "occupancy": occupancy}, rollups)
+
+    columns, rows = load_rollups(conn, "minute")
+    by_bucket = {row[1]: dict(zip(columns, row)) for row in rows}
+    first, second = by_bucket[BASE_TS], by_bucket[BASE_TS + 60_000]
+    assert (first["in_delta"], first["out_delta"], first["samples"], first["max_occupancy"]) == (4, 3, 3, 5)
+    # 4 -> 2 is a counter reset: the new run's 2 is counted
+    assert (second["in_delta"], second["out_delta"], second["samples"]) == (2, 0, 1)
+    conn.close()
+
+
+def test_new_accumulator_continues_from_the_logged_counts(tmp_path):
+    conn = init_db(tmp_path / "analytics.db")
+    insert_log(conn, {"ts": BASE_TS, "camera_id": "cam", "in": 10, "out": 4})
+    # A fresh accumulator (e.g. after a restart) looks the baseline up in the table
+    insert_log(conn, {"ts": BASE_TS + 1000, "camera_id": "cam", "in": 12, "out": 4}, RollupAccumulator())
+    assert (_totals(conn)["cam"]["in_delta"], _totals(conn)["cam"]["out_delta"]) == (12, 4)
+    conn.close()
+
+
+def test_failed_write_keeps_the_rollup_baseline(tmp_path):
+    conn = init_db(tmp_path / "analytics.db")
+    rollups = RollupAccumulator()
+    insert_log(conn, {"ts": BASE_TS, "camera_id": "cam", "in": 10}, rollups)
+    conn.execute("CREATE TEMP TRIGGER full BEFORE INSERT ON traffic_logs BEGIN SELECT RAISE(ABORT, 'disk full'); END")
+    with pytest.raises(sqlite3.Error):
+        insert_log(conn, {"ts": BASE_TS + 1000, "camera_id": "cam", "in": 15}, rollups)
+    conn.execute("DROP TRIGGER full")
+    # The retried row is counted against 10, not against the 15 that never landed
+    insert_log(conn, {"ts": BASE_TS + 1000, "camera_id": "cam", "in": 15}, rollups)
+    assert _totals(conn)["cam"]["in_delta"] == 15
+    conn.close()
+
+
+def test_rebuild_matches_incremental_rollups(tmp_path):
+    conn = init_db(tmp_path / "analytics.db")
+    rollups = RollupAccumulator()
+    for i in range(300):
+        camera = f"cam_{i % 3}"
+        insert_log(conn, {"ts": BASE_TS + i * 7_000, "camera_id": camera, "in": i // 3 - (i // 90) * 20,
+                          "out": i // 6, "posture": ("Standing", "Lying", None)[i % 3],
+                          "alert": "Fall" if i % 11 == 0 else None, "occupancy": i % 9}, rollups)
+    incremental = _rollup_rows(conn)
+
+    assert backfill_rollups(conn, chunk_size=64) == 300
+    assert _rollup_rows(conn) == incremental
+    conn.close()
+
+
+def test_log_writer_batches_rows_with_their_rollups(tmp_path):
+    path = tmp_path / "analytics.db"
+    writer = LogWriter(path, batch_size=50, flush_interval=0.05)
+    for i in range(500):
+        assert writer.write({"ts": BASE_TS + i * 1000, "camera_id": f"cam_{i % 2}",
+                             "in": i // 2, "out": i // 4, "posture": "Sitting", "occupancy": 1})
+    assert writer.flush()
+    writer.close()
+    stats = writer.stats()
+    assert (stats["written"], stats["dropped"], stats["failed"]) == (500, 0, 0)
+
+    conn = init_db(path)
+    written = _rollup_rows(conn)
+    totals = _totals(conn)
+    assert (totals["cam_0"]["in_delta"], totals["cam_1"]["in_delta"]) == (249, 249)
+    assert backfill_rollups(conn) == 500
+    assert _rollup_rows(conn) == written
+    conn.close()
+
+
+def test_load_rollups_filters_cameras_and_window(tmp_path):
+    conn = init_db(tmp_path / "analytics.db")
+    for minute in range(5):
+        for camera in ("a", "b"):
+            insert_log(conn, {"ts": BASE_TS + minute * 60_000 + 5_000, "camera_id": camera, "in": minute})
+
+    columns, rows = load_rollups(conn, "minute", camera_ids=["a"],
+                                 start_ts=BASE_TS + 61_000, end_ts=BASE_TS + 3 * 60_000)
+    assert [(row[0], row[1]) for row in rows] == [("a", BASE_TS + m * 60_000) for m in (1, 2, 3)]
+    assert load_rollups(conn, "minute", camera_ids=[])[1] == []
+    conn.close()
+
+
+def _many_legacy_rows(count):
+    return [(f"2024-03-01 {10 + i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}", f"cam_{i % 3}",
+             i // 3 - (i // 600) * 150, i // 5, ("Standing", "Sitting")[i % 2], None) for i in range(count)]
+
+
+def _run_concurrently(target, workers=4):
+    errors = []
+
+    def run():
+        try:
+            target()
+        except Exception as e:  # surfaced by the assertion below
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+
+def test_concurrent_migrations_run_each_step_once(tmp_path):
+    path = tmp_path / "legacy.db"
+    _legacy_db(path, _many_legacy_rows(3000))
+    _run_concurrently(lambda: init_db(path).close())
+
+    conn = init_db(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 3
+    assert conn.execute("SELECT COUNT(*) FROM traffic_logs WHERE ts IS NULL").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM rollup_backfill").fetchone()[0] == 1
+    conn.close()
+
+
+def test_concurrent_backfills_apply_every_row_once(tmp_path):
+    path = tmp_path / "legacy.db"
+    _legacy_db(path, _many_legacy_rows(3000))
+    init_db(path).close()
+
+    replayed = []
+
+    def backfill():
+        conn = init_db(path)
+        replayed.append(run_rollup_backfill(conn, chunk_size=100))
+        conn.close()
+
+    _run_concurrently(backfill)
+    assert sum(replayed) == 3000
+
+    conn = init_db(path)
+    concurrent = _rollup_rows(conn)
+    assert backfill_rollups(conn) == 3000
+    assert _rollup_rows(conn) == concurrent
+    conn.close()
@@ -0,0 +1,123 @@
+# Line crossing counts over one or more segments, and the per-minute history.
+import time
+from datetime import datetime
+
+import pytest
+
+from line_counter import LineCounter
+
+DOORS = [
+    {"id": "door_0", "points": [[100, 300], [400, 300]]},   # left to right: moving down is "in"
+    {"id": "door_1", "points": [[900, 100], [900, 500]]},   # top to bottom: moving left is "in"
+]
+
+
+def _walk(counter, track_id, path):
+    totals = [0, 0]
+    for point in path:
+        crossed = counter.update({track_id: point})
+        totals[0] += crossed[0]
+        totals[1] += crossed[1]
+    return tuple(totals)
+
+
+def test_default_line_counts_down_as_in_and_up_as_out():
+    counter = LineCounter(line_position=300)
+    assert counter.update({1: (50, 250), 2: (5000, 350)}) == (0, 0)
+    assert counter.update({1: (50, 350), 2: (5000, 250)}) == (1, 1)
+    assert counter.counts() == {"line": {"in": 1, "out": 1}}
+
+
+def test_each_line_keeps_its_own_counts():
+    counter = LineCounter(line_position=300, lines=DOORS)
+    assert _walk(counter, 1, [(200, 250), (200, 350)]) == (1, 0)
+    assert _walk(counter, 2, [(950, 300), (850, 300), (950, 300)]) == (1, 1)
+    assert counter.counts() == {"door_0": {"in": 1, "out": 0}, "door_1": {"in": 1, "out": 1}}
+    assert (counter.count_in, counter.count_out) == (2, 1)
+
+
+def test_moves_past_the_end_of_a_segment_are_not_counted():
+    counter = LineCounter(line_position=300, lines=DOORS)
+    assert _walk(counter, 1, [(500, 250), (500, 350), (50, 350), (50, 250)]) == (0, 0)
+
+
+def test_crossing_at_a_chained_vertex_counts_on_the_first_line():
+    chained = [{"id": "door_a", "points": [[100, 300], [400, 300]]},
+               {"id": "door_b", "points": [[400, 300], [700, 300]]}]
+    counter = LineCounter(line_position=300, lines=chained)
+    # Straight down through the point where door_a ends and door_b starts
+    assert _walk(counter, 1, [(400, 250), (400, 350)]) == (1, 0)
+    assert counter.counts() == {"door_a": {"in": 1, "out": 0}, "door_b": {"in": 0, "out": 0}}
+
+
+@pytest.mark.parametrize("order", [(0, 1), (1, 0)])
+def test_crossing_at_a_shared_start_counts_once(order):
+    # Both doors drawn from the corner at (400, 300): down is "out" for one and "in" for the other
+    doors = [{"id": "west", "points": [[400, 300], [100, 300]]},
+             {"id": "east", "points": [[400, 300], [700, 300]]}]
+    lines = [doors[i] for i in order]
+    counter = LineCounter(line_position=300, lines=lines)
+    crossed = _walk(counter, 1, [(400, 250), (400, 350)])
+    first = lines[0]["id"]
+    assert crossed == ((0, 1) if first == "west" else (1, 0))
+    assert sum(c["in"] + c["out"] for c in counter.counts().values()) == 1
+    assert counter.counts()[first] == {"in": int(first == "east"), "out": int(first == "west")}
+
+
+def test_shared_points_do_not_hide_crossings_elsewhere():
+    doors = [{"id": "a", "points": [[100, 300], [400, 300]]},
+             {"id": "b", "points": [[400, 300], [400, 600]]},
+             {"id": "c", "points": [[100, 320], [700, 320]]}]
+    counter = LineCounter(line_position=300, lines=doors)
+    # Through the a/b corner and across the middle of c in one move
+    counter.update({1: (400, 250)})
+    assert counter.update({1: (400, 350)}) == (2, 0)
+    assert counter.counts() == {"a": {"in": 1, "out": 0}, "b": {"in": 0, "out": 0}, "c": {"in": 1, "out": 0}}
+
+
+def test_touching_the_line_counts_once():
+    counter = LineCounter(line_position=300, lines=DOORS[:1])
+    # Stepping onto the line counts; staying on it and leaving on the far side does not count again
+    assert _walk(counter, 1, [(200, 290), (200, 300), (200, 300), (200, 310)]) == (1, 0)
+
+
+def test_only_tracks_seen_in_the_last_update_can_cross():
+    counter = LineCounter(line_position=300, lines=DOORS[:1])
+    counter.update({1: (200, 250)})
+    counter.update({})
+    # Track 1 reappearing on the far side has no previous position to cross from
+    assert counter.update({1: (200, 350)}) == (0, 0)
+    assert counter.track_ids.tolist() == [1]
+
+
+def test_many_tracks_in_one_update():
+    counter = LineCounter(line_position=300, lines=DOORS[:1])
+    counter.update({i: (110 + i, 250) for i in range(200)})
+    assert counter.update({i: (110 + i, 350 if i % 4 else 250) for i in range(200)}) == (150, 0)
+
+
+def test_history_bins_crossings_per_minute():
+    counter = LineCounter(line_position=300, history_minutes=3)
+    minute = 1_700_000_000 // 60 * 60
+    for i, t in enumerate([minute + 5, minute + 50, minute + 70, minute + 250]):
+        counter.update({i: (0, 250)}, now=t - 1)
+        counter.update({i: (0, 350)}, now=t)
+    # Three one-minute bins in a ring: minute + 4 reuses the bin of minute + 1
+    assert counter.history == [
+        {"time": _label(minute), "in": 2, "out": 0},
+        {"time": _label(minute + 240), "in": 1, "out": 0},
+    ]
+
+
+def test_history_is_binned_by_wall_clock_time():
+    counter = LineCounter(line_position=300)
+    before = time.time()
+    counter.update({1: (0, 250)})
+    counter.update({1: (0, 350)})
+    after = time.time()
+    # Not 1970: the bin is the minute the crossing was counted in
+    assert counter.history[0]["time"] in {_label(before), _label(after)}
+
+
+def _label(epoch_seconds):
+    return datetime.fromtimestamp(epoch_seconds).strftime("%Y-%m-%d %H:%M")
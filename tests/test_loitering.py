@@ -0,0 +1,81 @@
+# Dwell-time thresholds, per-zone limits and state eviction in LoiteringDetector.
+from detectors.zone_intrusion import CompiledZones
+from loitering_detector import LoiteringDetector
+
+ZONES = [
+    {"id": "door", "type": "zone", "loiter_seconds": 10, "points": [[0, 0], [100, 0], [100, 100], [0, 100]]},
+    {"id": "hall", "type": "zone", "points": [[200, 0], [400, 0], [400, 100], [200, 100]]},
+]
+INSIDE_DOOR, INSIDE_HALL, OUTSIDE = (50, 50), (300, 50), (600, 300)
+
+
+def _zones():
+    return CompiledZones(ZONES, (640, 480), 4)
+
+
+def _run(detector, frames, zones=None, fps=1.0, start=0.0):
+    """Feed frames (one {id: point} dict each) at `fps`; return the events of the last one."""
+    events = []
+    for i, tracked in enumerate(frames):
+        events = detector.update(tracked, start + i / fps, zones)
+    return events
+
+
+def test_loitering_in_view_after_the_threshold():
+    detector = LoiteringDetector(loitering_threshold=30)
+    assert _run(detector, [{1: OUTSIDE}] * 30) == []
+    assert detector.update({1: OUTSIDE}, 30.0) == [{"object_id": 1, "zone_id": None, "dwell": 30.0}]
+
+
+def test_dwell_follows_timestamps_not_frame_counts():
+    detector = LoiteringDetector(loitering_threshold=30)
+    # 10 fps replay: 301 frames cover 30 s
+    assert _run(detector, [{1: OUTSIDE}] * 300, fps=10.0) == []
+    assert len(detector.update({1: OUTSIDE}, 30.0)) == 1
+    assert detector.dwell_times() == {1: 30.0}
+
+
+def test_zone_limit_applies_only_inside_that_zone():
+    detector = LoiteringDetector(loitering_threshold=300)
+    zones = _zones()
+    events = _run(detector, [{1: INSIDE_DOOR, 2: INSIDE_HALL, 3: OUTSIDE}] * 12, zones)
+    assert [(e["object_id"], e["zone_id"]) for e in events] == [(1, "door")]
+    assert events[0]["dwell"] == 11.0
+
+
+def test_zone_dwell_resets_when_the_track_leaves_the_zone():
+    detector = LoiteringDetector(loitering_threshold=300)
+    zones = _zones()
+    frames = [{1: INSIDE_DOOR}] * 8 + [{1: OUTSIDE}] + [{1: INSIDE_DOOR}] * 8
+    assert _run(detector, frames, zones) == []
+    # The time in view keeps counting across the exit
+    assert detector.dwell_times() == {1: 16.0}
+
+
+def test_departed_tracks_are_evicted():
+    detector = LoiteringDetector(loitering_threshold=5)
+    _run(detector, [{1: OUTSIDE, 2: OUTSIDE}] * 4)
+    detector.update({2: OUTSIDE}, 4.0)
+    assert detector.track_ids.tolist() == [2]
+    # Track 1 coming back later starts a new visit
+    events = detector.update({1: OUTSIDE, 2: OUTSIDE}, 5.0)
+    assert [e["object_id"] for e in events] == [2]
+    assert detector.dwell_times() == {1: 0.0, 2: 5.0}
+    detector.update({}, 6.0)
+    assert detector.dwell_times() == {}
+
+
+def test_stalls_add_at_most_max_gap_to_zone_dwell():
+    detector = LoiteringDetector(loitering_threshold=300, max_gap=1.0)
+    zones = _zones()
+    detector.update({1: INSIDE_DOOR}, 0.0, zones)
+    # A 60 s stall (e.g. a stream that froze) counts as one frame gap
+    assert detector.update({1: INSIDE_DOOR}, 60.0, zones) == []
+    assert detector.zone_dwell[0, 0] == 1.0
+
+
+def test_clock_going_backwards_starts_over():
+    detector = LoiteringDetector(loitering_threshold=10)
+    _run(detector, [{1: OUTSIDE}] * 20, start=100.0)
+    assert detector.update({1: OUTSIDE}, 0.0) == []
+    assert detector.dwell_times() == {1: 0.0}
@@ -0,0 +1,98 @@
+# Per-thread crop models of PoseDetector and their release, with MediaPipe replaced by a fake.
+import threading
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+import pose_utils
+from pose_utils import PoseDetector
+
+
+class _FakePose:
+    def __init__(self, created, **options):
+        self.built_on = threading.current_thread().name
+        self.used_on = set()
+        self.closed = False
+        created.append(self)
+
+    def process(self, rgb):
+        assert not self.closed
+        self.used_on.add(threading.current_thread().name)
+        return SimpleNamespace(pose_landmarks=None)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def created(monkeypatch):
+    models = []
+    pose = SimpleNamespace(Pose=lambda **options: _FakePose(models, **options))
+    monkeypatch.setattr(pose_utils, "_mp", SimpleNamespace(solutions=SimpleNamespace(pose=pose)))
+    return models
+
+
+def _people(count):
+    return {tid: (10 + 60 * tid, 20, 60 + 60 * tid, 200) for tid in range(count)}
+
+
+def test_warmup_builds_the_model_each_worker_uses(created):
+    detector = PoseDetector(workers=3)
+    detector.warmup()
+    workers = [pose for pose in created if pose.built_on.startswith("pose")]
+    assert len(created) == 4 and len({pose.built_on for pose in workers}) == 3
+
+    frame = np.zeros((240, 640, 3), dtype=np.uint8)
+    for _ in range(5):
+        detector.detect_poses(frame, _people(6))
+        detector.detect_poses(frame, _people(1))
+    # Every crop ran on a warmed model, on the thread that built it
+    assert len(created) == 4
+    assert all(pose.used_on <= {pose.built_on} for pose in workers)
+    detector.close()
+
+
+def test_inline_model_warmed_on_another_thread_is_reused(created):
+    detector = PoseDetector(workers=0)
+    warmup = threading.Thread(target=detector.warmup)
+    warmup.start()
+    warmup.join()
+    detector.detect_poses(np.zeros((240, 640, 3), dtype=np.uint8), _people(3))
+    assert len(created) == 1
+    detector.close()
+
+
+def test_close_releases_every_model_and_the_workers(created):
+    detector = PoseDetector(workers=2)
+    detector.warmup()
+    detector.close()
+    assert created and all(pose.closed for pose in created)
+    assert detector._executor is None
+    # Still usable afterwards: models are rebuilt inline on demand
+    detector.detect_poses(np.zeros((240, 640, 3), dtype=np.uint8), _people(2))
+    assert len([pose for pose in created if not pose.closed]) == 1
+
+
+class _NullWriter:
+    def write(self, entry):
+        return True
+
+    def flush(self, timeout=5.0):
+        return True
+
+
+def test_processor_releases_pose_models_when_the_stream_ends(created, tmp_path):
+    from core_processing import SurveillanceProcessor
+
+    path = tmp_path / "clip.avi"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for _ in range(10):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+
+    processor = SurveillanceProcessor(stages={"pose"}, pose_workers=2, log_writer=_NullWriter())
+    processor.process_camera_stream("cam", str(path), show_windows=False)
+    assert len(created) == 3 and all(pose.closed for pose in created)
+    assert processor.pose_detector._executor is None
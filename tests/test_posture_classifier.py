@@ -0,0 +1,89 @@
+# Posture heuristics and per-track smoothing on synthetic landmark arrays.
+from types import SimpleNamespace
+
+import numpy as np
+
+from posture_classifier import KEYPOINTS, POSTURES, PostureClassifier
+
+# Mean y of (shoulders, hips, knees), normalized to the crop height
+POSES = {
+    "Standing": (0.2, 0.5, 0.75),
+    "Sitting": (0.45, 0.5, 0.7),
+    "Lying": (0.5, 0.52, 0.55),
+    "Unknown": (0.2, 0.5, 0.55),
+}
+
+
+def _landmarks(posture, visibility=1.0):
+    landmarks = np.zeros((33, 4), dtype=np.float32)
+    landmarks[:, 3] = 1.0
+    shoulders, hips, knees = POSES[posture]
+    for (left, right), y in zip(((11, 12), (23, 24), (25, 26)), (shoulders, hips, knees)):
+        landmarks[[left, right], 1] = y
+    landmarks[list(KEYPOINTS), 3] = visibility
+    return landmarks
+
+
+def _poses(**labels):
+    return {int(tid[1:]): SimpleNamespace(landmarks=_landmarks(label)) for tid, label in labels.items()}
+
+
+def test_batch_classification_of_each_posture():
+    batch = np.stack([_landmarks(p) for p in POSES] + [_landmarks("Standing", visibility=0.2)])
+    codes = PostureClassifier().classify_batch(batch)
+    assert [POSTURES[c] for c in codes] == list(POSES) + ["Uncertain"]
+
+
+def test_single_classification_matches_the_batch():
+    classifier = PostureClassifier()
+    for posture in POSES:
+        assert classifier.classify(_landmarks(posture)) == posture
+    assert classifier.classify(None) == "Unknown"
+
+
+def test_new_track_is_uncertain_until_a_posture_has_enough_votes():
+    classifier = PostureClassifier(window=5, min_votes=3)
+    # A first noisy frame must not become the track's label
+    labels = [classifier.classify_tracks(_poses(t1=p))[1] for p in ("Lying", "Sitting", "Sitting", "Sitting")]
+    assert labels == ["Uncertain", "Uncertain", "Uncertain", "Sitting"]
+
+
+def test_one_noisy_frame_does_not_flip_the_posture():
+    classifier = PostureClassifier(window=5, min_votes=3)
+    for _ in range(4):
+        classifier.classify_tracks(_poses(t1="Standing"))
+    assert classifier.classify_tracks(_poses(t1="Lying")) == {1: "Standing"}
+    assert classifier.classify_tracks(_poses(t1="Standing")) == {1: "Standing"}
+
+
+def test_posture_changes_once_it_has_enough_votes():
+    classifier = PostureClassifier(window=5, min_votes=3)
+    for _ in range(5):
+        classifier.classify_tracks(_poses(t1="Standing"))
+    labels = [classifier.classify_tracks(_poses(t1="Lying"))[1] for _ in range(3)]
+    assert labels == ["Standing", "Standing", "Lying"]
+
+
+def test_tracks_are_smoothed_independently():
+    classifier = PostureClassifier(window=5, min_votes=3)
+    for _ in range(3):
+        postures = classifier.classify_tracks(_poses(t1="Standing", t2="Sitting"))
+    assert postures == {1: "Standing", 2: "Sitting"}
+
+
+def test_history_of_departed_tracks_is_dropped():
+    classifier = PostureClassifier()
+    classifier.classify_tracks(_poses(t1="Standing", t2="Sitting"))
+    # Track 2 is still tracked but had no pose this frame; track 1 is gone
+    classifier.classify_tracks(_poses(t3="Standing"), active_ids={2, 3})
+    assert set(classifier.history) == {2, 3} and set(classifier.prev_state) == {2, 3}
+    classifier.classify_tracks({})
+    assert classifier.history == {} and classifier.prev_state == {}
+
+
+def test_summary_prefers_lying_then_the_most_common_posture():
+    summarize = PostureClassifier.summarize
+    assert summarize({}) == "Unknown"
+    assert summarize({1: "Standing", 2: "Lying", 3: "Standing"}) == "Lying"
+    assert summarize({1: "Sitting", 2: "Standing", 3: "Sitting", 4: "Uncertain"}) == "Sitting"
+    assert summarize({1: "Uncertain"}) == "Uncertain"
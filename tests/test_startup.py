@@ -0,0 +1,29 @@
+# Import-time budget: pipeline modules must import fast and load no model libraries.
+import pytest
+
+from benchmark_startup import HEAVY_MODULES, MODULES, probe
+
+IMPORT_BUDGET = 1.0     # seconds, best of 3 fresh interpreters
+CONSTRUCT_BUDGET = 0.25
+
+
+def _best(module, key, construct=False):
+    samples = [probe(module, construct=construct) for _ in range(3)]
+    return min(s[key] for s in samples), samples[0]["heavy"]
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_import_is_fast_and_loads_no_models(module):
+    seconds, heavy = _best(module, "import_s")
+    assert not heavy, f"import {module} loaded {heavy}"
+    assert seconds < IMPORT_BUDGET, f"import {module} took {seconds:.3f} s"
+
+
+def test_processor_construction_loads_no_models():
+    seconds, heavy = _best("core_processing", "construct_s", construct=True)
+    assert not heavy, f"SurveillanceProcessor() loaded {heavy}"
+    assert seconds < CONSTRUCT_BUDGET, f"SurveillanceProcessor() took {seconds:.3f} s"
+
+
+def test_heavy_modules_cover_the_model_libraries():
+    assert {"ultralytics", "mediapipe", "torch", "twilio"} <= set(HEAVY_MODULES)
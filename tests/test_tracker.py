@@ -0,0 +1,101 @@
+# CentroidTracker: gated assignment (dense vs grid) and the trail ring buffer.
+import numpy as np
+import pytest
+
+from tracker import CentroidTracker
+
+pytest.importorskip("scipy")
+
+
+def _boxes(centroids, half=10):
+    return [(int(x) - half, int(y) - half, int(x) + half, int(y) + half) for x, y in centroids]
+
+
+def _scene(seed, count, size=2000):
+    rng = np.random.default_rng(seed)
+    tracks = rng.uniform(0, size, (count, 2))
+    detections = np.clip(tracks + rng.normal(0, 20, (count, 2)), 0, size)
+    return tracks, rng.permutation(detections)
+
+
+def _total_cost(tracks, detections, matches):
+    return sum(float(np.linalg.norm(tracks[r] - detections[c])) for r, c in matches)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_grid_assignment_matches_dense(seed):
+    tracks, detections = _scene(seed, 200)
+    grid = CentroidTracker(max_distance=60)
+    dense = CentroidTracker(max_distance=60)
+    dense.DENSE_PAIR_LIMIT = len(tracks) * len(detections)
+
+    grid_matches = grid._assign(tracks, detections)
+    dense_matches = dense._assign(tracks, detections)
+
+    assert len(tracks) * len(detections) > grid.DENSE_PAIR_LIMIT
+    assert len(grid_matches) == len(dense_matches)
+    assert _total_cost(tracks, detections, grid_matches) == pytest.approx(
+        _total_cost(tracks, detections, dense_matches))
+    # Each track and detection is used at most once
+    assert len({r for r, _ in grid_matches}) == len(grid_matches)
+    assert len({c for _, c in grid_matches}) == len(grid_matches)
+
+
+def test_assignment_minimizes_total_distance():
+    # Greedy nearest-first would give track 0 the detection at x=2 and leave
+    # track 1 unmatched (20 px > max_distance); the optimal assignment uses both
+    tracks = np.array([[0.0, 0.0], [12.0, 0.0]])
+    detections = np.array([[2.0, 0.0], [-8.0, 0.0]])
+    matches = CentroidTracker(max_distance=11)._assign(tracks, detections)
+    assert sorted(matches) == [(0, 1), (1, 0)]
+
+
+def test_pairs_beyond_max_distance_are_never_matched():
+    tracker = CentroidTracker(max_distance=50)
+    tracker.update(_boxes([(100, 100)]))
+    objects = tracker.update(_boxes([(400, 400)]))
+    assert sorted(objects) == [0, 1]
+    assert tracker.disappeared[0] == 1
+
+
+def test_ids_follow_moving_people():
+    tracker = CentroidTracker(max_distance=50)
+    start = [(100, 100), (300, 100), (500, 100)]
+    tracker.update(_boxes(start))
+    for step in range(1, 10):
+        objects = tracker.update(_boxes([(x + 15 * step, y + 10 * step) for x, y in start]))
+    assert [tuple(objects[i]) for i in range(3)] == [(x + 135, y + 90) for x, y in start]
+
+
+def test_track_is_dropped_after_max_disappeared():
+    tracker = CentroidTracker(max_disappeared=2)
+    tracker.update(_boxes([(100, 100)]))
+    for _ in range(2):
+        assert 0 in tracker.update([])
+    assert 0 not in tracker.update([])
+
+
+def test_trail_keeps_the_latest_points_oldest_first():
+    tracker = CentroidTracker(max_trail=5)
+    tracker.update(_boxes([(10, 10), (20, 20)]))
+    assert tracker.trail_points().tolist() == [[10, 10], [20, 20]]
+    for step in range(1, 4):
+        tracker.update(_boxes([(10 + step, 10), (20 + step, 20)]))
+    assert tracker.trail_points().tolist() == [[21, 20], [12, 10], [22, 20], [13, 10], [23, 20]]
+
+
+def test_trail_keeps_the_tail_of_an_oversized_batch():
+    tracker = CentroidTracker(max_trail=3)
+    tracker.update(_boxes([(10 * i, 0) for i in range(1, 6)]))
+    assert tracker.trail_points().tolist() == [[30, 0], [40, 0], [50, 0]]
+
+
+def test_missed_track_reports_its_coasted_position():
+    tracker = CentroidTracker(max_disappeared=5, velocity_smoothing=1.0)
+    tracker.update(_boxes([(100, 100)]))
+    tracker.update(_boxes([(110, 105)]))
+    # Missed at the next keyframe: objects must follow the motion model like predict() does
+    objects = tracker.update(_boxes([(900, 900)]))
+    assert tuple(objects[0]) == (120, 110)
+    assert tuple(objects[0]) == tuple(tracker.positions[0].astype(np.int32))
+    assert tuple(tracker.update([])[0]) == (130, 115)
@@ -0,0 +1,95 @@
+# Zone rasterization and vectorized intrusion lookups.
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+from detectors.zone_intrusion import CompiledZones, ZoneIntrusionDetector
+
+ZONES = {
+    "cam": [
+        {"id": "vault", "type": "restricted", "points": [[100, 100], [300, 100], [300, 300], [100, 300]]},
+        {"id": "aisle", "type": "zone", "points": [[200, 200], [500, 200], [500, 400], [200, 400]]},
+        {"id": "gate", "type": "restricted", "points": [[600, 50], [900, 120], [780, 460], [560, 330]]},
+    ]
+}
+
+
+@pytest.fixture
+def detector(tmp_path):
+    path = tmp_path / "zone_config.json"
+    path.write_text(json.dumps(ZONES))
+    return ZoneIntrusionDetector(str(path), frame_size=(1280, 720), downscale=4)
+
+
+def test_overlapping_zones_set_one_bit_each(detector):
+    compiled = detector.compiled("cam")
+    masks = detector.classify("cam", [(150, 150), (250, 250), (450, 350), (50, 50)])
+    assert [compiled.zones_in(m) for m in masks] == [["vault"], ["vault", "aisle"], ["aisle"], []]
+
+
+def test_points_outside_the_frame_are_in_no_zone(detector):
+    assert detector.classify("cam", [(-10, 150), (150, -10), (5000, 150), (150, 5000)]).tolist() == [0, 0, 0, 0]
+
+
+def test_cameras_without_zones_classify_nothing(detector):
+    assert detector.compiled("other") is None
+    assert detector.classify("other", [(150, 150)]).tolist() == [0]
+    assert detector.detect_intrusions("other", {1: (150, 150)}) == []
+
+
+def test_intrusions_only_for_restricted_zones(detector):
+    tracked = {1: (150, 150), 2: (450, 350), 3: (250, 250), 4: (700, 200)}
+    intrusions = detector.detect_intrusions("cam", tracked)
+    assert sorted((i["object_id"], i["zone_id"]) for i in intrusions) == [(1, "vault"), (3, "vault"), (4, "gate")]
+    assert {i["object_id"]: i["centroid"] for i in intrusions}[4] == (700, 200)
+
+
+def test_intrusions_accept_centroid_dicts(detector):
+    tracked = {7: {"centroid": (150, 150)}, 8: {"centroid": None}}
+    assert detector.detect_intrusions("cam", tracked) == [
+        {"object_id": 7, "zone_id": "vault", "centroid": (150, 150)}]
+
+
+def test_zones_are_recompiled_when_the_frame_size_changes(detector):
+    first = detector.compiled("cam")
+    assert detector.compiled("cam") is first
+    resized = detector.compiled("cam", frame_size=(640, 480))
+    assert resized is not first and resized.raster.shape == (120, 160)
+
+
+@pytest.mark.parametrize("downscale", [1, 2, 4, 8])
+def test_raster_agrees_with_point_polygon_test(tmp_path, downscale):
+    path = tmp_path / "zone_config.json"
+    path.write_text(json.dumps(ZONES))
+    compiled = ZoneIntrusionDetector(str(path), frame_size=(1280, 720), downscale=downscale).compiled("cam")
+    xs, ys = np.meshgrid(np.arange(0, 1280, 5), np.arange(0, 720, 5))
+    points = np.stack([xs.ravel(), ys.ravel()], axis=1)
+    masks = compiled.lookup(points)
+    # A point is classified by its cell's center, at most this far away
+    tolerance = (downscale - 1) / np.sqrt(2)
+    for bit, zone in enumerate(ZONES["cam"]):
+        polygon = np.array(zone["points"], dtype=np.float32)
+        dist = np.array([cv2.pointPolygonTest(polygon, (float(x), float(y)), True) for x, y in points])
+        wrong = ((masks >> bit) & 1 == 1) != (dist > 0)
+        assert np.abs(dist[wrong]).max(initial=0.0) <= tolerance, zone["id"]
+
+
+def test_more_than_64_zones_are_rejected():
+    zones = [{"id": f"z{i}", "type": "zone", "points": [[0, 0], [10, 0], [10, 10]]} for i in range(65)]
+    with pytest.raises(ValueError):
+        CompiledZones(zones, (100, 100), 4)
+
+
+def test_intrusions_for_many_objects_match_the_per_zone_lookup(detector):
+    rng = np.random.default_rng(0)
+    tracked = {int(i): (int(x), int(y)) for i, (x, y) in enumerate(rng.integers(0, 1000, (2000, 2)))}
+    compiled = detector.compiled("cam")
+    masks = compiled.lookup(list(tracked.values()))
+    expected = {(obj_id, zone_id) for obj_id, mask in zip(tracked, masks)
+                for zone_id in compiled.zones_in(mask) if zone_id in ("vault", "gate")}
+    intrusions = detector.detect_intrusions("cam", tracked)
+    assert {(i["object_id"], i["zone_id"]) for i in intrusions} == expected
+    assert len(intrusions) == len(expected)
+    assert all(i["centroid"] == tracked[i["object_id"]] for i in intrusions)
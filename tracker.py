@@ -1,76 +1,240 @@
 import numpy as np
-from collections import OrderedDict
+from collections import OrderedDict, deque
 
 class CentroidTracker:
-    def __init__(self, max_disappeared=10):
+    """
+    Centroid tracker with gated optimal assignment.
+
+    Detections are matched to (motion-predicted) tracks by minimum total
+    distance (Hungarian algorithm); pairs further apart than `max_distance`
+    are never matched. For large scenes, candidate pairs come from a
+    spatial grid with cells of `max_distance`, and each connected group of
+    candidates is solved on its own so cost stays close to linear in the
+    number of people.
+    """
+
+    # Above this many track x detection pairs, use the spatial grid
+    DENSE_PAIR_LIMIT = 4096
+
+    def __init__(self, max_disappeared=10, velocity_smoothing=0.5, max_distance=100.0,
+                 max_trail=20000, history_length=30):
         self.next_id = 0
-        self.max_trail = 20000
-        self.trail_map = []
+        self.max_trail = max_trail
+        # Fixed-size ring buffer of recent detection centroids (see trail_points())
+        self.trail_map = np.zeros((max_trail, 2), dtype=np.int32)
+        self.trail_size = 0
+        self._trail_pos = 0
+        self.history_length = history_length
         self.object_history = {}
         self.objects = OrderedDict()
         self.disappeared = OrderedDict()
         self.max_disappeared = max_disappeared
+        self.max_distance = float(max_distance)
 
-    def register(self, centroid):
+        # Constant-velocity motion model used between detector keyframes
+        self.velocity_smoothing = velocity_smoothing
+        self.boxes = OrderedDict()          # object_id -> [x1, y1, x2, y2] (float)
+        self.velocities = OrderedDict()     # object_id -> np.array([vx, vy]) px/frame
+        self.positions = OrderedDict()      # object_id -> float centroid (predicted)
+        self.last_observed = {}             # object_id -> (frame_index, centroid)
+        self.frame_index = 0
+
+    def register(self, centroid, box=None):
         self.objects[self.next_id] = centroid
         self.disappeared[self.next_id] = 0
+        self.positions[self.next_id] = np.asarray(centroid, dtype=np.float32)
+        self.velocities[self.next_id] = np.zeros(2, dtype=np.float32)
+        self.boxes[self.next_id] = np.asarray(box if box is not None else (*centroid, *centroid),
+                                              dtype=np.float32)
+        self.last_observed[self.next_id] = (self.frame_index, self.positions[self.next_id].copy())
+        self.object_history[self.next_id] = deque([centroid], maxlen=self.history_length)
         self.next_id += 1
 
     def deregister(self, object_id):
         del self.objects[object_id]
         del self.disappeared[object_id]
+        del self.positions[object_id]
+        del self.velocities[object_id]
+        del self.boxes[object_id]
+        del self.last_observed[object_id]
+        self.object_history.pop(object_id, None)
+
+    def _observe(self, object_id, centroid, box):
+        """Matched detection: correct position/box and refresh the velocity estimate."""
+        last_frame, last_centroid = self.last_observed[object_id]
+        observed = np.asarray(centroid, dtype=np.float32)
+        frames = max(1, self.frame_index - last_frame)
+        measured = (observed - last_centroid) / frames
+        a = self.velocity_smoothing
+        self.velocities[object_id] = a * measured + (1.0 - a) * self.velocities[object_id]
+        self.positions[object_id] = observed
+        self.boxes[object_id] = np.asarray(box, dtype=np.float32)
+        self.last_observed[object_id] = (self.frame_index, observed)
+        self.objects[object_id] = centroid
+        self.disappeared[object_id] = 0
+        self.object_history[object_id].append(centroid)
+
+    def _miss(self, object_id):
+        self.disappeared[object_id] += 1
+        if self.disappeared[object_id] > self.max_disappeared:
+            self.deregister(object_id)
+            return
+        # Coast on the motion model so the track can be re-acquired where it went
+        velocity = self.velocities[object_id]
+        self.positions[object_id] = self.positions[object_id] + velocity
+        self.boxes[object_id] = self.boxes[object_id] + np.tile(velocity, 2)
+        self.objects[object_id] = self.positions[object_id].astype(np.int32)
+
+    def predict(self):
+        """
+        Advance every track one frame with its constant-velocity estimate, without
+        a detector pass. Returns the same {object_id: centroid} mapping as update().
+        """
+        self.frame_index += 1
+        for object_id, velocity in self.velocities.items():
+            self.positions[object_id] = self.positions[object_id] + velocity
+            self.boxes[object_id] = self.boxes[object_id] + np.tile(velocity, 2)
+            self.objects[object_id] = self.positions[object_id].astype(np.int32)
+        return self.objects
+
+    def needs_detection(self, max_drift=25.0):
+        """
+        True when predicted tracks are no longer trustworthy: some track was missed
+        at the last keyframe, or has drifted more than `max_drift` pixels of
+        extrapolated motion since it was last observed.
+        """
+        for object_id, missed in self.disappeared.items():
+            if missed > 0:
+                return True
+            age = self.frame_index - self.last_observed[object_id][0]
+            if age * float(np.hypot(*self.velocities[object_id])) > max_drift:
+                return True
+        return False
+
+    def _candidate_pairs(self, tracks, detections):
+        """
+        Return (track_idx, det_idx, distance) arrays for pairs within max_distance.
+        Small scenes use one dense distance matrix; large ones only compare
+        detections in the 3x3 grid cells around each track.
+        """
+        if len(tracks) * len(detections) <= self.DENSE_PAIR_LIMIT:
+            D = np.linalg.norm(tracks[:, None] - detections[None, :], axis=2)
+            rows, cols = np.nonzero(D <= self.max_distance)
+            return rows, cols, D[rows, cols]
+
+        cell = self.max_distance
+        det_cells = np.floor(detections / cell).astype(np.int64)
+        grid = {}
+        for idx, (cx, cy) in enumerate(det_cells.tolist()):
+            grid.setdefault((cx, cy), []).append(idx)
+
+        track_cells = np.floor(tracks / cell).astype(np.int64)
+        pair_rows, pair_cols = [], []
+        for t_idx, (cx, cy) in enumerate(track_cells.tolist()):
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    members = grid.get((cx + dx, cy + dy))
+                    if members:
+                        pair_rows.extend([t_idx] * len(members))
+                        pair_cols.extend(members)
+
+        rows = np.asarray(pair_rows, dtype=np.int64)
+        cols = np.asarray(pair_cols, dtype=np.int64)
+        if len(rows) == 0:
+            return rows, cols, np.zeros(0, dtype=np.float64)
+        dist = np.linalg.norm(tracks[rows] - detections[cols], axis=1)
+        keep = dist <= self.max_distance
+        return rows[keep], cols[keep], dist[keep]
+
+    def _assign(self, tracks, detections):
+        """Optimal gated assignment; returns a list of (track_idx, det_idx)."""
+        rows, cols, dist = self._candidate_pairs(tracks, detections)
+        if len(rows) == 0:
+            return []
+        # scipy takes ~0.7 s to import, so it loads with the first match rather than at startup
+        from scipy.optimize import linear_sum_assignment
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+
+        n_tracks = len(tracks)
+        # Independent groups of tracks/detections can be solved separately
+        graph = coo_matrix((np.ones(len(rows)), (rows, cols + n_tracks)),
+                           shape=(n_tracks + len(detections),) * 2)
+        _, labels = connected_components(graph, directed=False)
+        edge_labels = labels[rows]
+
+        order = np.argsort(edge_labels, kind="stable")
+        rows, cols, dist, edge_labels = rows[order], cols[order], dist[order], edge_labels[order]
+        splits = np.flatnonzero(np.diff(edge_labels)) + 1
+
+        gated_cost = self.max_distance * 1e3
+        matches = []
+        for r, c, d in zip(np.split(rows, splits), np.split(cols, splits), np.split(dist, splits)):
+            if len(r) == 1:
+                matches.append((int(r[0]), int(c[0])))
+                continue
+            track_idx, r_local = np.unique(r, return_inverse=True)
+            det_idx, c_local = np.unique(c, return_inverse=True)
+            cost = np.full((len(track_idx), len(det_idx)), gated_cost)
+            cost[r_local, c_local] = d
+            sol_rows, sol_cols = linear_sum_assignment(cost)
+            valid = cost[sol_rows, sol_cols] <= self.max_distance
+            matches.extend(zip(track_idx[sol_rows[valid]].tolist(), det_idx[sol_cols[valid]].tolist()))
+        return matches
+
+    def _add_trail(self, points):
+        """Append centroids to the ring buffer, overwriting the oldest ones."""
+        n = len(points)
+        if n == 0:
+            return
+        if n >= self.max_trail:
+            points = points[-self.max_trail:]
+            n = self.max_trail
+        idx = (self._trail_pos + np.arange(n)) % self.max_trail
+        self.trail_map[idx] = points
+        self._trail_pos = (self._trail_pos + n) % self.max_trail
+        self.trail_size = min(self.max_trail, self.trail_size + n)
+
+    def trail_points(self):
+        """Recent detection centroids, oldest first (at most max_trail rows)."""
+        if self.trail_size < self.max_trail:
+            return self.trail_map[:self.trail_size].copy()
+        return np.roll(self.trail_map, -self._trail_pos, axis=0)
 
     def update(self, rects):
+        self.frame_index += 1
         if len(rects) == 0:
             for obj_id in list(self.disappeared.keys()):
-                self.disappeared[obj_id] += 1
-                if self.disappeared[obj_id] > self.max_disappeared:
-                    self.deregister(obj_id)
+                self._miss(obj_id)
             return self.objects
 
-        input_centroids = np.array([(int((x1+x2)/2), int((y1+y2)/2)) for x1, y1, x2, y2 in rects])
+        rect_arr = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+        input_centroids = np.stack([(rect_arr[:, 0] + rect_arr[:, 2]) // 2,
+                                    (rect_arr[:, 1] + rect_arr[:, 3]) // 2], axis=1)
 
         if len(self.objects) == 0:
             for i in range(0, len(input_centroids)):
-                self.register(input_centroids[i])
+                self.register(input_centroids[i], rects[i])
         else:
             object_ids = list(self.objects.keys())
-            object_centroids = list(self.objects.values())
-
-            D = np.linalg.norm(np.array(object_centroids)[:, None] - input_centroids[None, :], axis=2)
-            rows, cols = D.min(axis=1).argsort(), D.argmin(axis=1)[D.min(axis=1).argsort()]
-            used_rows, used_cols = set(), set()
-
-            for row, col in zip(rows, cols):
-                if row in used_rows or col in used_cols:
-                    continue
-                object_id = object_ids[row]
-                self.objects[object_id] = input_centroids[col]
-                self.disappeared[object_id] = 0
-                used_rows.add(row)
-                used_cols.add(col)
-
-            unused_rows = set(range(0, D.shape[0])) - used_rows
-            unused_cols = set(range(0, D.shape[1])) - used_cols
-
-            for row in unused_rows:
-                object_id = object_ids[row]
-                self.disappeared[object_id] += 1
-                if self.disappeared[object_id] > self.max_disappeared:
-                    self.deregister(object_id)
-
-            for col in unused_cols:
-                self.register(input_centroids[col])
-
-            for object_id, centroid in new_tracked.items():
-                if object_id not in self.object_history:
-                    self.object_history[object_id] = []
-                self.object_history[object_id].append(centroid)
-                self.object_history[object_id] = self.object_history[object_id][-30:]
-        
-        for c in input_centroids:
-            self.trail_map.append(c)
-            if len(self.trail_map) > self.max_trail:
-                self.trail_map.pop(0)
+            # Match against positions predicted for this frame (constant velocity)
+            tracks = (np.array(list(self.positions.values()), dtype=np.float64)
+                      + np.array(list(self.velocities.values()), dtype=np.float64))
+            matches = self._assign(tracks, input_centroids.astype(np.float64))
+
+            matched_rows = np.zeros(len(object_ids), dtype=bool)
+            matched_cols = np.zeros(len(input_centroids), dtype=bool)
+            for row, col in matches:
+                self._observe(object_ids[row], input_centroids[col], rects[col])
+                matched_rows[row] = True
+                matched_cols[col] = True
+
+            for row in np.flatnonzero(~matched_rows):
+                self._miss(object_ids[row])
+
+            for col in np.flatnonzero(~matched_cols):
+                self.register(input_centroids[col], rects[col])
+
+        self._add_trail(input_centroids)
 
         return self.objects
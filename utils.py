@@ -0,0 +1,34 @@
+# utils.py
+from pathlib import Path
+
+import yaml
+
+CONFIG_PATH = Path(__file__).resolve().parent / "config.yaml"
+
+# Used for keys missing from config.yaml
+DEFAULT_CONFIG = {
+    "line_position": 300,
+    "video_path": "data/test_videos/sample.mp4",
+    "stages": None,          # None = every stage in core_processing.STAGES
+    "detect_every": 1,
+    "background_warmup": True,
+}
+
+# config.yaml keys passed straight to SurveillanceProcessor
+PROCESSOR_KEYS = ("stages", "detect_every", "background_warmup")
+
+
+def load_config(path=CONFIG_PATH):
+    """config.yaml merged over DEFAULT_CONFIG; a missing file gives the defaults."""
+    config = dict(DEFAULT_CONFIG)
+    try:
+        with open(path) as f:
+            config.update(yaml.safe_load(f) or {})
+    except FileNotFoundError:
+        print(f"[WARN] Config file not found: {path}; using defaults")
+    return config
+
+
+def processor_options(config):
+    """The SurveillanceProcessor keyword arguments set in a loaded config."""
+    return {key: config[key] for key in PROCESSOR_KEYS if config.get(key) is not None}
@@ -14,8 +14,16 @@ def validate_zone_json(file_path):
             for zone in zones:
                 if "id" not in zone or "type" not in zone or "points" not in zone:
                     raise ValueError(f"Zone in '{camera}' missing 'id', 'type', or 'points'")
-                if not isinstance(zone["points"], list) or len(zone["points"]) < 3:
+                if zone["type"] == "line":
+                    # Counting line: one segment, crossing left-to-right of p1->p2 counts as "in"
+                    if not isinstance(zone["points"], list) or len(zone["points"]) != 2:
+                        raise ValueError(f"Line '{zone['id']}' in '{camera}' must have exactly 2 points")
+                elif not isinstance(zone["points"], list) or len(zone["points"]) < 3:
                     raise ValueError(f"Zone '{zone['id']}' in '{camera}' must have at least 3 points")
+                if "loiter_seconds" in zone:
+                    seconds = zone["loiter_seconds"]
+                    if isinstance(seconds, bool) or not isinstance(seconds, (int, float)) or seconds <= 0:
+                        raise ValueError(f"Zone '{zone['id']}' in '{camera}': 'loiter_seconds' must be a positive number")
 
         print("✅ Zone config is valid!")
     except Exception as e: